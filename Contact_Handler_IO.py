@@ -6,6 +6,9 @@
 """This module provides I/O functions for managing the cell-cell and cell-ECM
 contact data output by the OAC Contact Calculator Xtension."""
 
+import Contact_Handler_profiling as Profiling
+
+@Profiling.profiled('get_component_channels')
 def get_component_channels(filename):
     """Creates the list of components in the tissue and reads in the intensity
 for all 4 channels for each component. Returns a dictionary with keys that are
@@ -42,44 +45,102 @@ def get_component_info(filename):
     """This function takes a filename(containing data for a component) and
 pulls out all of the quantitative spatial information in the file, returning a tuple
 (identifier, surface_area, volume, sphericity, bounding_box(tuple of 3), s_voxels (calculated surface
-voxels), voxel_size, and a list of contacts (really a list of tuples: (name of contacting component, number of voxels)"""
+voxels), voxel_size, and a list of contacts (really a list of tuples: (name of contacting component, number of voxels)
+Edited 2026-10: the file is read in one bulk read and parsed by parse_component_info"""
     f = open(filename, 'r')
     #print(filename)
-    identifier = f.readline().strip()
-    surface_area = float(f.readline().split('\t')[1])
-    volume = float(f.readline().split('\t')[1])
-    sphericity = float(f.readline().split('\t')[1])
-    bb = f.readline().split('\t')
+    text = f.read()
+    f.close()
+    return parse_component_info(text)
+
+def parse_component_info(text):
+    """Parses the text of one component file held in memory (see get_component_info).
+Lines are taken exactly as f.readline() would return them, without the newline."""
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop() #the file ends with a newline, not with an empty line
+
+    identifier = lines[0].strip()
+    surface_area = float(lines[1].split('\t')[1])
+    volume = float(lines[2].split('\t')[1])
+    sphericity = float(lines[3].split('\t')[1])
+    bb = lines[4].split('\t')
     bounding_box = (float(bb[1]), float(bb[2]), float(bb[3]))
-    ellipticity_p = float(f.readline().split('\t')[1])
-    ellipticity_o = float(f.readline().split('\t')[1])
-    s_voxels = float(f.readline().split('\t')[1])
-    distance_to_edge = float(f.readline().split('\t')[1])
-    voxel_size = float(f.readline().split('\t')[2])
+    ellipticity_p = float(lines[5].split('\t')[1])
+    ellipticity_o = float(lines[6].split('\t')[1])
+    s_voxels = float(lines[7].split('\t')[1])
+    distance_to_edge = float(lines[8].split('\t')[1])
+    voxel_size = float(lines[9].split('\t')[2])
 
 
     contacts_list = []
     contact_voxels = 0
 
-    line = f.readline()
-    line = f.readline()
-
-    while line != '':
+    #line 10 is the contacts header
+    for line in lines[11:]:
         if line[0:4]=='Cell' or line[0:4] == 'Surf' or line[0:3]== 'Cap' or line[0:4]=='Peri' or line[0:3]=='Exo':
             name = line.strip()
-        elif line == '\n':
+        elif line == '':
             contacts_list.append((name, contact_voxels))
             contact_voxels = 0
         else:
             contact_voxels = contact_voxels + float(line.strip())
-        line = f.readline()
 
-    if line == '':
-        contacts_list.append((name, contact_voxels))
+    contacts_list.append((name, contact_voxels))
 
-    f.close()
     return (identifier, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size, contacts_list)
+
+#Added 2026-10
+@Profiling.profiled('get_component_info_list')
+def get_component_info_list(file_list, n_workers=16, use_processes=False):
+    """Runs get_component_info over every file in file_list on a pool of n_workers threads
+(or processes, if use_processes is True - useful when parsing rather than file latency
+dominates). Returns the list of tuples in the same order as file_list."""
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+    Profiling.count('files parsed', len(file_list))
+    if n_workers == 1:
+        return [get_component_info(filename) for filename in file_list]
+    if use_processes:
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=n_workers)
+    with executor:
+        return list(executor.map(get_component_info, file_list, chunksize=64 if use_processes else 1))
+
+#Added 2026-10
+PREFETCH_DEPTH = 256
+
+def iter_component_info(file_list, n_workers=16, prefetch=PREFETCH_DEPTH):
+    """Yields the get_component_info tuple of every file in file_list, in order, while a pool of
+n_workers threads reads and parses the files ahead of the consumer, so that the file reads
+(disk or network latency) overlap with the work done on each tuple, such as building the
+Tissue. At most prefetch files are read ahead: the pool waits for the consumer when that
+many parsed tuples are queued."""
+    from concurrent.futures import ThreadPoolExecutor
+    import collections
+    import itertools
+
+    if n_workers == 1 or prefetch < 1:
+        for filename in file_list:
+            Profiling.count('files parsed')
+            yield get_component_info(filename)
+        return
+    files = iter(file_list)
+    executor = ThreadPoolExecutor(max_workers=n_workers)
+    try:
+        pending = collections.deque(executor.submit(get_component_info, filename) for filename in itertools.islice(files, prefetch))
+        while len(pending) > 0:
+            component_info = pending.popleft().result()
+            for filename in itertools.islice(files, 1):
+                pending.append(executor.submit(get_component_info, filename))
+            Profiling.count('files parsed')
+            yield component_info
+    finally:
+        #a consumer that stops early leaves the files not yet started unread
+        executor.shutdown(wait=True, cancel_futures=True)
     
+@Profiling.profiled('get_file_list')
 def get_file_list(path):
     """Finds all of the .txt files in the folder defined by path and saves their names to a list, which it returns"""
     import os
@@ -92,106 +153,192 @@ def get_file_list(path):
 
     return file_list
 
-def export_to_excel(contact_sizes_dict, contact_types_list, cell_metrics_dict, voxel_size, beta_beta_contacts_list):
+#Rewritten 2026-10 around whole-row writes in xlsxwriter's constant_memory mode
+EXCLUDED_CONTACT_TYPES = [('capillary','peri'), ('capillary','capillary'), ('peri','peri'), ('exocrine', 'peri'), ('exocrine', 'capillary'), ('exocrine', 'exocrine')]
+
+def write_columns(sheet, header, columns, first_column=0):
+    """Writes a header row and then columns of unequal length to a worksheet, one whole row
+at a time (constant_memory worksheets must be written in row order). Columns may be
+lists or pre-built arrays; cells past the end of a column are left empty."""
+    import itertools
+
+    sheet.write_row(0, first_column, header)
+    row = 1
+    for values in itertools.zip_longest(*columns):
+        sheet.write_row(row, first_column, values)
+        row = row + 1
+
+@Profiling.profiled('export_to_excel')
+def export_to_excel(contact_sizes_dict, contact_types_list, cell_metrics_dict, voxel_size, beta_beta_contacts_list, filename='Results.xlsx', backend=None):
     import xlsxwriter
     """Writes the quantitative information about the components and the contacts to an Excel spreadsheet
-saved in the same folder - compiles the data for easy downstream analysis"""
+saved in the same folder - compiles the data for easy downstream analysis
+Edited 2026-10: if an output backend from Contact_Handler_output is given, the same tables are
+written through it instead (named after filename)"""
+    if backend is not None:
+        import os
+        backend.write_results(contact_sizes_dict, contact_types_list, cell_metrics_dict, voxel_size, beta_beta_contacts_list,
+                              os.path.splitext(os.path.basename(filename))[0])
+        return
     
-    wb = xlsxwriter.Workbook('Results.xlsx')
+    wb = xlsxwriter.Workbook(filename, {'constant_memory': True})
     
     sheet1 = wb.add_worksheet('Contact Sizes (voxels)')
     sheet2 = wb.add_worksheet('Contact Sizes (um^2)')
 
-    for i in range(len(contact_types_list)):
-        if contact_types_list[i] != ('capillary','peri') and contact_types_list[i] != ('capillary','capillary') and contact_types_list[i] != ('peri','peri') and contact_types_list[i] !=('exocrine', 'peri') and contact_types_list[i] !=('exocrine', 'capillary') and contact_types_list[i] !=('exocrine', 'exocrine') :
-            sheet1.write(0, i, str(contact_types_list[i]))
-            sheet2.write(0, i, str(contact_types_list[i]))
-            for j in range(len(contact_sizes_dict[contact_types_list[i]])):
-                sheet1.write(j+1, i, contact_sizes_dict[contact_types_list[i]][j])
-                sheet2.write(j+1, i, contact_sizes_dict[contact_types_list[i]][j]*voxel_size)
-
-            
+    #excluded contact types leave an empty column, as before
+    header = []
+    voxel_columns = []
+    area_columns = []
+    for contact_type in contact_types_list:
+        if contact_type not in EXCLUDED_CONTACT_TYPES:
+            header.append(str(contact_type))
+            voxel_columns.append(contact_sizes_dict[contact_type])
+            area_columns.append([size*voxel_size for size in contact_sizes_dict[contact_type]])
+        else:
+            header.append(None)
+            voxel_columns.append([])
+            area_columns.append([])
+    write_columns(sheet1, header, voxel_columns)
+    write_columns(sheet2, header, area_columns)
 
     cell_type_list = sorted(cell_metrics_dict.keys())
 
     for k in range(len(cell_type_list)):
         working_cell_list = cell_metrics_dict[cell_type_list[k]]
         working_sheet = wb.add_worksheet(str(cell_type_list[k]))
-        working_sheet.write(0,0, 'Identifier')
-        working_sheet.write(0,1, 'Surface Area')
-        working_sheet.write(0,2, 'Volume')
-        working_sheet.write(0,3, 'Sphericity')
-        working_sheet.write(0,4, 'Bounding Box 1')
-        working_sheet.write(0,5, 'Bounding Box 2')
-        working_sheet.write(0,6, 'Bounding Box 3')
-        working_sheet.write(0,7, 'Ellipticity Prolate')
-        working_sheet.write(0,8, 'Ellipticity Oblate')
-        working_sheet.write(0,9, 'Surface Voxels')
-        working_sheet.write(0,10, 'Calculated Surface Area')
-        for p in range(len(contact_types_list)):
-            working_sheet.write(0, 11+p, str(contact_types_list[p])+' Count')
-            working_sheet.write(0, 11+p+len(contact_types_list), str(contact_types_list[p])+ ' Proportion')
+        working_sheet.write_row(0, 0, ['Identifier', 'Surface Area', 'Volume', 'Sphericity', 'Bounding Box 1',
+                                       'Bounding Box 2', 'Bounding Box 3', 'Ellipticity Prolate', 'Ellipticity Oblate',
+                                       'Surface Voxels', 'Calculated Surface Area']
+                                + [str(contact_type)+' Count' for contact_type in contact_types_list]
+                                + [str(contact_type)+ ' Proportion' for contact_type in contact_types_list])
 
         for m in range(len(working_cell_list)):
-            working_sheet.write(m+1, 0, working_cell_list[m][0])
-            working_sheet.write(m+1, 1, working_cell_list[m][1])
-            working_sheet.write(m+1, 2, working_cell_list[m][2])
-            working_sheet.write(m+1, 3, working_cell_list[m][3])
-            working_sheet.write(m+1, 4, working_cell_list[m][4][0])
-            working_sheet.write(m+1, 5, working_cell_list[m][4][1])
-            working_sheet.write(m+1, 6, working_cell_list[m][4][2])
-            working_sheet.write(m+1, 7, working_cell_list[m][5])
-            working_sheet.write(m+1, 8, working_cell_list[m][6])
-            working_sheet.write(m+1, 9, working_cell_list[m][7])
-            working_sheet.write(m+1, 10, working_cell_list[m][7]*voxel_size)
-            for n in range(len(contact_types_list)):
-                working_sheet.write(m+1, 11+n, working_cell_list[m][8][n])
-                working_sheet.write(m+1, 11+n+len(contact_types_list), working_cell_list[m][9][n]/working_cell_list[m][7])
+            (identifier, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o,
+             surface_voxels, contacts_counts, contacts_area) = working_cell_list[m]
+            working_sheet.write_row(m+1, 0, [identifier, surface_area, volume, sphericity, bounding_box[0],
+                                             bounding_box[1], bounding_box[2], ellipticity_p, ellipticity_o,
+                                             surface_voxels, surface_voxels*voxel_size]
+                                    + list(contacts_counts) + [area/surface_voxels for area in contacts_area])
 
     #This part added January 2020 - information for beta cell graph theory connectivity analysis
     last_sheet = wb.add_worksheet('Beta-Beta Contacts')
     beta_cell_list = cell_metrics_dict['beta']
-    last_sheet.write(0,0,'Fully embedded Beta Cells')
-    for q in range(len(beta_cell_list)):
-        last_sheet.write(q+1, 0, beta_cell_list[q][0])
-        
-    last_sheet.write(0,2,'Vertex 1')
-    last_sheet.write(0,3,'Vertex 2')
-    last_sheet.write(0,4,'Edge Weight')
-    for s in range(len(beta_beta_contacts_list)):
-        last_sheet.write(s+1,2, beta_beta_contacts_list[s][0])
-        last_sheet.write(s+1,3, beta_beta_contacts_list[s][1])
-        last_sheet.write(s+1,4, beta_beta_contacts_list[s][2])
+    write_columns(last_sheet, ['Fully embedded Beta Cells', None, 'Vertex 1', 'Vertex 2', 'Edge Weight'],
+                  [[cell[0] for cell in beta_cell_list], [],
+                   [contact[0] for contact in beta_beta_contacts_list],
+                   [contact[1] for contact in beta_beta_contacts_list],
+                   [contact[2] for contact in beta_beta_contacts_list]])
     
     wb.close()
     
 
 
 #Added 2023-03-19
-def export_permutation_beta(p_contact_types_list, beta_contacts_size_p, beta_contacts_counts_p, beta_contacts_proportion_p):
+@Profiling.profiled('export_permutation_beta')
+def export_permutation_beta(p_contact_types_list, beta_contacts_size_p, beta_contacts_counts_p, beta_contacts_proportion_p, filename='Results_permute.xlsx', backend=None):
     import xlsxwriter
     
     """#Writes the information from the permutation analysis to an Excel spreadsheet
 #saved in the same folder - compiles the data for easy downstream analysis
+#Edited 2026-10: optionally written through an output backend instead (see export_to_excel)
 """
+    if backend is not None:
+        import os
+        backend.write_permutation(p_contact_types_list, beta_contacts_size_p, beta_contacts_counts_p, beta_contacts_proportion_p,
+                                  os.path.splitext(os.path.basename(filename))[0])
+        return
     
-    wb = xlsxwriter.Workbook('Results_permute.xlsx')
-    sheet1 = wb.add_worksheet('Contact Type Sizes (um^2)')
-    sheet2 = wb.add_worksheet('Contact Type Counts')
-    sheet3 = wb.add_worksheet('Contact Type Proportions')
+    wb = xlsxwriter.Workbook(filename, {'constant_memory': True})
+    header = [str(p_contact_type) for p_contact_type in p_contact_types_list]
+    write_columns(wb.add_worksheet('Contact Type Sizes (um^2)'), header, beta_contacts_size_p)
+    write_columns(wb.add_worksheet('Contact Type Counts'), header, beta_contacts_counts_p)
+    write_columns(wb.add_worksheet('Contact Type Proportions'), header, beta_contacts_proportion_p)
     
-    for i in range(len(p_contact_types_list)):
-        sheet1.write(0, i, str(p_contact_types_list[i]))
-        sheet2.write(0, i, str(p_contact_types_list[i]))
-        sheet3.write(0, i, str(p_contact_types_list[i]))
+    wb.close()
         
-        for j in range(len(beta_contacts_size_p[i])):
-            sheet1.write(j+1,i,beta_contacts_size_p[i][j])
-            
-        for k in range(len(beta_contacts_counts_p[i])):
-            sheet2.write(k+1,i,beta_contacts_counts_p[i][k])
-            sheet3.write(k+1,i,beta_contacts_proportion_p[i][k])
-    
+
+#Added 2026-10
+@Profiling.profiled('export_permutation_network')
+def export_permutation_network(network_names, network_p, observed=None, filename='Results_permute_network.xlsx'):
+    """Writes the network statistics of the beta-beta subgraph for every permutation (one row
+per permutation) to an Excel spreadsheet, after the observed values if given"""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(filename, {'constant_memory': True, 'nan_inf_to_errors': True})
+    sheet = wb.add_worksheet('Network Statistics')
+    sheet.write_row(0, 1, network_names)
+    row = 1
+    if observed is not None:
+        sheet.write(row, 0, 'Observed')
+        sheet.write_row(row, 1, list(observed))
+        row = row + 1
+    for perm in range(len(network_p)):
+        sheet.write(row, 0, perm + 1)
+        sheet.write_row(row, 1, network_p[perm])
+        row = row + 1
+    wb.close()
+
+def write_table(sheet, header, rows):
+    """Writes a header row and then the rows of a table to a worksheet (None cells are left empty)"""
+    for i in range(len(header)):
+        sheet.write(0, i, header[i])
+    for j in range(len(rows)):
+        for i in range(len(rows[j])):
+            if rows[j][i] is not None:
+                sheet.write(j+1, i, rows[j][i])
+
+@Profiling.profiled('export_permutation_summary')
+def export_permutation_summary(header, rows, filename='Results_permute_summary.xlsx'):
+    """Writes the streaming permutation statistics (StreamingPermutationStatistics.summary_table)
+to an Excel spreadsheet, one row per contact type and statistic"""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(filename, {'nan_inf_to_errors': True})
+    write_table(wb.add_worksheet('Permutation Summary'), header, rows)
+    wb.close()
+
+#Added 2026-10
+@Profiling.profiled('export_permutation_significance')
+def export_permutation_significance(header, rows, filename='Results_permute_significance.xlsx'):
+    """Writes the observed-vs-null significance report (PermutationSignificance.table) to an
+Excel spreadsheet, one row per contact type and statistic"""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(filename, {'nan_inf_to_errors': True})
+    write_table(wb.add_worksheet('Significance'), header, rows)
+    wb.close()
+
+@Profiling.profiled('export_sweep_summary')
+def export_sweep_summary(cell_header, cell_rows, contact_header, contact_rows, filename='Sweep.xlsx'):
+    """Writes the threshold sweep summary (Contact_Handler_sweep) to an Excel spreadsheet:
+cell counts by type and contact statistics by contact type, one row per sweep point"""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(filename, {'nan_inf_to_errors': True})
+    write_table(wb.add_worksheet('Cells by Type'), cell_header, cell_rows)
+    write_table(wb.add_worksheet('Contacts by Type'), contact_header, contact_rows)
+    wb.close()
+
+@Profiling.profiled('export_cohort_summary')
+def export_cohort_summary(header, rows, filename='Cohort_summary.xlsx'):
+    """Writes the batch driver's cohort summary (Contact_Handler_batch) to an Excel spreadsheet,
+one row per islet"""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(filename, {'nan_inf_to_errors': True})
+    write_table(wb.add_worksheet('Cohort Summary'), header, rows)
+    wb.close()
+
+@Profiling.profiled('export_network_summary')
+def export_network_summary(summary_dict, vertex_header, vertex_rows, filename='Network.xlsx'):
+    """Writes the beta cell network metrics (Contact_Handler_network.BetaNetwork summary and
+vertex_table) to an Excel spreadsheet"""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(filename, {'constant_memory': True, 'nan_inf_to_errors': True})
+    write_table(wb.add_worksheet('Network Summary'), ['Metric', 'Value'], [[key, value] for key, value in summary_dict.items()])
+    write_table(wb.add_worksheet('Vertices'), vertex_header, vertex_rows)
     wb.close()
         
 
@@ -10,11 +10,37 @@ import Contact_Handler_IO as IO
 import Contact_Handler_definitions as Definitions
 import Contact_Handler_component_type as Component_Type
 import Contact_Handler_graphs as Graphs
+import Contact_Handler_cache as Cache
+import Contact_Handler_output as Output
+import Contact_Handler_incremental as Incremental
+import Contact_Handler_network as Network
+import Contact_Handler_profiling as Profiling
+import Contact_Handler_contact_table as Contact_Table
+
+#Added 2026-10: 'excel' (default), 'csv', 'parquet' or 'hdf5' - see Contact_Handler_output
+output_backend = 'excel'
+#Added 2026-10: keep the built Tissue between runs and only redo the component files that changed
+incremental_analysis = False
+#Added 2026-10: also write the beta-beta network metrics to Network.xlsx
+network_analysis = False
+#Added 2026-10: record the wall time, CPU time, peak memory and item counts of every pipeline stage
+#to Profile.json; profile_stage names one stage (e.g. 'compile_cells_and_contacts') to also capture with
+#cProfile into Profile.prof; profile_memory also traces the peak Python memory of every stage (much slower)
+profile_run = False
+profile_stage = None
+profile_memory = False
+#Added 2026-10: how many component files are read ahead (on a thread pool) of the contact building
+prefetch_depth = 256
+
+if profile_run:
+    Profiling.enable(profile_memory, profile_stage)
 
 #Find the files and load in the list of tissue components and the type for each component
 file_list = sorted(IO.get_file_list('.'))
 #The channel intensity file should be the first one in the folder
-component_channels_dict = IO.get_component_channels(file_list[-1])
+#Edited 2026-10: parsed data is reused from the cache unless the files have changed
+cache = Cache.TissueCache('.')
+component_channels_dict = cache.component_channels(file_list[-1])
 #This assumes that the channels are in a file labeled "intensity" and the components are
 #in files labeled "downsampled" - may need to change this for different labeling conventions
 
@@ -23,40 +49,56 @@ Component_Type.component_type_histograms(component_channels_dict)
 component_types_dict = Component_Type.component_type_calculator(component_channels_dict)
 #
 #
-current_tissue = Definitions.Tissue(dict(), dict(), [])
-##Initialize all of the components in the tissue
-for component_name, component_type in component_types_dict.items():
-    c = Definitions.Component(component_name, component_type)
-    current_tissue.new_component(c)
-
-#Go through the remaining files and read in the contact-specific and component-specific spatial information
-#This assumes that the channels are in a file labeled "zzzChannel" and the components are
-#in files labeled pretty much anything else - may need to change this for different labeling conventions
-    #The "zzzChannel" thing is kind of cheating, but I don't care
-for i in range(len(file_list)-1):
-    (name, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size, contacts_list) = IO.get_component_info(file_list[i])
-    working_component = current_tissue.components_dict[name]
-    working_component.add_component_features(surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size)
-
-    
-    for j,k in contacts_list:
-        contact_name = tuple(sorted([name, j]))
-        if contact_name in current_tissue.contacts_dict.keys():
-            current_tissue.contacts_dict[contact_name].add_replicate_measurement(k)
-        else:
-            current_tissue.contacts_dict[contact_name]=Definitions.Contact(working_component, current_tissue.components_dict[j], k)
-
-        working_component.add_contact(current_tissue.contacts_dict[contact_name])
-
-
-#decide which components are "cells" - i.e. entirely within the image and involved in an endocrine-labeled contact
-current_tissue.find_cells()
-#print(current_tissue.cells_list)
-#crunch the data to put it in lists that are more useable
-current_tissue.compile_cells_and_contacts()
-current_tissue.compile_beta_beta_contacts()#Added January 2020
+if incremental_analysis:
+    #Only the component files changed since the last run, and the Components touching them, are redone
+    #(the saved state is dropped if the component types have changed)
+    incremental_tissue = Incremental.load_incremental_tissue(file_list[-1], component_types_dict)
+    if incremental_tissue is None:
+        incremental_tissue = Incremental.IncrementalTissue(component_types_dict, file_list[-1])
+    incremental_tissue.update(file_list[:-1])
+    incremental_tissue.save()
+    current_tissue = incremental_tissue.tissue
+else:
+    current_tissue = Definitions.Tissue(dict(), dict(), [])
+    ##Initialize all of the components in the tissue
+    for component_name, component_type in component_types_dict.items():
+        c = Definitions.Component(component_name, component_type)
+        current_tissue.new_component(c)
+
+    #Go through the remaining files and read in the contact-specific and component-specific spatial information
+    #This assumes that the channels are in a file labeled "zzzChannel" and the components are
+    #in files labeled pretty much anything else - may need to change this for different labeling conventions
+        #The "zzzChannel" thing is kind of cheating, but I don't care
+    #Edited 2026-10: the component files not in the cache are read on a thread pool, prefetch_depth files
+    #ahead of the contact building, so that reading the files overlaps with it
+    component_info_list = cache.iter_component_info(file_list[:-1], prefetch=prefetch_depth)
+    #Edited 2026-10: timed as the 'build contacts' stage when profiling
+    #Edited 2026-10: the contact lines of all files are grouped into Contacts in bulk (Contact_Handler_contact_table)
+    #instead of one contacts_dict lookup per line; the Tissue is the same
+    with Profiling.stage('build contacts') as stage:
+        Contact_Table.build_tissue_contacts(current_tissue, component_info_list)
+        stage.count('contacts built', len(current_tissue.contacts_dict))
+    cache.save()
+
+
+    #decide which components are "cells" - i.e. entirely within the image and involved in an endocrine-labeled contact
+    current_tissue.find_cells()
+    #print(current_tissue.cells_list)
+    #crunch the data to put it in lists that are more useable
+    current_tissue.compile_cells_and_contacts()
+    current_tissue.compile_beta_beta_contacts()#Added January 2020
 #print(current_tissue.contact_sizes_dict.keys())
 #export data to an Excel spreadsheet
 IO.export_to_excel(current_tissue.contact_sizes_dict, current_tissue.contact_types_list,
-                   current_tissue.cell_metrics_dict, current_tissue.voxel_size, current_tissue.beta_beta_contacts_list)
+                   current_tissue.cell_metrics_dict, current_tissue.voxel_size, current_tissue.beta_beta_contacts_list,
+                   backend=Output.get_backend(output_backend))
+
+if network_analysis:
+    with Profiling.stage('network analysis'):
+        #every beta cell is a vertex, so the cells without beta-beta contacts count as isolated
+        beta_cells = [name for name, component_type in component_types_dict.items() if component_type == 'beta']
+        beta_network = Network.BetaNetwork(current_tissue.beta_beta_contacts_list, beta_cells)
+        IO.export_network_summary(beta_network.summary(), *beta_network.vertex_table())
 
+if profile_run:
+    Profiling.write_report('Profile.json', 'Profile.prof')
@@ -0,0 +1,203 @@
+#Contact Handler array-backed tissue
+#Added 2026-10 for whole-pancreas datasets
+
+"""This module defines the ArrayTissue class, a compact alternative to the
+Tissue/Component/Contact object graph in Contact_Handler_definitions. Component
+identifiers are interned to integer ids, component features are stored as
+NumPy columns, and contacts are stored as parallel arrays (i, j, size_a, size_b,
+with type codes derived from the component type codes) with a CSR adjacency
+(one half-edge per entry of a Component's contact_list). ArrayTissue keeps the Tissue attributes and the find_cells,
+compile_cells_and_contacts and compile_beta_beta_contacts methods, which produce
+the same cells_list, contact_types_list, cell_metrics_dict, contact_sizes_dict
+and beta_beta_contacts_list as the object-based Tissue."""
+
+import copy
+
+import numpy as np
+
+import Contact_Handler_contact_table as Contact_Table
+import Contact_Handler_profiling as Profiling
+
+
+class ArrayTissue:
+    """An ArrayTissue is built from the component_types_dict returned by
+Component_Type.component_type_calculator (which fixes the component order) and
+the list of get_component_info tuples (which fixes the order of the contacts).
+
+Contacts are indexed by contact id in order of first appearance (the
+contacts_dict order of a Tissue). i and j are the component ids of the two
+sides, ordered by identifier like a Contact identifier; size_a and size_b hold
+the first two replicate measurements (nan if missing), voxel_sum and
+n_measurements hold all of them. The half-edges of component c are
+half_edge_contacts[indptr[c]:indptr[c+1]], in contact_list order."""
+    def __init__(self, component_types_dict, component_info_list):
+        self.component_names = list(component_types_dict.keys())
+        self.component_index = {name: i for i, name in enumerate(self.component_names)}
+        self.type_names = sorted(set(component_types_dict.values()))
+        self.type_index = {name: i for i, name in enumerate(self.type_names)}
+        self.type_codes = np.array([self.type_index[component_type] for component_type in component_types_dict.values()],
+                                   dtype=np.int32)
+
+        n = len(self.component_names)
+        self.surface_area = np.full(n, np.nan)
+        self.volume = np.full(n, np.nan)
+        self.sphericity = np.full(n, np.nan)
+        self.bounding_box = np.full((n, 3), np.nan)
+        self.ellipticity_p = np.full(n, np.nan)
+        self.ellipticity_o = np.full(n, np.nan)
+        self.surface_voxels = np.full(n, np.nan)
+        self.distance_to_edge = np.full(n, np.nan)
+        self.component_voxel_size = np.full(n, np.nan)
+
+        self._build_contacts(component_info_list)
+
+        #Tissue attributes filled in by the compile methods
+        self.cells_list = []
+        self.cell_metrics_dict = dict()
+        self.contact_sizes_dict = dict()
+        self.contact_types_list = []
+        self.beta_beta_contacts_list = []
+        self.voxel_size = float(1)
+
+    def with_types(self, component_types):
+        """Returns an ArrayTissue that shares this one's feature and contact arrays (nothing
+is copied) but has new component types, given as a sequence in component order.
+Its result attributes start out empty."""
+        view = copy.copy(self)
+        view.type_names = sorted(set(component_types))
+        view.type_index = {name: i for i, name in enumerate(view.type_names)}
+        view.type_codes = np.array([view.type_index[component_type] for component_type in component_types], dtype=np.int32)
+        view.cells_list = []
+        view.cell_metrics_dict = dict()
+        view.contact_sizes_dict = dict()
+        view.contact_types_list = []
+        view.beta_beta_contacts_list = []
+        view.voxel_size = float(1)
+        return view
+
+    def _build_contacts(self, component_info_list):
+        """Fills the feature columns and builds the contact arrays and the CSR adjacency
+Edited 2026-10: the contacts are grouped in bulk by Contact_Table.ContactTable"""
+        def features(owner, component_info):
+            (name, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels,
+             distance_to_edge, voxel_size, contacts_list) = component_info
+            self.surface_area[owner] = surface_area
+            self.volume[owner] = volume
+            self.sphericity[owner] = sphericity
+            self.bounding_box[owner] = bounding_box
+            self.ellipticity_p[owner] = ellipticity_p
+            self.ellipticity_o[owner] = ellipticity_o
+            self.surface_voxels[owner] = s_voxels
+            self.distance_to_edge[owner] = distance_to_edge
+            self.component_voxel_size[owner] = voxel_size
+
+        (owners, others, voxels) = Contact_Table.gather_half_edges(self.component_index, component_info_list, features)
+        table = Contact_Table.ContactTable(owners, others, voxels, Contact_Table.name_ranks(self.component_names))
+        self.i = table.i.astype(np.int32)
+        self.j = table.j.astype(np.int32)
+        self.size_a = table.size_a
+        self.size_b = table.size_b
+        self.voxel_sum = table.voxel_sum
+        self.n_measurements = table.n_measurements.astype(np.int32)
+
+        order = table.owner_order()
+        self.half_edge_owners = owners[order].astype(np.int32)
+        self.half_edge_contacts = table.half_edge_contacts[order].astype(np.int32)
+        self.indptr = np.zeros(len(self.component_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owners, minlength=len(self.component_names)), out=self.indptr[1:])
+
+    def contact_sizes(self):
+        """Returns the average of the replicate measurements of every contact (Contact.get_size)"""
+        return self.voxel_sum/self.n_measurements
+
+    def contact_type_codes(self):
+        """Returns the type code of every contact: lo*len(type_names) + hi, where lo <= hi are
+the type codes of its two sides, so that the code sorts like the contact_type tuple"""
+        a = self.type_codes[self.i]
+        b = self.type_codes[self.j]
+        return np.minimum(a, b).astype(np.int64)*len(self.type_names) + np.maximum(a, b)
+
+    def contact_type_name(self, type_code):
+        """Returns the contact_type tuple of a contact type code"""
+        return (self.type_names[type_code//len(self.type_names)], self.type_names[type_code % len(self.type_names)])
+
+    @Profiling.profiled('find_cells')
+    def find_cells(self):
+        """Same as Tissue.find_cells: fills cells_list with the components fully inside the
+image that touch an alpha, delta or beta component, and sets contact_types_list."""
+        type_codes = self.contact_type_codes()
+        half_edge_types = type_codes[self.half_edge_contacts]
+        self.contact_types_list = [self.contact_type_name(code) for code in np.unique(half_edge_types).tolist()]
+
+        endocrine = np.array([name in ('alpha', 'delta', 'beta') for name in self.type_names])
+        touching = endocrine[self.type_codes[self.i]] | endocrine[self.type_codes[self.j]]
+        touching_endocrine = np.bincount(self.half_edge_owners, weights=touching[self.half_edge_contacts],
+                                         minlength=len(self.component_names)) > 0
+        cells = np.flatnonzero(touching_endocrine & (self.distance_to_edge > 0.2))
+        self.cells_list.extend([self.component_names[c] for c in cells.tolist()])
+
+    @Profiling.profiled('compile_cells_and_contacts')
+    def compile_cells_and_contacts(self):
+        """Same as Tissue.compile_cells_and_contacts, for the components in cells_list"""
+        n_types = len(self.contact_types_list)
+        type_codes = self.contact_type_codes()
+        column_lookup = np.full(len(self.type_names)**2, -1, dtype=np.int64)
+        for column, contact_type in enumerate(self.contact_types_list):
+            column_lookup[self.type_index[contact_type[0]]*len(self.type_names) + self.type_index[contact_type[1]]] = column
+
+        cells = np.array([self.component_index[cell] for cell in self.cells_list], dtype=np.int64)
+        starts = self.indptr[cells]
+        lengths = self.indptr[cells + 1] - starts
+        rows = np.repeat(np.arange(len(cells)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        half_edges = np.repeat(starts, lengths) + offsets
+        contacts = self.half_edge_contacts[half_edges]
+        measured_twice = self.n_measurements[contacts] == 2
+        rows = rows[measured_twice]
+        contacts = contacts[measured_twice]
+
+        sizes = self.contact_sizes()
+        columns = column_lookup[type_codes[contacts]]
+        flat = rows*n_types + columns
+        counts = np.bincount(flat, minlength=len(cells)*n_types).reshape(-1, n_types)
+        areas = np.bincount(flat, weights=sizes[contacts], minlength=len(cells)*n_types).reshape(-1, n_types)
+
+        #each contact is added to contact_sizes_dict once, the first time one of its cells is reached
+        first = np.sort(np.unique(contacts, return_index=True)[1])
+        for contact in contacts[first].tolist():
+            contact_type = self.contact_type_name(int(type_codes[contact]))
+            try:
+                self.contact_sizes_dict[contact_type].append(float(sizes[contact]))
+            except KeyError:
+                self.contact_sizes_dict[contact_type] = [float(sizes[contact])]
+
+        counts = counts.tolist()
+        areas = areas.tolist()
+        for row in range(len(cells)):
+            c = int(cells[row])
+            metrics = (self.component_names[c], float(self.surface_area[c]), float(self.volume[c]),
+                       float(self.sphericity[c]), tuple(self.bounding_box[c].tolist()), float(self.ellipticity_p[c]),
+                       float(self.ellipticity_o[c]), float(self.surface_voxels[c]), counts[row], areas[row])
+            try:
+                self.cell_metrics_dict[self.type_names[self.type_codes[c]]].append(metrics)
+            except KeyError:
+                self.cell_metrics_dict[self.type_names[self.type_codes[c]]] = [metrics]
+
+        if len(cells) > 0:
+            self.voxel_size = float(self.component_voxel_size[cells[-1]])
+
+    @Profiling.profiled('compile_beta_beta_contacts')
+    def compile_beta_beta_contacts(self):
+        """Same as Tissue.compile_beta_beta_contacts: every beta-beta contact measured twice,
+as (vertex, vertex, weight) tuples in contacts_dict order"""
+        beta = self.type_index.get('beta', -1)
+        selected = np.flatnonzero((self.type_codes[self.i] == beta) & (self.type_codes[self.j] == beta)
+                                  & (self.n_measurements == 2))
+        sizes = self.contact_sizes()[selected].tolist()
+        for contact, size in zip(selected.tolist(), sizes):
+            self.beta_beta_contacts_list.append((self.component_names[self.i[contact]],
+                                                 self.component_names[self.j[contact]], size))
+
+    def memory_usage(self):
+        """Returns the number of bytes held in the ArrayTissue's NumPy arrays"""
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
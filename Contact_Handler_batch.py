@@ -0,0 +1,210 @@
+#Contact Handler batch driver
+#Added 2026-10 for cohorts of islets
+
+"""This module runs the Contact_Handler_Main pipeline (ingest, classification,
+compile and export) over many dataset folders at once, one islet per process
+with a bounded number of processes. Every islet writes its Channels.xlsx,
+results and parsed data cache into its own output folder, so the dataset
+folders are only read; at the end one cohort summary table with a row per
+islet is written to the output root. An islet that fails is reported in the
+summary instead of stopping the batch. Run it as
+python Contact_Handler_batch.py output_folder islet_folder_1 islet_folder_2 ...
+Edited 2026-10: run_permutation_batch runs the permutation analysis of every islet
+instead, with the sequential scheduler: --permutations sets the budget per islet,
+and each islet stops once every statistic has settled under --stopping. --types sets
+the endocrine types whose labels are shuffled (beta, alpha and delta by default). The
+cohort table gives the permutations and CPU time each islet used."""
+
+import math
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import Contact_Handler_IO as IO
+import Contact_Handler_component_type as Component_Type
+import Contact_Handler_output as Output
+import Contact_Handler_pipeline as Pipeline
+import Contact_Handler_statistics as Statistics
+
+#The endocrine types whose labels the permutation batch shuffles: shuffling the beta labels
+#alone only swaps beta cells with each other, which leaves every permutation equal to the tissue
+ENDOCRINE_TYPES = ('beta', 'alpha', 'delta')
+
+def analyze_islet(path, output_dir, output_backend='excel', io_workers=4):
+    """Runs the Contact_Handler_Main pipeline on the exports in path and writes its outputs
+into output_dir. Returns (n_components, cells, contacts, n_beta_beta) where cells and
+contacts are as in Pipeline.summarize_tissue."""
+    os.makedirs(output_dir, exist_ok=True)
+    (tissue, component_types_dict) = Pipeline.load_tissue(path, output_dir, os.path.join(output_dir, 'Channels.xlsx'), io_workers)
+
+    (cells, contacts) = Pipeline.summarize_tissue(tissue)
+    tissue.compile_beta_beta_contacts()
+    IO.export_to_excel(tissue.contact_sizes_dict, tissue.contact_types_list, tissue.cell_metrics_dict,
+                       tissue.voxel_size, tissue.beta_beta_contacts_list,
+                       backend=Output.get_backend(output_backend, output_dir))
+    return (len(component_types_dict), cells, contacts, len(tissue.beta_beta_contacts_list))
+
+
+def permute_islet(path, output_dir, endocrine_types=ENDOCRINE_TYPES, n_permutations=10000, seed=0, stopping_rule='besag_clifford',
+                  stopping_exceedances=10, p_adjustment='holm'):
+    """Runs the permutation analysis of the exports in path (streaming statistics, one process),
+shuffling the labels of the endocrine_types, with n_permutations as the budget and writes Results_permute_summary.xlsx and
+Results_permute_significance.xlsx into output_dir; stopping_rule=None runs the whole
+budget. Returns (permutations used, statistics tested, statistics with an adjusted
+p-value below 0.05, CPU seconds)."""
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.process_time()
+    results = Pipeline.run_permutation_analysis(path, endocrine_types, n_permutations=n_permutations, seed=seed,
+                                                streaming_statistics=True, output_dir=output_dir, n_workers=1,
+                                                lazy_loading=True, significance_report=True, p_adjustment=p_adjustment,
+                                                stopping_rule=stopping_rule, stopping_exceedances=stopping_exceedances,
+                                                cache_path=output_dir)['uniform']
+    significance = results.significance
+    tested = [p_value for p_value in significance.adjusted_p_values(p_adjustment).ravel().tolist() if not math.isnan(p_value)]
+    return (significance.n_permutations, len(tested), sum(p_value < 0.05 for p_value in tested), time.process_time() - start)
+
+
+def _run_islet(analysis, path, output_dir, arguments):
+    """Process pool task running analysis(path, output_dir, *arguments): returns
+(summary, None, seconds) or (None, error message, seconds)"""
+    start = time.perf_counter()
+    try:
+        summary = analysis(path, output_dir, *arguments)
+        return (summary, None, time.perf_counter() - start)
+    except Exception as error:
+        with open(os.path.join(output_dir, 'error.txt'), 'w') as f:
+            f.write(traceback.format_exc())
+        return (None, '%s: %s' % (type(error).__name__, error), time.perf_counter() - start)
+
+
+def islet_output_dirs(dataset_dirs, output_root):
+    """Returns one output folder per dataset folder, named after it (with _2, _3, ... added if
+two dataset folders have the same name)"""
+    output_dirs = []
+    used = set()
+    for path in dataset_dirs:
+        name = os.path.basename(os.path.abspath(path))
+        candidate = name
+        n = 1
+        while candidate in used:
+            n = n + 1
+            candidate = '%s_%d' % (name, n)
+        used.add(candidate)
+        output_dirs.append(os.path.join(output_root, candidate))
+    return output_dirs
+
+
+def run_batch(dataset_dirs, output_root, max_workers=4, output_backend='excel', io_workers=4,
+              summary_filename='Cohort_summary.xlsx'):
+    """Analyzes every dataset folder with at most max_workers islets in flight and writes the
+cohort summary to output_root. Returns the (header, rows) of the summary."""
+    output_dirs = islet_output_dirs(dataset_dirs, output_root)
+    outcomes = _run_islets(analyze_islet, (output_backend, io_workers), dataset_dirs, output_dirs, max_workers)
+    (header, rows) = cohort_summary_table(dataset_dirs, output_dirs, outcomes)
+    IO.export_cohort_summary(header, rows, os.path.join(output_root, summary_filename))
+    return (header, rows)
+
+
+def run_permutation_batch(dataset_dirs, output_root, max_workers=4, endocrine_types=ENDOCRINE_TYPES, n_permutations=10000, seed=0,
+                          stopping_rule='besag_clifford', stopping_exceedances=10, p_adjustment='holm',
+                          summary_filename='Cohort_permutations.xlsx'):
+    """Runs permute_islet on every dataset folder with at most max_workers islets in flight
+(each islet runs its permutations in one process) and writes the cohort table of
+permutation_summary_table to output_root. Returns its (header, rows)."""
+    output_dirs = islet_output_dirs(dataset_dirs, output_root)
+    arguments = (endocrine_types, n_permutations, seed, stopping_rule, stopping_exceedances, p_adjustment)
+    outcomes = _run_islets(permute_islet, arguments, dataset_dirs, output_dirs, max_workers)
+    (header, rows) = permutation_summary_table(dataset_dirs, output_dirs, outcomes, n_permutations)
+    IO.export_cohort_summary(header, rows, os.path.join(output_root, summary_filename))
+    return (header, rows)
+
+
+def _run_islets(analysis, arguments, dataset_dirs, output_dirs, max_workers):
+    """Runs analysis on every dataset folder, max_workers at a time, and returns the
+_run_islet outcomes in dataset order"""
+    for output_dir in output_dirs:
+        os.makedirs(output_dir, exist_ok=True)
+    if max_workers == 1:
+        return [_run_islet(analysis, path, output_dir, arguments) for path, output_dir in zip(dataset_dirs, output_dirs)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_islet, analysis, path, output_dir, arguments)
+                   for path, output_dir in zip(dataset_dirs, output_dirs)]
+        return [future.result() for future in futures]
+
+
+def cohort_summary_table(dataset_dirs, output_dirs, outcomes):
+    """Lays the per-islet outcomes of run_batch out as one row per islet, with the number of
+cells of every component type and the number and mean size of every contact type"""
+    cell_types = set()
+    contact_types = set()
+    for summary, error, seconds in outcomes:
+        if summary is not None:
+            cell_types.update(summary[1].keys())
+            contact_types.update(summary[2].keys())
+    cell_types = sorted(cell_types)
+    contact_types = sorted(contact_types)
+
+    header = (['Islet', 'Dataset Folder', 'Status', 'Time (s)', 'Components', 'Cells']
+              + [cell_type + ' Cells' for cell_type in cell_types]
+              + [str(contact_type) + ' Contacts' for contact_type in contact_types]
+              + [str(contact_type) + ' Mean Size (um^2)' for contact_type in contact_types]
+              + ['Beta-Beta Contacts'])
+    rows = []
+    for path, output_dir, (summary, error, seconds) in zip(dataset_dirs, output_dirs, outcomes):
+        row = [os.path.basename(output_dir), path, 'ok' if error is None else error, seconds]
+        if summary is not None:
+            (n_components, cells, contacts, n_beta_beta) = summary
+            row = (row + [n_components, sum(cells.values())]
+                   + [cells.get(cell_type, 0) for cell_type in cell_types]
+                   + [contacts[contact_type][0] if contact_type in contacts else 0 for contact_type in contact_types]
+                   + [contacts[contact_type][2] if contact_type in contacts else None for contact_type in contact_types]
+                   + [n_beta_beta])
+        rows.append(row)
+    return (header, rows)
+
+
+def permutation_summary_table(dataset_dirs, output_dirs, outcomes, n_permutations):
+    """Lays the per-islet outcomes of run_permutation_batch out as one row per islet, with the
+permutations and CPU time it used, and a last row with the cohort totals"""
+    header = ['Islet', 'Dataset Folder', 'Status', 'Time (s)', 'CPU Time (s)', 'Permutation Budget', 'Permutations Used',
+              'Statistics Tested', 'Significant Statistics']
+    rows = []
+    totals = [0.0, 0.0, 0, 0, 0, 0]
+    for path, output_dir, (summary, error, seconds) in zip(dataset_dirs, output_dirs, outcomes):
+        row = [os.path.basename(output_dir), path, 'ok' if error is None else error, seconds]
+        totals[0] = totals[0] + seconds
+        if summary is not None:
+            (used, tested, significant, cpu_seconds) = summary
+            row = row + [cpu_seconds, n_permutations, used, tested, significant]
+            totals[1:] = [totals[1] + cpu_seconds, totals[2] + n_permutations, totals[3] + used, totals[4] + tested,
+                          totals[5] + significant]
+        rows.append(row)
+    rows.append(['Cohort Total', '', ''] + totals)
+    return (header, rows)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Runs Contact Handler on many islet folders')
+    parser.add_argument('output_root', help='folder for the per-islet outputs and the cohort summary')
+    parser.add_argument('datasets', nargs='+', help='folders of Contact Calculator exports, one per islet')
+    parser.add_argument('--workers', type=int, default=4, help='number of islets processed at once')
+    parser.add_argument('--backend', default='excel', choices=sorted(Output.BACKENDS), help='output format')
+    parser.add_argument('--permutations', type=int, default=None,
+                        help='run the permutation analysis instead, with this many permutations per islet at most')
+    parser.add_argument('--stopping', default='besag_clifford', choices=list(Statistics.STOPPING_RULES) + ['none'],
+                        help='sequential stopping rule of the permutation analysis')
+    parser.add_argument('--exceedances', type=int, default=10, help='exceedances that settle a statistic (besag_clifford)')
+    parser.add_argument('--seed', type=int, default=0, help='permutation seed')
+    parser.add_argument('--types', nargs='+', default=list(ENDOCRINE_TYPES),
+                        choices=[rule[0] for rule in Component_Type.INTENSITY_RULES],
+                        help='endocrine types whose labels the permutation analysis shuffles')
+    args = parser.parse_args()
+    if args.permutations is None:
+        run_batch(args.datasets, args.output_root, args.workers, args.backend)
+    else:
+        run_permutation_batch(args.datasets, args.output_root, args.workers, tuple(args.types), args.permutations, args.seed,
+                              stopping_rule=None if args.stopping == 'none' else args.stopping,
+                              stopping_exceedances=args.exceedances)
@@ -0,0 +1,503 @@
+#Contact Handler benchmarks
+#Added 2026-10
+
+"""This module times parts of the Contact Handler pipeline against the
+implementations they replaced. Each benchmark function returns a dictionary of
+timings (in seconds) and prints a short report. Run it from a folder of
+Contact Calculator exports, e.g. python Contact_Handler_benchmarks.py
+Edited 2026-10: python Contact_Handler_benchmarks.py --suite runs benchmark_pipeline
+on synthetic islets of 10^3 to 10^5 components (Contact_Handler_synthetic) and
+keeps the timings per git commit in benchmark_history.json, reporting the stages
+that got slower since the last commit benchmarked."""
+
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import Contact_Handler_IO as IO
+import Contact_Handler_definitions as Definitions
+import Contact_Handler_component_type as Component_Type
+import Contact_Handler_array_tissue as Array_Tissue
+import Contact_Handler_network as Network
+import Contact_Handler_channels as Channels
+import Contact_Handler_contact_table as Contact_Table
+
+
+def _time_call(function, *args, **kwargs):
+    """Returns (result, wall time in seconds) for one call"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return (result, time.perf_counter() - start)
+
+
+def _peak_memory_call(function, *args, **kwargs):
+    """Returns (result, wall time in seconds, peak traced memory in bytes) for one call"""
+    tracemalloc.start()
+    try:
+        (result, seconds) = _time_call(function, *args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return (result, seconds, peak)
+
+
+def _load_folder(path):
+    """Returns (component_types_dict, component_info_list) for the exports in path"""
+    file_list = [os.path.join(path, filename) for filename in sorted(IO.get_file_list(path))]
+    component_types_dict = Component_Type.component_type_calculator(IO.get_component_channels(file_list[-1]))
+    return (component_types_dict, IO.get_component_info_list(file_list[:-1]))
+
+
+def _build_object_tissue(component_types_dict, component_info_list):
+    """Builds a Tissue the way Contact_Handler_Main.py does"""
+    current_tissue = Definitions.Tissue(dict(), dict(), [])
+    for component_name, component_type in component_types_dict.items():
+        current_tissue.new_component(Definitions.Component(component_name, component_type))
+    for (name, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size, contacts_list) in component_info_list:
+        working_component = current_tissue.components_dict[name]
+        working_component.add_component_features(surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size)
+        for j,k in contacts_list:
+            contact_name = tuple(sorted([name, j]))
+            if contact_name in current_tissue.contacts_dict.keys():
+                current_tissue.contacts_dict[contact_name].add_replicate_measurement(k)
+            else:
+                current_tissue.contacts_dict[contact_name]=Definitions.Contact(working_component, current_tissue.components_dict[j], k)
+            working_component.add_contact(current_tissue.contacts_dict[contact_name])
+    return current_tissue
+
+
+def _build_bulk_tissue(component_types_dict, component_info_list):
+    """Builds a Tissue with Contact_Table.build_tissue_contacts"""
+    tissue = Definitions.Tissue(dict(), dict(), [])
+    for component_name, component_type in component_types_dict.items():
+        tissue.new_component(Definitions.Component(component_name, component_type))
+    Contact_Table.build_tissue_contacts(tissue, component_info_list)
+    return tissue
+
+
+def _compile_tissue(tissue):
+    tissue.find_cells()
+    tissue.compile_cells_and_contacts()
+    tissue.compile_beta_beta_contacts()
+    return tissue
+
+
+def _readline_component_info(filename):
+    """The original line-by-line get_component_info reader (one f.readline() per field
+and per contact voxel line), kept as the baseline for benchmark_ingest"""
+    f = open(filename, 'r')
+    identifier = f.readline().strip()
+    surface_area = float(f.readline().split('\t')[1])
+    volume = float(f.readline().split('\t')[1])
+    sphericity = float(f.readline().split('\t')[1])
+    bb = f.readline().split('\t')
+    bounding_box = (float(bb[1]), float(bb[2]), float(bb[3]))
+    ellipticity_p = float(f.readline().split('\t')[1])
+    ellipticity_o = float(f.readline().split('\t')[1])
+    s_voxels = float(f.readline().split('\t')[1])
+    distance_to_edge = float(f.readline().split('\t')[1])
+    voxel_size = float(f.readline().split('\t')[2])
+
+    contacts_list = []
+    contact_voxels = 0
+
+    line = f.readline()
+    line = f.readline()
+
+    while line != '':
+        if line[0:4]=='Cell' or line[0:4] == 'Surf' or line[0:3]== 'Cap' or line[0:4]=='Peri' or line[0:3]=='Exo':
+            name = line.strip()
+        elif line == '\n':
+            contacts_list.append((name, contact_voxels))
+            contact_voxels = 0
+        else:
+            contact_voxels = contact_voxels + float(line.strip())
+        line = f.readline()
+
+    contacts_list.append((name, contact_voxels))
+
+    f.close()
+    return (identifier, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size, contacts_list)
+
+
+def benchmark_ingest(path='.', worker_counts=(1, 4, 16, 32)):
+    """Times the original serial readline reader against IO.get_component_info_list
+with each thread count in worker_counts (and with processes at the largest count)
+over the component files in path, and checks that every reader returns the same
+tuples. The channel intensity file (last in sorted order) is skipped."""
+    file_list = sorted(IO.get_file_list(path))[:-1]
+    file_list = [os.path.join(path, filename) for filename in file_list]
+
+    timings = dict()
+    (reference, timings['readline serial']) = _time_call(lambda: [_readline_component_info(filename) for filename in file_list])
+    for n_workers in worker_counts:
+        (infos, timings['bulk read, %d threads' % n_workers]) = _time_call(IO.get_component_info_list, file_list, n_workers)
+        if infos != reference:
+            raise AssertionError('bulk reader output differs from the readline reader')
+    (infos, timings['bulk read, %d processes' % max(worker_counts)]) = _time_call(IO.get_component_info_list, file_list,
+                                                                                 max(worker_counts), True)
+    if infos != reference:
+        raise AssertionError('bulk reader output differs from the readline reader')
+
+    print('Ingest of %d component files' % len(file_list))
+    for name, seconds in timings.items():
+        print('  %-28s %8.3f s  (%.0f files/s)' % (name, seconds, len(file_list)/seconds))
+    return timings
+
+
+def _evict_page_cache(file_list):
+    """Asks the OS to drop the files from its page cache, so that the next read goes to the disk
+(or the file server, on NFS). Returns False where posix_fadvise is not available."""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for filename in file_list:
+        fd = os.open(filename, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def benchmark_cold_ingest(path='.', n_workers=16, prefetch_depths=(16, 64, 256, 1024), latency=0.0):
+    """Times reading the component files in path and building the Tissue from them with the
+files evicted from the page cache before every run, as on a first run over a network
+share: the serial read-and-build loop, the bulk thread pool read followed by the build,
+and IO.iter_component_info with each prefetch depth, which overlaps the reads with the
+build. latency adds that many seconds to every file read, to stand in for the round
+trips of a network share when the folder is on a local disk. Checks that every variant
+builds the same contacts."""
+    file_list = [os.path.join(path, filename) for filename in sorted(IO.get_file_list(path))]
+    component_types_dict = Component_Type.component_type_calculator(Channels.read_channel_intensities(file_list[-1]))
+    file_list = file_list[:-1]
+
+    variants = [('serial read and build', lambda: (IO.get_component_info(filename) for filename in file_list)),
+                ('bulk read, then build', lambda: IO.get_component_info_list(file_list, n_workers))]
+    for prefetch in prefetch_depths:
+        variants.append(('prefetch %d, %d threads' % (prefetch, n_workers),
+                         lambda prefetch=prefetch: IO.iter_component_info(file_list, n_workers, prefetch)))
+    timings = dict()
+    reference = None
+    get_component_info = IO.get_component_info
+    if latency > 0:
+        def slow_component_info(filename):
+            time.sleep(latency)
+            return get_component_info(filename)
+        IO.get_component_info = slow_component_info
+    try:
+        for name, component_infos in variants:
+            cold = _evict_page_cache(file_list)
+            (tissue, timings[name]) = _time_call(lambda: _build_object_tissue(component_types_dict, component_infos()))
+            sizes = {contact_name: contact.get_size() for contact_name, contact in tissue.contacts_dict.items()}
+            if reference is None:
+                reference = sizes
+            elif sizes != reference:
+                raise AssertionError('%s builds different contacts' % name)
+    finally:
+        IO.get_component_info = get_component_info
+
+    print('Ingest and build of %d component files%s%s' % (len(file_list), ', page cache evicted' if cold else '',
+                                                         ', %.1f ms added per file' % (1e3*latency) if latency > 0 else ''))
+    for name, seconds in timings.items():
+        print('  %-28s %8.3f s  (%.0f files/s)' % (name, seconds, len(file_list)/seconds))
+    return timings
+
+
+def benchmark_channel_reader(path='.'):
+    """Times IO.get_component_channels against the memory-mapped
+Channels.read_channel_intensities on the channel intensity file in path (the last .txt
+file in sorted order), with the peak memory of each, and checks that both read the
+same values"""
+    filename = os.path.join(path, sorted(IO.get_file_list(path))[-1])
+    timings = dict()
+    (reference, timings['readline dictionary']) = _time_call(IO.get_component_channels, filename)
+    (channels, timings['memory-mapped array']) = _time_call(Channels.read_channel_intensities, filename)
+    if list(reference.keys()) != channels.names or Component_Type.channels_to_array(reference)[1].tolist() != channels.intensities.tolist():
+        raise AssertionError('memory-mapped reader output differs from get_component_channels')
+    peaks = {'readline dictionary': _peak_memory_call(IO.get_component_channels, filename)[2],
+             'memory-mapped array': _peak_memory_call(Channels.read_channel_intensities, filename)[2]}
+
+    print('Channel intensities of %d components (%.1f MB file)' % (len(channels), os.path.getsize(filename)/1e6))
+    for name, seconds in timings.items():
+        print('  %-28s %8.3f s  %8.1f MB peak' % (name, seconds, peaks[name]/1e6))
+    return timings
+
+
+def benchmark_tissue_backends(path='.'):
+    """Compares the object-based Tissue with the ArrayTissue on the exports in path:
+build time and peak memory, and the time for find_cells, compile_cells_and_contacts
+and compile_beta_beta_contacts. Checks that both produce the same results."""
+    (component_types_dict, component_info_list) = _load_folder(path)
+
+    timings = dict()
+    (tissue, timings['Tissue build'], tissue_peak) = _peak_memory_call(_build_object_tissue, component_types_dict, component_info_list)
+    (bulk_tissue, timings['Tissue bulk build']) = _time_call(_build_bulk_tissue, component_types_dict, component_info_list)
+    if (list(bulk_tissue.contacts_dict.keys()) != list(tissue.contacts_dict.keys())
+            or [contact.number_of_voxels for contact in bulk_tissue.contacts_dict.values()]
+            != [contact.number_of_voxels for contact in tissue.contacts_dict.values()]
+            or [component.contact_list for component in bulk_tissue.components_dict.values()]
+            != [component.contact_list for component in tissue.components_dict.values()]):
+        raise AssertionError('bulk Tissue build differs from the contact-by-contact build')
+    del bulk_tissue
+    (array_tissue, timings['ArrayTissue build'], array_peak) = _peak_memory_call(Array_Tissue.ArrayTissue, component_types_dict, component_info_list)
+    (tissue, timings['Tissue compile']) = _time_call(_compile_tissue, tissue)
+    (array_tissue, timings['ArrayTissue compile']) = _time_call(_compile_tissue, array_tissue)
+
+    for attribute in ['cells_list', 'contact_types_list', 'cell_metrics_dict', 'contact_sizes_dict', 'beta_beta_contacts_list']:
+        if getattr(tissue, attribute) != getattr(array_tissue, attribute):
+            raise AssertionError('ArrayTissue %s differs from Tissue' % attribute)
+
+    print('Tissue backends: %d components, %d contacts' % (len(array_tissue.component_names), len(array_tissue.i)))
+    for name, seconds in timings.items():
+        print('  %-28s %8.3f s' % (name, seconds))
+    print('  %-28s %8.1f MB' % ('Tissue build peak memory', tissue_peak/1e6))
+    print('  %-28s %8.1f MB (%.1f MB in arrays)' % ('ArrayTissue build peak', array_peak/1e6, array_tissue.memory_usage()/1e6))
+    timings['Tissue peak bytes'] = tissue_peak
+    timings['ArrayTissue peak bytes'] = array_peak
+    return timings
+
+
+def benchmark_compile_methods(path='.', repeats=5):
+    """Microbenchmarks of the Tissue methods in the analysis hot loops. Each method is
+timed on a freshly built Tissue (the methods append to the Tissue's lists), the
+best of repeats is kept and reported per contact_list entry, so that the cost
+per entry stays flat as islets grow if the methods are linear in contacts."""
+    (component_types_dict, component_info_list) = _load_folder(path)
+    n_entries = sum(len(info[10]) for info in component_info_list)
+
+    methods = ['find_cells', 'compile_cells_and_contacts', 'compile_beta_beta_contacts', 'compile_permutation_beta_contacts']
+    timings = {method: float('inf') for method in methods}
+    for repeat in range(repeats):
+        tissue = _build_object_tissue(component_types_dict, component_info_list)
+        for method in methods:
+            (result, seconds) = _time_call(getattr(tissue, method))
+            timings[method] = min(timings[method], seconds)
+
+    print('Tissue methods, best of %d: %d contact_list entries' % (repeats, n_entries))
+    for method, seconds in timings.items():
+        print('  %-36s %8.4f s  (%.2f us per entry)' % (method, seconds, 1e6*seconds/max(n_entries, 1)))
+    return timings
+
+
+def _legacy_export_permutation_beta(p_contact_types_list, beta_contacts_size_p, beta_contacts_counts_p, beta_contacts_proportion_p, filename):
+    """The original cell-by-cell export_permutation_beta, kept as the baseline for benchmark_excel_export"""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(filename)
+    sheet1 = wb.add_worksheet('Contact Type Sizes (um^2)')
+    sheet2 = wb.add_worksheet('Contact Type Counts')
+    sheet3 = wb.add_worksheet('Contact Type Proportions')
+    for i in range(len(p_contact_types_list)):
+        sheet1.write(0, i, str(p_contact_types_list[i]))
+        sheet2.write(0, i, str(p_contact_types_list[i]))
+        sheet3.write(0, i, str(p_contact_types_list[i]))
+        for j in range(len(beta_contacts_size_p[i])):
+            sheet1.write(j+1,i,beta_contacts_size_p[i][j])
+        for k in range(len(beta_contacts_counts_p[i])):
+            sheet2.write(k+1,i,beta_contacts_counts_p[i][k])
+            sheet3.write(k+1,i,beta_contacts_proportion_p[i][k])
+    wb.close()
+
+
+def benchmark_excel_export(n_cells=10**6, seed=0):
+    """Times the original cell-by-cell export_permutation_beta against the bulk
+constant_memory IO.export_permutation_beta on synthetic permutation results of
+about n_cells cells (five contact types, three sheets), reporting wall time and
+peak traced memory for each."""
+    rng = random.Random(seed)
+    p_contact_types_list = [('beta','beta') , ('alpha','beta') , ('beta','delta') , ('beta','capillary') , ('beta','peri')]
+    n_rows = n_cells//(3*len(p_contact_types_list))
+    sizes = [[rng.random()*20 for row in range(n_rows)] for p_type in p_contact_types_list]
+    counts = [[rng.randrange(10) for row in range(n_rows)] for p_type in p_contact_types_list]
+    proportions = [[rng.random() for row in range(n_rows)] for p_type in p_contact_types_list]
+
+    #wall time is measured without tracemalloc, which slows xlsxwriter down, and peak memory in a second traced run
+    timings = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        for name, writer in [('cell-by-cell', _legacy_export_permutation_beta), ('bulk constant_memory', IO.export_permutation_beta)]:
+            filename = os.path.join(directory, name.split()[0] + '.xlsx')
+            (result, seconds) = _time_call(writer, p_contact_types_list, sizes, counts, proportions, filename)
+            (result, traced_seconds, peak) = _peak_memory_call(writer, p_contact_types_list, sizes, counts, proportions, filename)
+            timings[name] = (seconds, peak)
+
+    print('Excel export of %d cells' % (3*len(p_contact_types_list)*n_rows))
+    for name, (seconds, peak) in timings.items():
+        print('  %-28s %8.2f s  %8.1f MB peak' % (name, seconds, peak/1e6))
+    return timings
+
+
+def _random_contact_network(n_vertices, mean_degree, seed):
+    """Returns a tissue-like beta_beta_contacts_list: n_vertices random points in a unit cube,
+in contact when closer than the distance giving mean_degree neighbors on average"""
+    import numpy as np
+    from scipy.spatial import cKDTree
+
+    rng = np.random.default_rng(seed)
+    points = rng.random((n_vertices, 3))
+    radius = (3*mean_degree/(4*np.pi*n_vertices))**(1/3)
+    pairs = cKDTree(points).query_pairs(radius, output_type='ndarray')
+    weights = rng.random(len(pairs))*20 + 1
+    names = ['Surfaces_%06d' % i for i in range(n_vertices)]
+    return [(names[i], names[j], w) for (i, j), w in zip(pairs.tolist(), weights.tolist())]
+
+
+def benchmark_network(n_vertices=10**5, mean_degree=6, n_sources=100, seed=0):
+    """Times each BetaNetwork metric on a synthetic contact network of n_vertices cells"""
+    beta_beta_contacts_list = _random_contact_network(n_vertices, mean_degree, seed)
+    timings = dict()
+    (network, timings['build adjacency']) = _time_call(Network.BetaNetwork, beta_beta_contacts_list)
+    (result, timings['degree and strength']) = _time_call(lambda: (network.degree_distribution(), network.strength_distribution()))
+    (result, timings['connected components']) = _time_call(network.connected_components)
+    (result, timings['clustering']) = _time_call(network.clustering)
+    (result, timings['weighted clustering']) = _time_call(network.clustering, weighted=True)
+    (result, timings['transitivity']) = _time_call(network.transitivity)
+    (result, timings['efficiency (%d sources)' % n_sources]) = _time_call(network.path_metrics, n_sources, seed)
+
+    print('Beta network of %d cells and %d contacts' % (network.n_vertices, network.n_edges))
+    for name, seconds in timings.items():
+        print('  %-28s %8.3f s' % (name, seconds))
+    return timings
+
+
+#Added 2026-10: the reproducible benchmark suite on synthetic islets
+BENCHMARK_SCALES = (10**3, 10**4, 10**5)
+HISTORY_FILENAME = 'benchmark_history.json'
+
+
+def benchmark_pipeline(path='.', n_permutations=100, seed=0):
+    """Times every stage of the Contact_Handler_Main pipeline and of the permutation analysis
+on the exports in path (the permutations run in this process, so the loop is timed
+without process pool start-up). Returns a dictionary of stage -> seconds."""
+    import Contact_Handler_permutation as Permutation
+
+    timings = dict()
+    (file_list, timings['get_file_list']) = _time_call(IO.get_file_list, path)
+    file_list = [os.path.join(path, filename) for filename in sorted(file_list)]
+    (component_channels_dict, timings['read_channel_intensities']) = _time_call(Channels.read_channel_intensities, file_list[-1])
+    (component_types_dict, timings['component_type_calculator']) = _time_call(Component_Type.component_type_calculator,
+                                                                             component_channels_dict)
+    (component_info_list, timings['get_component_info_list']) = _time_call(IO.get_component_info_list, file_list[:-1])
+    (tissue, timings['build contacts']) = _time_call(_build_bulk_tissue, component_types_dict, component_info_list)
+    for method in ['find_cells', 'compile_cells_and_contacts', 'compile_beta_beta_contacts']:
+        (result, timings[method]) = _time_call(getattr(tissue, method))
+
+    components_beta = [name for name, component_type in component_types_dict.items() if component_type == 'beta']
+    (engine, timings['compile permutation engine']) = _time_call(Permutation.PermutationEngine, tissue, components_beta)
+    (results, timings['permutation loop']) = _time_call(Permutation.run_permutations_parallel, engine, n_permutations,
+                                                        seed, n_workers=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        (result, timings['export_to_excel']) = _time_call(IO.export_to_excel, tissue.contact_sizes_dict, tissue.contact_types_list,
+                                                          tissue.cell_metrics_dict, tissue.voxel_size, tissue.beta_beta_contacts_list,
+                                                          os.path.join(directory, 'Results.xlsx'))
+        (result, timings['export_permutation_beta']) = _time_call(IO.export_permutation_beta, engine.p_contact_types_list,
+                                                                  results.beta_contacts_size_p, results.beta_contacts_counts_p,
+                                                                  results.beta_contacts_proportion_p,
+                                                                  os.path.join(directory, 'Results_permute.xlsx'))
+
+    print('Pipeline on %d components, %d contacts, %d permutations' % (len(component_types_dict), len(tissue.contacts_dict),
+                                                                        n_permutations))
+    for name, seconds in timings.items():
+        print('  %-28s %8.3f s' % (name, seconds))
+    return timings
+
+
+def synthetic_islet_path(data_root, n_components, mean_degree=8, seed=0):
+    """Returns the folder of the synthetic islet with these settings, generating it first if
+it is not there yet (the datasets are kept between runs, since they only depend on
+the settings)"""
+    import Contact_Handler_synthetic as Synthetic
+
+    path = os.path.join(data_root, 'islet_%d_degree_%d_seed_%d' % (n_components, mean_degree, seed))
+    complete_filename = os.path.join(path, '.complete')
+    if not os.path.exists(complete_filename):
+        Synthetic.generate_islet(path, n_components, mean_degree, seed)
+        open(complete_filename, 'w').close()
+    return path
+
+
+def _git_commit():
+    """The git commit of the Contact Handler code (with -dirty if it has uncommitted
+changes), or None outside a git checkout"""
+    import subprocess
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directory, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directory, capture_output=True,
+                                text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + '-dirty' if status.strip() != '' else commit
+
+
+def compare_runs(previous, current, tolerance=0.2, min_seconds=0.01):
+    """Returns the regressions of the current run against the previous one, as a list of
+(n_components, stage, previous seconds, current seconds) for every stage that got
+more than tolerance slower (and by more than min_seconds, to ignore timer noise)"""
+    regressions = []
+    for scale, timings in current['timings'].items():
+        for stage, seconds in timings.items():
+            before = previous['timings'].get(scale, dict()).get(stage)
+            if before is not None and seconds > before*(1 + tolerance) and seconds - before > min_seconds:
+                regressions.append((int(scale), stage, before, seconds))
+    return regressions
+
+
+def run_benchmark_suite(scales=BENCHMARK_SCALES, data_root='benchmark_data', history_filename=HISTORY_FILENAME,
+                        n_permutations=100, mean_degree=8, seed=0, tolerance=0.2):
+    """Runs benchmark_pipeline on a synthetic islet of every size in scales (kept in
+data_root), appends the timings to the JSON history file under the current git commit
+and compares them with the latest run of another commit with the same settings.
+Returns (run, regressions) as in compare_runs."""
+    import json
+    import platform
+    import sys
+
+    run = {'commit': _git_commit(), 'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+           'platform': platform.platform(), 'settings': {'n_permutations': n_permutations, 'mean_degree': mean_degree, 'seed': seed},
+           'timings': dict()}
+    for n_components in scales:
+        path = synthetic_islet_path(data_root, n_components, mean_degree, seed)
+        run['timings'][str(n_components)] = benchmark_pipeline(path, n_permutations, seed)
+
+    history = []
+    if os.path.exists(history_filename):
+        with open(history_filename, 'r') as f:
+            history = json.load(f)
+    previous = [item for item in history if item['settings'] == run['settings'] and item['commit'] != run['commit']]
+    regressions = compare_runs(previous[-1], run, tolerance) if len(previous) > 0 else []
+    history.append(run)
+    with open(history_filename, 'w') as f:
+        json.dump(history, f, indent=1)
+
+    if len(previous) > 0:
+        print('Compared with commit %s (%s): %d regressions' % (previous[-1]['commit'], previous[-1]['date'], len(regressions)))
+        for n_components, stage, before, seconds in regressions:
+            print('  %8d components  %-28s %8.3f s -> %8.3f s' % (n_components, stage, before, seconds))
+    return (run, regressions)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Contact Handler benchmarks')
+    parser.add_argument('--suite', nargs='*', type=int, metavar='N_COMPONENTS',
+                        help='run the synthetic benchmark suite at these islet sizes (default %s) instead of the benchmarks on the current folder'
+                        % ' '.join(str(scale) for scale in BENCHMARK_SCALES))
+    parser.add_argument('--data', default='benchmark_data', help='folder for the synthetic islets')
+    parser.add_argument('--history', default=HISTORY_FILENAME, help='JSON file of the suite timings by commit')
+    parser.add_argument('--permutations', type=int, default=100, help='number of permutations timed')
+    args = parser.parse_args()
+    if args.suite is not None:
+        run_benchmark_suite(args.suite or BENCHMARK_SCALES, args.data, args.history, args.permutations)
+    else:
+        benchmark_ingest('.')
+        benchmark_cold_ingest('.')
+        benchmark_channel_reader('.')
+        benchmark_tissue_backends('.')
+        benchmark_compile_methods('.')
+        benchmark_excel_export()
+        benchmark_network()
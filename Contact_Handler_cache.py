@@ -0,0 +1,176 @@
+#Contact Handler parsed data cache
+#Added 2026-10
+
+"""This module keeps the parsed contents of a folder of Contact Calculator
+exports in a binary columnar cache (an uncompressed NumPy .npz file), so that
+repeated runs on the same islet do not re-parse every text file. The cache
+holds the component features, the contact edge list and the channel
+intensities. Each file is keyed by a fingerprint of its path, size and
+modification time, so a changed file is re-parsed on its own while every other
+component is reloaded from the cache."""
+
+import hashlib
+import os
+
+import numpy as np
+
+import Contact_Handler_IO as IO
+import Contact_Handler_channels as Channels
+import Contact_Handler_profiling as Profiling
+
+CACHE_FILENAME = '.contact_handler_cache.npz'
+
+#Columns of the features array, in get_component_info order
+FEATURE_NAMES = ['surface_area', 'volume', 'sphericity', 'bounding_box_1', 'bounding_box_2', 'bounding_box_3',
+                 'ellipticity_p', 'ellipticity_o', 's_voxels', 'distance_to_edge', 'voxel_size']
+#The arrays returned by component_table: one row per file, and the contacts of row r at
+#contact_offsets[r]:contact_offsets[r+1] of the contact columns
+COMPONENT_COLUMNS = ['identifiers', 'features', 'contact_offsets', 'names', 'contact_names', 'contact_voxels']
+
+
+def file_fingerprint(filename):
+    """Returns a hex digest of the file's path, size and modification time"""
+    stat = os.stat(filename)
+    key = '%s|%d|%d' % (os.path.normpath(filename), stat.st_size, stat.st_mtime_ns)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class TissueCache:
+    """The TissueCache loads the cache file in path (if there is one) and serves
+component_info_list and component_channels from it, parsing only the files whose
+fingerprints do not match. Call save() after loading to write back any changes."""
+    def __init__(self, path='.', filename=CACHE_FILENAME):
+        self.cache_filename = os.path.join(path, filename)
+        self.arrays = dict()
+        self.dirty = False
+        if os.path.exists(self.cache_filename):
+            with np.load(self.cache_filename, allow_pickle=False) as data:
+                self.arrays = {key: data[key] for key in data.files}
+
+    @Profiling.profiled('load_component_info')
+    def component_info_list(self, file_list, n_workers=16):
+        """Returns the get_component_info tuple for every file in file_list, in order"""
+        fingerprints = [file_fingerprint(filename) for filename in file_list]
+        (infos, missing, n_rows) = self._cached_infos(file_list, fingerprints)
+        if len(missing) > 0:
+            parsed = IO.get_component_info_list([file_list[i] for i in missing], n_workers)
+            for i, info in zip(missing, parsed):
+                infos[i] = info
+        if len(missing) > 0 or n_rows != len(file_list):
+            self._store_components(file_list, fingerprints, infos)
+        return infos
+
+    def iter_component_info(self, file_list, n_workers=16, prefetch=IO.PREFETCH_DEPTH):
+        """Added 2026-10: yields the get_component_info tuple for every file in file_list, in
+order, as component_info_list would return them. The files missing from the cache are
+read ahead by IO.iter_component_info while the caller works through the tuples; the
+cache columns are rebuilt once the last tuple has been taken."""
+        fingerprints = [file_fingerprint(filename) for filename in file_list]
+        (infos, missing, n_rows) = self._cached_infos(file_list, fingerprints)
+        parsed = IO.iter_component_info([file_list[i] for i in missing], n_workers, prefetch)
+        for i in range(len(infos)):
+            if infos[i] is None:
+                infos[i] = next(parsed)
+            yield infos[i]
+        if len(missing) > 0 or n_rows != len(file_list):
+            self._store_components(file_list, fingerprints, infos)
+
+    def _cached_infos(self, file_list, fingerprints):
+        """Returns (infos, missing, n_rows): the cached get_component_info tuple of every file in
+file_list (None for the files whose fingerprints do not match), the indices of those
+files and the number of files in the cache"""
+        infos = [None]*len(file_list)
+        missing = []
+
+        if 'files' in self.arrays:
+            rows = {filename: row for row, filename in enumerate(self.arrays['files'].tolist())}
+            cached_fingerprints = self.arrays['fingerprints'].tolist()
+            identifiers = self.arrays['identifiers'].tolist()
+            features = self.arrays['features'].tolist()
+            offsets = self.arrays['contact_offsets'].tolist()
+            names = self.arrays['names'].tolist()
+            contact_names = self.arrays['contact_names'].tolist()
+            contact_voxels = self.arrays['contact_voxels'].tolist()
+        else:
+            rows = dict()
+
+        for i in range(len(file_list)):
+            row = rows.get(file_list[i])
+            if row is None or cached_fingerprints[row] != fingerprints[i]:
+                missing.append(i)
+                continue
+            f = features[row]
+            contacts_list = [(names[contact_names[c]], contact_voxels[c]) for c in range(offsets[row], offsets[row+1])]
+            infos[i] = (identifiers[row], f[0], f[1], f[2], (f[3], f[4], f[5]), f[6], f[7], f[8], f[9], f[10], contacts_list)
+
+        Profiling.count('files from cache', len(file_list) - len(missing))
+        return (infos, missing, len(rows))
+
+    @Profiling.profiled('load_component_table')
+    def component_table(self, file_list, n_workers=16):
+        """Added 2026-10: returns the COMPONENT_COLUMNS arrays of the files in file_list, in
+order. When every file is cached in that order, the arrays are returned as they are,
+without building the get_component_info tuples."""
+        fingerprints = [file_fingerprint(filename) for filename in file_list]
+        if ('files' not in self.arrays or self.arrays['files'].tolist() != file_list
+                or self.arrays['fingerprints'].tolist() != fingerprints):
+            infos = self.component_info_list(file_list, n_workers)
+            if self.arrays['files'].tolist() != file_list:
+                self._store_components(file_list, fingerprints, infos)
+        else:
+            Profiling.count('files from cache', len(file_list))
+        return {key: self.arrays[key] for key in COMPONENT_COLUMNS}
+
+    def _store_components(self, file_list, fingerprints, infos):
+        """Rebuilds the component columns from the full list of parsed tuples"""
+        names = []
+        name_index = dict()
+        contact_names = []
+        contact_voxels = []
+        offsets = [0]
+        features = np.empty((len(infos), len(FEATURE_NAMES)), dtype=np.float64)
+        for row, info in enumerate(infos):
+            features[row] = (info[1], info[2], info[3]) + tuple(info[4]) + (info[5], info[6], info[7], info[8], info[9])
+            for name, voxels in info[10]:
+                if name not in name_index:
+                    name_index[name] = len(names)
+                    names.append(name)
+                contact_names.append(name_index[name])
+                contact_voxels.append(voxels)
+            offsets.append(len(contact_names))
+
+        self.arrays['files'] = np.array(file_list, dtype=np.str_)
+        self.arrays['fingerprints'] = np.array(fingerprints, dtype=np.str_)
+        self.arrays['identifiers'] = np.array([info[0] for info in infos], dtype=np.str_)
+        self.arrays['features'] = features
+        self.arrays['contact_offsets'] = np.array(offsets, dtype=np.int64)
+        self.arrays['names'] = np.array(names, dtype=np.str_)
+        self.arrays['contact_names'] = np.array(contact_names, dtype=np.int64)
+        self.arrays['contact_voxels'] = np.array(contact_voxels, dtype=np.float64)
+        self.dirty = True
+
+    @Profiling.profiled('load_component_channels')
+    def component_channels(self, filename):
+        """Returns the channel intensities of the channel intensity file, as a
+Channels.ChannelIntensities mapping over the cached array
+Edited 2026-10: the file is read with Channels.read_channel_intensities"""
+        fingerprint = file_fingerprint(filename)
+        if 'channel_fingerprint' in self.arrays and str(self.arrays['channel_fingerprint']) == fingerprint:
+            return Channels.ChannelIntensities(self.arrays['channel_names'].tolist(), self.arrays['channel_values'])
+
+        channels = Channels.read_channel_intensities(filename)
+        self.arrays['channel_fingerprint'] = np.array(fingerprint, dtype=np.str_)
+        self.arrays['channel_names'] = np.array(channels.names, dtype=np.str_)
+        self.arrays['channel_values'] = channels.intensities
+        self.dirty = True
+        return channels
+
+    def save(self):
+        """Writes the cache file if anything was re-parsed (creating its folder if needed)"""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_filename) or '.', exist_ok=True)
+        temporary_filename = self.cache_filename + '.tmp.npz'
+        np.savez(temporary_filename, **self.arrays)
+        os.replace(temporary_filename, self.cache_filename)
+        self.dirty = False
@@ -0,0 +1,159 @@
+#Contact Handler channel intensity reader
+#Added 2026-10 for whole-organ intensity exports
+
+"""This module reads the channel intensity file (zzzChannel_Intensities.txt)
+into one NumPy array instead of the dictionary of tuples of lists built by
+IO.get_component_channels. read_channel_intensities memory-maps the file, finds
+the component blocks in one pass over the line starts and hands the numeric
+fields of every block to NumPy's C parser in one go, filling a (components x 4
+channels x 3 stats) float array. The stats are the three that get_component_channels reads:
+median, mean and intensity sum. The result is a ChannelIntensities, a read-only
+mapping with the same keys and values as the get_component_channels dictionary
+(each value is a 4 x 3 view into the array), which channels_to_array,
+component_type_calculator and component_type_histograms use without copying."""
+
+import mmap
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+import Contact_Handler_profiling as Profiling
+
+N_CHANNELS = 4
+N_STATS = 3
+#A component block is the name line, a header line, N_STATS x N_CHANNELS value lines and one
+#more line, which get_component_channels reads without looking at it
+BLOCK_LINES = 2 + N_STATS*N_CHANNELS + 1
+NAME_PREFIXES = (b'Cap', b'Surf', b'Peri', b'Exo')
+
+
+class ChannelIntensities(Mapping):
+    """A ChannelIntensities holds the component names (in file order) and the intensities
+array (components x channels x stats). Looking a name up returns that component's
+channels x stats view of the array, so channels[name][channel][stat] gives the same
+value as in the get_component_channels dictionary."""
+    def __init__(self, names, intensities):
+        self.names = names
+        self.intensities = intensities
+        self.index = {name: i for i, name in enumerate(names)}
+
+    def __getitem__(self, name):
+        return self.intensities[self.index[name]]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _line_starts(data):
+    """Returns the start of every line in the byte array, followed by len(data) + 1, so that
+line k runs from starts[k] to its newline (or the end of the data) at starts[k+1] - 1"""
+    return np.concatenate([[0], np.flatnonzero(data == ord('\n')) + 1, [len(data) + 1]])
+
+
+def _name_lines(data, starts):
+    """Returns the indices of the lines get_component_channels takes as component names: lines
+starting with a NAME_PREFIXES prefix that are not inside the previous component's block"""
+    #the first two bytes narrow the lines down to a few per component before the full prefixes are compared
+    first = data[np.minimum(starts[:-1], len(data) - 1)]
+    second = data[np.minimum(starts[:-1] + 1, len(data) - 1)]
+    narrowed = np.zeros(len(first), dtype=bool)
+    for prefix in NAME_PREFIXES:
+        narrowed |= (first == prefix[0]) & (second == prefix[1])
+    lines = np.flatnonzero(narrowed)
+    matches = np.zeros(len(lines), dtype=bool)
+    for prefix in NAME_PREFIXES:
+        prefix_matches = starts[lines + 1] - 1 - starts[lines] >= len(prefix)
+        for k in range(len(prefix)):
+            prefix_matches &= data[np.minimum(starts[lines] + k, len(data) - 1)] == prefix[k]
+        matches |= prefix_matches
+    candidates = lines[matches]
+    if np.all(np.diff(candidates) >= BLOCK_LINES):
+        return candidates
+    blocks = []
+    next_free = 0
+    for line in candidates.tolist():
+        if line >= next_free:
+            blocks.append(line)
+            next_free = line + BLOCK_LINES
+    return np.array(blocks, dtype=np.int64)
+
+
+def _gather(data, starts, ends):
+    """Returns the bytes from every start to its end, each followed by the byte at its end
+(the newline or tab that closes it), as one bytes object"""
+    #the ranges do not overlap, so +1 at every start and -1 after every end mark them out
+    #(an end may be the end of the data, when the last line has no newline)
+    marks = np.zeros(len(data) + 2, dtype=np.int8)
+    marks[starts] += 1
+    marks[ends + 1] -= 1
+    return data[np.cumsum(marks[:len(data)], dtype=np.int8) > 0].tobytes()
+
+
+def _parse_values(data, starts, ends):
+    """Returns the value (second tab-separated field, up to the next tab or newline) of every
+line from starts to ends as floats, converted by NumPy in one call"""
+    tabs = np.flatnonzero(data == ord('\t'))
+    j = np.searchsorted(tabs, starts)
+    if np.any(j >= len(tabs)) or np.any(tabs[np.minimum(j, len(tabs) - 1)] >= ends):
+        raise ValueError('channel intensity line without a tab-separated value')
+    field_ends = np.minimum(ends, np.append(tabs, len(data))[j + 1])
+    fields = _gather(data, tabs[j] + 1, field_ends).split()
+    try:
+        values = np.array(fields, dtype=np.float64)
+    except ValueError:
+        raise ValueError('channel intensity value that is not a number')
+    #an empty value leaves no field, so the count check catches it
+    if len(values) != len(starts):
+        raise ValueError('channel intensity value that is not a number')
+    return values
+
+
+def parse_channel_buffer(data, chunk_size=65536):
+    """Parses the bytes of a channel intensity file (a uint8 array) and returns (names,
+intensities). The values are parsed chunk_size components at a time, from the stretch
+of the file those components take up, which bounds the temporary arrays."""
+    starts = _line_starts(data)
+    blocks = _name_lines(data, starts)
+    if len(blocks) > 0 and blocks[-1] + BLOCK_LINES - 2 >= len(starts) - 1:
+        raise ValueError('the channel intensity file ends inside a component block')
+    names = _gather(data, starts[blocks], starts[blocks + 1] - 1).decode('utf-8').split('\n')[:len(blocks)]
+    names = [name.strip().replace(' ', '_') for name in names]
+
+    intensities = np.empty((len(blocks), N_CHANNELS, N_STATS), dtype=np.float64)
+    for first in range(0, len(blocks), chunk_size):
+        lines = (blocks[first:first+chunk_size, None] + 2 + np.arange(N_STATS*N_CHANNELS)).ravel()
+        (region_start, region_end) = (starts[lines[0]], starts[lines[-1] + 1])
+        values = _parse_values(data[region_start:region_end], starts[lines] - region_start, starts[lines + 1] - 1 - region_start)
+        #the value lines of a block go through the channels for each stat in turn
+        intensities[first:first+chunk_size] = values.reshape(-1, N_STATS, N_CHANNELS).transpose(0, 2, 1)
+
+    #a name listed twice keeps its first position and its last values, as in the dictionary
+    index = dict()
+    for i, name in enumerate(names):
+        index[name] = i
+    if len(index) < len(names):
+        intensities = intensities[list(index.values())]
+        names = list(index.keys())
+    return (names, intensities)
+
+
+@Profiling.profiled('read_channel_intensities')
+def read_channel_intensities(filename, chunk_size=65536):
+    """Reads the channel intensity file through a memory map and returns a ChannelIntensities"""
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ChannelIntensities([], np.empty((0, N_CHANNELS, N_STATS)))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (names, intensities) = parse_channel_buffer(np.frombuffer(mapped, dtype=np.uint8), chunk_size)
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                #the traceback of a parsing error still holds the buffer; the map closes when it is freed
+                pass
+    return ChannelIntensities(names, intensities)
@@ -5,41 +5,94 @@
 """This is a simple method for categorizing component_type. It will likely
 need to be updated to handle data more effectively."""
 
-def component_type_calculator(component_channels_dict):
+import Contact_Handler_profiling as Profiling
+
+#Added 2026-10: the classification rules, in the order they are applied. The defaults
+#reproduce the original if/elif chain in component_type_calculator.
+#Name rules: (fragment of the lower-case component name, component type)
+NAME_RULES = [('peri', 'peri'), ('cap', 'capillary'), ('exo', 'exocrine')]
+#Intensity rules: (component type, channel index, denominator channel index or None, default threshold)
+#ch1 is 647, ch3 is 488, ch4 is 405
+INTENSITY_RULES = [('alpha', 3, None, 7000), ('delta', 0, 2, 2.4), ('beta', 2, 1, 0.6)]
+#Which of the per-channel statistics the intensity rules use: 0 median, 1 mean, 2 intensity sum
+MEAN_STAT = 1
+DEFAULT_TYPE = 'unlabeled'
+
+@Profiling.profiled('component_type_calculator')
+def component_type_calculator(component_channels_dict, thresholds=None):
     """This function categorizes different components within the current tissue
 based on the mean intensity of labeling. This is a very simple method of 
-classifying components by type. It requires significant user attention."""
-    component_type_dict = dict()
-    for component, channels in component_channels_dict.items():
-        if 'peri' in component.lower():
-            component_type = 'peri'
-        elif 'cap' in component.lower():
-            component_type = 'capillary'
-        elif 'exo' in component.lower():
-            component_type = 'exocrine'
-        elif channels[3][1]> 7000: #ch4 is 405
-            component_type = 'alpha'
-        elif channels[0][1]/channels[2][1]> 2.4: #ch1 is 647, ch3 is 488
-            component_type = 'delta'
-        elif channels[2][1]/channels[1][1]> 0.6: #ch3 is 488
-            component_type = 'beta'
-        else:
-            component_type = 'unlabeled'
-
-        component_type_dict[component] = component_type
-
-    return component_type_dict
+classifying components by type. It requires significant user attention.
+Edited 2026-10: classification is done on the whole intensity array at once by
+classify_components; thresholds optionally overrides the INTENSITY_RULES
+thresholds, e.g. {'alpha': 6500, 'beta': 0.55}"""
+    (names, intensities) = channels_to_array(component_channels_dict)
+    component_types = classify_components(names, intensities, thresholds)
+    return dict(zip(names, component_types.tolist()))
+
+def channels_to_array(component_channels_dict):
+    """Returns (names, intensities): the component names in dictionary order and a
+(components x channels x stats) array of the get_component_channels values.
+Edited 2026-10: a Channels.ChannelIntensities already holds both and is not copied"""
+    import numpy as np
+
+    if hasattr(component_channels_dict, 'intensities'):
+        return (list(component_channels_dict.names), component_channels_dict.intensities)
+    names = list(component_channels_dict.keys())
+    if len(names) == 0:
+        return (names, np.empty((0, 4, 3)))
+    intensities = np.array([channels for channels in component_channels_dict.values()], dtype=np.float64)
+    return (names, intensities)
+
+def classify_components(names, intensities, thresholds=None, intensity_rules=INTENSITY_RULES,
+                        name_rules=NAME_RULES, stat=MEAN_STAT, default_type=DEFAULT_TYPE):
+    """Assigns a type to every component with one boolean mask per rule. Name rules are
+checked first, then intensity rules, each in order; the first rule that matches a
+component wins, as in an if/elif chain. Returns an array of type names."""
+    return classify_threshold_grid(names, intensities, [thresholds], intensity_rules, name_rules,
+                                   stat, default_type)[0]
+
+def classify_threshold_grid(names, intensities, threshold_grid, intensity_rules=INTENSITY_RULES,
+                            name_rules=NAME_RULES, stat=MEAN_STAT, default_type=DEFAULT_TYPE):
+    """Classifies the components once for every thresholds dictionary in threshold_grid
+(None uses the defaults). The name masks and channel ratios are computed once and
+only the comparisons are repeated. Returns a (grid points x components) array of
+type names."""
+    import numpy as np
+
+    lower_names = np.char.lower(np.array(names, dtype=np.str_))
+    name_masks = [np.char.find(lower_names, fragment) >= 0 for fragment, component_type in name_rules]
+    values = intensities[:, :, stat]
+    rule_values = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for component_type, channel, denominator, threshold in intensity_rules:
+            if denominator is None:
+                rule_values.append(values[:, channel])
+            else:
+                rule_values.append(values[:, channel]/values[:, denominator])
+
+    choices = [component_type for fragment, component_type in name_rules] + [rule[0] for rule in intensity_rules]
+    component_types = np.empty((len(threshold_grid), len(names)), dtype=np.array(choices + [default_type]).dtype)
+    for point in range(len(threshold_grid)):
+        thresholds = threshold_grid[point] or dict()
+        conditions = list(name_masks)
+        for rule, value in zip(intensity_rules, rule_values):
+            conditions.append(value > thresholds.get(rule[0], rule[3]))
+        component_types[point] = np.select(conditions, choices, default_type)
+    return component_types
     
-def component_type_histograms(component_channels_dict):
+@Profiling.profiled('component_type_histograms')
+def component_type_histograms(component_channels_dict, filename='Channels.xlsx'):
     """This function prints out the mean and median intensity values for each channel
 for each component into an Excel spreadsheet, so that the values can be graphed
-or otherwise inspected."""
+or otherwise inspected.
+Edited 2026-10: the values are taken from the channels_to_array intensities, a row at a time"""
     import xlsxwriter
 
-    wb = xlsxwriter.Workbook('Channels.xlsx')
+    wb = xlsxwriter.Workbook(filename)
 
     sheet1 = wb.add_worksheet('Channels')
-    items = sorted(component_channels_dict.keys())
+    (names, intensities) = channels_to_array(component_channels_dict)
     sheet1.write(0,1,'Ch1_mean')
     sheet1.write(0,2,'Ch2_mean')
     sheet1.write(0,3,'Ch3_mean')
@@ -48,15 +101,10 @@ or otherwise inspected."""
     sheet1.write(0,6,'Ch2_median')
     sheet1.write(0,7,'Ch3_median')
     sheet1.write(0,8,'Ch4_median')
-    for i in range(len(items)):
-        sheet1.write(i+1, 0, items[i])
-        sheet1.write(i+1, 1, component_channels_dict[items[i]][0][1])
-        sheet1.write(i+1, 2, component_channels_dict[items[i]][1][1])
-        sheet1.write(i+1, 3, component_channels_dict[items[i]][2][1])
-        sheet1.write(i+1, 4, component_channels_dict[items[i]][3][1])
-        sheet1.write(i+1, 5, component_channels_dict[items[i]][0][0])
-        sheet1.write(i+1, 6, component_channels_dict[items[i]][1][0])
-        sheet1.write(i+1, 7, component_channels_dict[items[i]][2][0])
-        sheet1.write(i+1, 8, component_channels_dict[items[i]][3][0])
+    #one row per component in name order: the 4 channel means, then the 4 medians
+    order = sorted(range(len(names)), key=names.__getitem__)
+    for row in range(len(order)):
+        i = order[row]
+        sheet1.write_row(row+1, 0, [names[i]] + intensities[i, :, 1].tolist() + intensities[i, :, 0].tolist())
 
     wb.close()
@@ -0,0 +1,140 @@
+#Contact Handler bulk contact table
+#Added 2026-10 for whole-pancreas datasets
+
+"""This module builds the contacts of a tissue from the parsed component files
+in one pass of array operations instead of one dictionary probe per contact
+line. Every contact line of every file is a half-edge (owner, other, voxels):
+the file's component reported a contact with another component and measured
+it. ContactTable puts both sides of each half-edge in identifier order, groups
+the half-edges of the same contact with one np.unique over the canonical keys
+and numbers the contacts in order of first appearance, the order in which the
+scripts add them to contacts_dict. Each contact keeps its measurements in file
+order, so its size is the same average as Contact.get_size; measured_once
+flags the contacts that only one side reported, which the analyses drop
+(the len(number_of_voxels)!=2 filter). ArrayTissue is built from a
+ContactTable, and build_tissue_contacts fills a Tissue's Contacts from one."""
+
+import gc
+
+import numpy as np
+
+import Contact_Handler_definitions as Definitions
+
+
+def name_ranks(component_names):
+    """Returns the position of every component name in sorted order, so that comparing ranks
+compares names (as tuple(sorted([name, j])) does)"""
+    ranks = np.empty(len(component_names), dtype=np.int64)
+    ranks[np.argsort(np.array(component_names, dtype=np.str_), kind='stable')] = np.arange(len(component_names))
+    return ranks
+
+
+def gather_half_edges(component_index, component_info_list, features=None):
+    """Returns (owners, others, voxels), the component indices and measurement of every contact
+line of the get_component_info tuples, in file order. component_info_list may be any
+iterable, such as IO.iter_component_info. features, if given, is called with the
+owner's index and each tuple, to store the component features in the same pass."""
+    owners = []
+    others = []
+    voxels = []
+    for component_info in component_info_list:
+        owner = component_index[component_info[0]]
+        if features is not None:
+            features(owner, component_info)
+        for j, k in component_info[10]:
+            owners.append(owner)
+            others.append(component_index[j])
+            voxels.append(k)
+    return (np.array(owners, dtype=np.int64), np.array(others, dtype=np.int64), np.array(voxels, dtype=np.float64))
+
+
+class ContactTable:
+    """A ContactTable is built from the half-edge arrays of gather_half_edges and the
+name_ranks of the components. Contacts are numbered in order of first appearance; i
+and j are the component indices of the two sides, in identifier order like a Contact
+identifier. The measurements of contact c are
+measurement_voxels[measurement_offsets[c]:measurement_offsets[c+1]], in file order;
+size_a and size_b are the first two (nan if missing), voxel_sum and n_measurements
+cover all of them. half_edge_contacts gives the contact of every half-edge, in file
+order."""
+    def __init__(self, owners, others, voxels, ranks):
+        owners = np.asarray(owners, dtype=np.int64)
+        others = np.asarray(others, dtype=np.int64)
+        voxels = np.asarray(voxels, dtype=np.float64)
+        self.owners = owners
+
+        swap = ranks[owners] > ranks[others]
+        first_side = np.where(swap, others, owners)
+        second_side = np.where(swap, owners, others)
+        #one key per unordered pair; np.unique returns the first half-edge of every pair
+        (keys, first, inverse) = np.unique(first_side*len(ranks) + second_side, return_index=True, return_inverse=True)
+        contact_of_key = np.empty(len(keys), dtype=np.int64)
+        contact_of_key[np.argsort(first)] = np.arange(len(keys))
+        self.half_edge_contacts = contact_of_key[inverse.ravel()]
+
+        n_contacts = len(keys)
+        first = np.sort(first)
+        self.i = first_side[first]
+        self.j = second_side[first]
+        self.n_measurements = np.bincount(self.half_edge_contacts, minlength=n_contacts)
+        #bincount adds the measurements in file order, as the replicate measurements are added
+        self.voxel_sum = np.bincount(self.half_edge_contacts, weights=voxels, minlength=n_contacts)
+        self.measurement_offsets = np.zeros(n_contacts + 1, dtype=np.int64)
+        np.cumsum(self.n_measurements, out=self.measurement_offsets[1:])
+        self.measurement_voxels = voxels[np.argsort(self.half_edge_contacts, kind='stable')]
+        self.size_a = voxels[first]
+        self.size_b = np.full(n_contacts, np.nan)
+        replicated = np.flatnonzero(self.n_measurements >= 2)
+        self.size_b[replicated] = self.measurement_voxels[self.measurement_offsets[replicated] + 1]
+        self.measured_once = self.n_measurements == 1
+
+    def owner_order(self):
+        """Returns the half-edge indices sorted by owner, in file order within an owner (the
+order of the Components' contact_lists)"""
+        return np.argsort(self.owners, kind='stable')
+
+
+def build_tissue_contacts(tissue, component_info_list):
+    """Adds the features and contacts of the component files to a Tissue that has its
+Components but no Contacts yet, giving the same Tissue as add_component_info on every
+tuple: the Contacts are created in the same order, with the same measurements, and
+every Component's contact_list is in the same order. Returns the ContactTable."""
+    component_names = list(tissue.components_dict.keys())
+    components = list(tissue.components_dict.values())
+    component_index = {name: i for i, name in enumerate(component_names)}
+
+    def features(owner, component_info):
+        components[owner].add_component_features(*component_info[1:10])
+
+    #the build only allocates objects that are freed with the Tissue, so the cyclic garbage
+    #collector would scan the growing Tissue over and over for nothing
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        table = ContactTable(*gather_half_edges(component_index, component_info_list, features), name_ranks(component_names))
+
+        #contact types by pair of component type codes, instead of sorting the types of every Contact
+        type_names = sorted(set(component.component_type for component in components))
+        type_index = {name: i for i, name in enumerate(type_names)}
+        type_codes = np.array([type_index[component.component_type] for component in components], dtype=np.int64)
+        pair_types = [tuple(sorted([a, b])) for a in type_names for b in type_names]
+        contact_types = [pair_types[code] for code in (type_codes[table.i]*len(type_names) + type_codes[table.j]).tolist()]
+
+        identifiers = [(component_names[i], component_names[j]) for i, j in zip(table.i.tolist(), table.j.tolist())]
+        measurements = table.measurement_voxels.tolist()
+        offsets = table.measurement_offsets.tolist()
+        contacts = [Definitions.Contact.from_measurements(identifiers[c], contact_types[c], measurements[offsets[c]:offsets[c+1]])
+                    for c in range(len(identifiers))]
+        tissue.contacts_dict.update(zip(identifiers, contacts))
+
+        order = table.owner_order()
+        owner_identifiers = [identifiers[c] for c in table.half_edge_contacts[order].tolist()]
+        owner_offsets = np.zeros(len(components) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(table.owners, minlength=len(components)), out=owner_offsets[1:])
+        owner_offsets = owner_offsets.tolist()
+        for owner in np.flatnonzero(np.diff(owner_offsets)).tolist():
+            components[owner].contact_list.extend(owner_identifiers[owner_offsets[owner]:owner_offsets[owner+1]])
+    finally:
+        if collecting:
+            gc.enable()
+    return table
@@ -11,6 +11,8 @@ specifically for use in OAC's application with 3D confocal images of
 pancreatic islets - some variable names and values
 may need to be changed in a different application."""
 
+import Contact_Handler_profiling as Profiling
+
 class Tissue:
     """The Tissue class contains a dictionary contacts_dict that itself
 holds Contact objects. The Tissue class also contains a dictionary
@@ -61,6 +63,21 @@ embedded in the 3D image analyzed."""
         """Takes a Component object and adds it to the Tissue's dictionary of Components"""
         self.components_dict[component.identifier] = component
 
+    def add_component_info(self, component_info):
+        """Added 2026-10: adds the features and Contacts read from one component file (a
+get_component_info tuple) to an existing Component, the same way the main scripts do"""
+        (name, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size, contacts_list) = component_info
+        working_component = self.components_dict[name]
+        working_component.add_component_features(surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size)
+        for j,k in contacts_list:
+            contact_name = tuple(sorted([name, j]))
+            if contact_name in self.contacts_dict:
+                self.contacts_dict[contact_name].add_replicate_measurement(k)
+            else:
+                self.contacts_dict[contact_name] = Contact(working_component, self.components_dict[j], k)
+            working_component.add_contact(self.contacts_dict[contact_name])
+
+    @Profiling.profiled('find_cells')
     def find_cells(self):
         """Identifies the Component objects in the Tissue that are both fully inside the image 
         and that are either labeled cells or are touching labeled cells,
@@ -72,15 +89,16 @@ creating the Cells_List. It also returns a sorted list of all of the Contact typ
                 touching_endocrine = 0
 
                 for contact_name in component_object.contact_list: #loop through all contacts for each Component
+                    working_contact_type = self.contacts_dict[contact_name].contact_type
                     #create a set listing all of the contact types in the tissue 
-                    working_contact_types_set.add(self.contacts_dict[contact_name].contact_type)
+                    working_contact_types_set.add(working_contact_type)
                     
                     #Test whether the Component is involved in any endocrine-contacting Contacts
-                    if 'alpha' in self.contacts_dict[contact_name].contact_type: 
+                    if 'alpha' in working_contact_type: 
                         touching_endocrine = 1
-                    elif 'delta' in self.contacts_dict[contact_name].contact_type:
+                    elif 'delta' in working_contact_type:
                         touching_endocrine = 1
-                    elif 'beta' in self.contacts_dict[contact_name].contact_type:
+                    elif 'beta' in working_contact_type:
                         touching_endocrine = 1
 
             
@@ -92,53 +110,74 @@ creating the Cells_List. It also returns a sorted list of all of the Contact typ
 
             
 
+    def is_cell(self, component_name):
+        """Added 2026-10: the find_cells test for a single Component - fully inside the image and
+involved in an endocrine-labeled Contact (used to update cells_list incrementally)"""
+        component_object = self.components_dict[component_name]
+        touching_endocrine = 0
+        for contact_name in component_object.contact_list:
+            working_contact_type = self.contacts_dict[contact_name].contact_type
+            if 'alpha' in working_contact_type or 'delta' in working_contact_type or 'beta' in working_contact_type:
+                touching_endocrine = 1
+                break
+        return touching_endocrine == 1 and component_object.distance_to_edge > 0.2
+
+    @Profiling.profiled('compile_cells_and_contacts')
     def compile_cells_and_contacts(self):
         """This method runs through all of the data stored in the Component and Contact objects and creates lists of Contact size by type
 and of various Component parameters by Component type, for all of the Components in the Cells_List and associated Contacts"""
         working_contacts_set = set()
+        #Edited 2026-10: look up each Contact type's column instead of scanning contact_types_list
+        contact_type_columns = {contact_type: i for i, contact_type in enumerate(self.contact_types_list)}
             
         for cell in self.cells_list: #Loops through all Cells and measures the number of each type of Contact for each cell
             #and the number of surface voxels involved in each type of contact (summed)
-            working_contacts_counts = [0]*len(self.contact_types_list)
-            working_contacts_area = [0]*len(self.contact_types_list)
-            working_cell = self.components_dict[cell]
-            for item in working_cell.contact_list:
-                working_contact = self.contacts_dict[item]
-                """"2023-04-10 to avoid contacts so small that they were only measured once"""
-                if len(working_contact.number_of_voxels)!=2:
-                    continue
-                
-                for i in range(len(self.contact_types_list)):
-                    if working_contact.contact_type == self.contact_types_list[i]:
-                        working_contacts_counts[i] = working_contacts_counts[i] + 1
-                        working_contacts_area[i] = working_contacts_area[i] + working_contact.get_size()
-                    
+            (working_metrics, working_contacts) = self.compile_cell(cell, contact_type_columns)
+            for item, working_contact_type, working_size in working_contacts:
                 if item not in working_contacts_set:
                     working_contacts_set.add(item)
                     try:
-                        self.contact_sizes_dict[working_contact.contact_type].append(working_contact.get_size())
+                        self.contact_sizes_dict[working_contact_type].append(working_size)
                     except KeyError:
-                        self.contact_sizes_dict[working_contact.contact_type]=[working_contact.get_size()]
+                        self.contact_sizes_dict[working_contact_type]=[working_size]
 
-                
             try:#Add Cells to the cell_metrics_dict by component type.
                 #Basically a dictionary of lists containing all of the information for each cell, separated by type
-                self.cell_metrics_dict[working_cell.component_type].append((working_cell.identifier, working_cell.surface_area,
-                                                                               working_cell.volume, working_cell.sphericity,
-                                                                               working_cell.bounding_box, working_cell.ellipticity_p,
-                                                                               working_cell.ellipticity_o, working_cell.surface_voxels,
-                                                                            working_contacts_counts, working_contacts_area))
+                self.cell_metrics_dict[self.components_dict[cell].component_type].append(working_metrics)
             except KeyError:
-                self.cell_metrics_dict[working_cell.component_type]=[(working_cell.identifier, working_cell.surface_area,
-                                                                               working_cell.volume, working_cell.sphericity,
-                                                                               working_cell.bounding_box, working_cell.ellipticity_p,
-                                                                               working_cell.ellipticity_o, working_cell.surface_voxels,
-                                                                       working_contacts_counts, working_contacts_area)]
-                
-
-            self.voxel_size = working_cell.voxel_size 
+                self.cell_metrics_dict[self.components_dict[cell].component_type]=[working_metrics]
+
+            self.voxel_size = self.components_dict[cell].voxel_size 
+
+    def compile_cell(self, cell, contact_type_columns):
+        """Edited 2026-10 (split out of compile_cells_and_contacts): measures the number of each type of
+Contact for one cell and the number of surface voxels involved in each type of contact (summed).
+Returns the cell's cell_metrics_dict entry and the (identifier, type, size) of each of its Contacts
+that was measured twice, in contact_list order"""
+        working_contacts_counts = [0]*len(self.contact_types_list)
+        working_contacts_area = [0]*len(self.contact_types_list)
+        working_contacts = []
+        working_cell = self.components_dict[cell]
+        for item in working_cell.contact_list:
+            working_contact = self.contacts_dict[item]
+            """"2023-04-10 to avoid contacts so small that they were only measured once"""
+            if len(working_contact.number_of_voxels)!=2:
+                continue
             
+            working_contact_type = working_contact.contact_type
+            i = contact_type_columns.get(working_contact_type)
+            if i is not None:
+                working_contacts_counts[i] = working_contacts_counts[i] + 1
+                working_contacts_area[i] = working_contacts_area[i] + working_contact.get_size()
+            working_contacts.append((item, working_contact_type, working_contact.get_size()))
+
+        working_metrics = (working_cell.identifier, working_cell.surface_area, working_cell.volume, working_cell.sphericity,
+                           working_cell.bounding_box, working_cell.ellipticity_p, working_cell.ellipticity_o,
+                           working_cell.surface_voxels, working_contacts_counts, working_contacts_area)
+        return (working_metrics, working_contacts)
             
+            
+    @Profiling.profiled('compile_beta_beta_contacts')
     def compile_beta_beta_contacts(self):
         """This method written for the first time January 2020; Compiles all beta-beta contacts and their
         sizes (regardless of whether or not associated cells are fully embedded) so that the information can
@@ -166,6 +205,8 @@ and of various Component parameters by Component type, for all of the Components
                 self.beta_peri_contacts_size_p.append(contact.get_size())"""
         
         contacts_set = set()
+        #Edited 2026-10: look up each p_contact_types_list column instead of scanning the list
+        p_contact_type_columns = {p_type: i for i, p_type in enumerate(self.p_contact_types_list)}
         
         for component_name, component_object in self.components_dict.items():
             if component_object.component_type == 'beta':
@@ -186,17 +227,14 @@ and of various Component parameters by Component type, for all of the Components
                     
                     #contacts_set.add(contact)
 
-                    i = 0
-                    for p_type in self.p_contact_types_list:
-                        if working_contact.contact_type == p_type:
-                            working_contacts_counts[i] = working_contacts_counts[i] + 1
-                            working_contacts_size[i] = working_contacts_size[i] + working_contact.get_size()
-                            """"If statement added April 11 2023 because previously contacts had been skipped for contact count and contact proportion"""
-                            if contact not in contacts_set:
-                                self.beta_contacts_size_p[i].append(working_contact.get_size()*component_object.voxel_size)
-                                contacts_set.add(contact)
-                            break
-                        i = i+1
+                    i = p_contact_type_columns.get(working_contact.contact_type)
+                    if i is not None:
+                        working_contacts_counts[i] = working_contacts_counts[i] + 1
+                        working_contacts_size[i] = working_contacts_size[i] + working_contact.get_size()
+                        """"If statement added April 11 2023 because previously contacts had been skipped for contact count and contact proportion"""
+                        if contact not in contacts_set:
+                            self.beta_contacts_size_p[i].append(working_contact.get_size()*component_object.voxel_size)
+                            contacts_set.add(contact)
                 
                 working_contacts_proportion = [x/component_object.surface_voxels for x in working_contacts_size]
 
@@ -235,28 +273,49 @@ and of various Component parameters by Component type, for all of the Components
             
         
 
-
 class Contact:
     """Contact class objects contain the information about individual cell-cell
 and cell-ECM contacts in the 3D image. Each Contact object has an identifier,
 a contact_type, and a size (number of voxels)."""
+    __slots__ = ('identifier', 'number_of_voxels', 'contact_type', 'size')
+
     def __init__(self, component1, component2, voxels_measurement):
         self.identifier = tuple(sorted([component1.identifier, component2.identifier]))
 
         self.number_of_voxels = []
         self.number_of_voxels.append(voxels_measurement)
         self.contact_type = tuple(sorted([component1.component_type, component2.component_type]))
-
+        self.size = None
+
+    @classmethod
+    def from_measurements(cls, identifier, contact_type, number_of_voxels):
+        """Added 2026-10: makes a Contact whose sorted identifier, contact_type and list of
+measurements are already known (for the bulk builder in Contact_Handler_contact_table)"""
+        contact = cls.__new__(cls)
+        contact.identifier = identifier
+        contact.number_of_voxels = number_of_voxels
+        contact.contact_type = contact_type
+        contact.size = None
+        return contact
 
     def add_replicate_measurement(self, voxels_measurement):
         """Each Contact may be measured twice (as a part of each of two Components) - both measurements
 are stored in number_of_voxels, which is a list"""
         self.number_of_voxels.append(voxels_measurement)
+        self.size = None
+
+    def remove_replicate_measurement(self, voxels_measurement):
+        """Added 2026-10: removes one measurement from number_of_voxels (when the Component that
+reported it is re-read)"""
+        self.number_of_voxels.remove(voxels_measurement)
+        self.size = None
 
     def get_size(self):
-        """Returns the average of all voxels measurements in the contact's number_of_voxels list"""
-        average = sum(self.number_of_voxels)/len(self.number_of_voxels)
-        return average
+        """Returns the average of all voxels measurements in the contact's number_of_voxels list.
+Edited 2026-10: the average is cached until another replicate measurement is added"""
+        if self.size is None:
+            self.size = sum(self.number_of_voxels)/len(self.number_of_voxels)
+        return self.size
     
     def update_type(self, component1_ptype, component2_ptype):
         """"For the permutation analysis 2023-03-19"""
@@ -272,6 +331,10 @@ the 3D image. Each Component object has an identifier, a component_type, volume,
 area, sphericity, bounding box, ellipticity prolate and ellipticity oblate, 
 and a list containing the identifiers for the
 Contact objects associated with that Component."""
+    #__slots__ added 2026-10 to drop the per-instance __dict__ on large tissues
+    __slots__ = ('identifier', 'component_type', 'contact_list', 'surface_area', 'volume', 'sphericity',
+                 'bounding_box', 'ellipticity_p', 'ellipticity_o', 'surface_voxels', 'distance_to_edge', 'voxel_size')
+
     def __init__(self, name, component_type):
         self.identifier = name
         self.component_type = component_type
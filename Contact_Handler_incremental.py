@@ -0,0 +1,191 @@
+#Contact Handler incremental re-analysis
+#Added 2026-10 for re-exports of a few cells after a segmentation fix
+
+"""This module keeps a Tissue up to date with a folder of Contact Calculator
+exports without rebuilding it. IncrementalTissue remembers the fingerprint and
+the parsed contents of every component file; on update() only new, changed or
+removed files are read. Their old replicate measurements are taken out of the
+Contacts, the new ones are added, and find_cells / compile_cells_and_contacts
+are redone only for the touched neighbourhood (the re-read Components and the
+Components on the other side of their Contacts). The per-cell results are kept
+between updates and reassembled in the same order as a full run, so the Tissue
+ends up with the same cells_list, cell_metrics_dict, contact_sizes_dict,
+contact_types_list and beta_beta_contacts_list as Contact_Handler_Main would
+build from scratch. The state is pickled next to the data between runs, and
+only reused for the same component types (Edited 2026-10: a change of the
+classification rules or thresholds gives new types, and a fresh state)."""
+
+import os
+import pickle
+
+import Contact_Handler_IO as IO
+import Contact_Handler_definitions as Definitions
+import Contact_Handler_cache as Cache
+
+STATE_FILENAME = '.contact_handler_state.pickle'
+
+
+class IncrementalTissue:
+    """An IncrementalTissue owns a Tissue (tissue) built from component_types_dict.
+channel_filename is the channel intensity file the types came from; a saved state
+is only reused while that file and the component types are unchanged, since new types
+change every Contact."""
+    def __init__(self, component_types_dict, channel_filename):
+        self.tissue = Definitions.Tissue(dict(), dict(), [])
+        for component_name, component_type in component_types_dict.items():
+            self.tissue.new_component(Definitions.Component(component_name, component_type))
+        self.channel_fingerprint = Cache.file_fingerprint(channel_filename)
+        self.component_types_dict = dict(component_types_dict)
+
+        self.file_list = []
+        self.file_fingerprints = dict() #filename -> fingerprint of the parsed version
+        self.file_infos = dict() #filename -> get_component_info tuple
+        self.contact_type_counts = dict() #contact type -> number of contact_list entries of that type
+        self.cell_entries = dict() #cell -> compile_cell result, for every Component in cells_list
+
+    def update(self, file_list, n_workers=16):
+        """Brings the Tissue up to date with the component files in file_list and recompiles
+it. Returns the set of touched Components (all of them on the first update)."""
+        fingerprints = [Cache.file_fingerprint(filename) for filename in file_list]
+        changed = [i for i in range(len(file_list)) if self.file_fingerprints.get(file_list[i]) != fingerprints[i]]
+        current_files = set(file_list)
+        removed = [filename for filename in self.file_list if filename not in current_files]
+        first_update = len(self.file_infos) == 0
+        parsed = IO.get_component_info_list([file_list[i] for i in changed], n_workers)
+
+        touched = set()
+        contacts_moved = False
+        for filename in removed + [file_list[i] for i in changed if file_list[i] in self.file_infos]:
+            contacts_moved = self._remove_info(self.file_infos.pop(filename), touched) or contacts_moved
+            del self.file_fingerprints[filename]
+        for i, info in zip(changed, parsed):
+            contacts_moved = self._add_info(info, touched) or contacts_moved
+            self.file_infos[file_list[i]] = info
+            self.file_fingerprints[file_list[i]] = fingerprints[i]
+
+        if not first_update and (contacts_moved or len(removed) > 0 or file_list != self.file_list):
+            self._reorder_contacts(file_list)
+        self.file_list = list(file_list)
+        self._recompile(touched)
+        return touched
+
+    def _remove_info(self, info, touched):
+        """Takes a component file's measurements and contacts back out of the Tissue. Contacts
+left without measurements are deleted; returns True if any were."""
+        contacts_dict = self.tissue.contacts_dict
+        working_component = self.tissue.components_dict[info[0]]
+        touched.add(info[0])
+        for contact_name in working_component.contact_list:
+            self.contact_type_counts[contacts_dict[contact_name].contact_type] -= 1
+        working_component.contact_list = []
+
+        deleted = False
+        for j, k in info[10]:
+            contact_name = tuple(sorted([info[0], j]))
+            contacts_dict[contact_name].remove_replicate_measurement(k)
+            if len(contacts_dict[contact_name].number_of_voxels) == 0:
+                del contacts_dict[contact_name]
+                deleted = True
+            touched.add(j)
+        return deleted
+
+    def _add_info(self, info, touched):
+        """Adds a component file's features, measurements and contacts to the Tissue, the same
+way Contact_Handler_Main does. Returns True if any new Contacts were created."""
+        (name, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels,
+         distance_to_edge, voxel_size, contacts_list) = info
+        contacts_dict = self.tissue.contacts_dict
+        working_component = self.tissue.components_dict[name]
+        working_component.add_component_features(surface_area, volume, sphericity, bounding_box, ellipticity_p,
+                                                 ellipticity_o, s_voxels, distance_to_edge, voxel_size)
+        touched.add(name)
+
+        created = False
+        for j, k in contacts_list:
+            contact_name = tuple(sorted([name, j]))
+            if contact_name in contacts_dict:
+                contacts_dict[contact_name].add_replicate_measurement(k)
+            else:
+                contacts_dict[contact_name] = Definitions.Contact(working_component, self.tissue.components_dict[j], k)
+                created = True
+            working_component.add_contact(contacts_dict[contact_name])
+            contact_type = contacts_dict[contact_name].contact_type
+            self.contact_type_counts[contact_type] = self.contact_type_counts.get(contact_type, 0) + 1
+            touched.add(j)
+        return created
+
+    def _reorder_contacts(self, file_list):
+        """Puts contacts_dict back in the order a full run creates it (first report, in file order)"""
+        contacts_dict = self.tissue.contacts_dict
+        ordered = dict()
+        for filename in file_list:
+            name = self.file_infos[filename][0]
+            for j, k in self.file_infos[filename][10]:
+                contact_name = tuple(sorted([name, j]))
+                if contact_name not in ordered:
+                    ordered[contact_name] = contacts_dict[contact_name]
+        contacts_dict.clear()
+        contacts_dict.update(ordered)
+
+    def _recompile(self, touched):
+        """Redoes find_cells and compile_cell for the touched Components (for all of them if the
+set of contact types changed, since that moves the count and area columns) and
+reassembles the Tissue's result lists from the stored per-cell results"""
+        tissue = self.tissue
+        contact_types_list = sorted(contact_type for contact_type, count in self.contact_type_counts.items() if count > 0)
+        if contact_types_list != tissue.contact_types_list:
+            tissue.contact_types_list = contact_types_list
+            touched = tissue.components_dict.keys()
+        contact_type_columns = {contact_type: i for i, contact_type in enumerate(contact_types_list)}
+
+        for component_name in touched:
+            if tissue.is_cell(component_name):
+                self.cell_entries[component_name] = tissue.compile_cell(component_name, contact_type_columns)
+            else:
+                self.cell_entries.pop(component_name, None)
+
+        #same order as find_cells (components_dict order) and compile_cells_and_contacts
+        tissue.cells_list = [component_name for component_name in tissue.components_dict if component_name in self.cell_entries]
+        tissue.cell_metrics_dict = dict()
+        tissue.contact_sizes_dict = dict()
+        working_contacts_set = set()
+        for cell in tissue.cells_list:
+            (working_metrics, working_contacts) = self.cell_entries[cell]
+            for item, working_contact_type, working_size in working_contacts:
+                if item not in working_contacts_set:
+                    working_contacts_set.add(item)
+                    try:
+                        tissue.contact_sizes_dict[working_contact_type].append(working_size)
+                    except KeyError:
+                        tissue.contact_sizes_dict[working_contact_type] = [working_size]
+            try:
+                tissue.cell_metrics_dict[tissue.components_dict[cell].component_type].append(working_metrics)
+            except KeyError:
+                tissue.cell_metrics_dict[tissue.components_dict[cell].component_type] = [working_metrics]
+            tissue.voxel_size = tissue.components_dict[cell].voxel_size
+
+        tissue.beta_beta_contacts_list = []
+        tissue.compile_beta_beta_contacts()
+
+    def save(self, path='.', filename=STATE_FILENAME):
+        """Pickles the IncrementalTissue into path"""
+        state_filename = os.path.join(path, filename)
+        with open(state_filename + '.tmp', 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(state_filename + '.tmp', state_filename)
+
+
+def load_incremental_tissue(channel_filename, component_types_dict, path='.', filename=STATE_FILENAME):
+    """Returns the IncrementalTissue saved in path, or None if there is none, the channel
+intensity file has changed since it was saved or it was built with other component
+types than component_types_dict (e.g. after a change of the classification rules)"""
+    state_filename = os.path.join(path, filename)
+    if not os.path.exists(state_filename):
+        return None
+    with open(state_filename, 'rb') as f:
+        incremental_tissue = pickle.load(f)
+    if incremental_tissue.channel_fingerprint != Cache.file_fingerprint(channel_filename):
+        return None
+    if getattr(incremental_tissue, 'component_types_dict', None) != component_types_dict:
+        return None
+    return incremental_tissue
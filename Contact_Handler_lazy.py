@@ -0,0 +1,95 @@
+#Contact Handler lazy component loading
+#Added 2026-10 for permutation-only runs
+
+"""This module gives the analyses that only need part of each component file a
+way around building the whole Tissue object graph. A ComponentTable holds the
+parsed component files as the columns of the TissueCache: one row per file
+with its features, and an offset index (contact_offsets) into the flat contact
+columns, so the contacts of any file are found without a dictionary of Contact
+objects. Only the requested feature columns (fields) are gathered per
+component up front; every other feature is gathered the first time it is
+asked for. The permutation analysis needs only the component types, the
+contact half-edges and the surface_voxels, voxel_size and distance_to_edge
+features (PERMUTATION_FIELDS), which the table builds with array operations
+for PermutationEngine.from_component_table. An analysis that needs the full
+Tissue loads it with Contact_Handler_pipeline.load_tissue instead."""
+
+import numpy as np
+
+import Contact_Handler_definitions as Definitions
+import Contact_Handler_cache as Cache
+import Contact_Handler_contact_table as Contact_Table
+
+PERMUTATION_FIELDS = ('surface_voxels', 'voxel_size', 'distance_to_edge')
+#Component attribute -> FEATURE_NAMES column(s) of the cache
+FEATURE_COLUMNS = {'surface_area': 'surface_area', 'volume': 'volume', 'sphericity': 'sphericity',
+                   'bounding_box': ('bounding_box_1', 'bounding_box_2', 'bounding_box_3'),
+                   'ellipticity_p': 'ellipticity_p', 'ellipticity_o': 'ellipticity_o', 'surface_voxels': 's_voxels',
+                   'distance_to_edge': 'distance_to_edge', 'voxel_size': 'voxel_size'}
+
+
+class ComponentTable:
+    """A ComponentTable is built from component_types_dict (which fixes the component order,
+as for a Tissue) and the TissueCache.component_table arrays of the component files (one
+row per file, in file order). fields lists the features gathered per component
+straight away; feature() gathers any other on its first call. As when a Tissue is
+built, a component named in a file but missing from component_types_dict raises
+KeyError, and a component with several files takes the features of the last one."""
+    def __init__(self, component_types_dict, arrays, fields=PERMUTATION_FIELDS):
+        self.component_names = list(component_types_dict.keys())
+        self.component_types = list(component_types_dict.values())
+        self.component_index = {name: i for i, name in enumerate(self.component_names)}
+        #the permutation contact types are the Tissue's
+        self.p_contact_types_list = list(Definitions.Tissue(dict(), dict(), []).p_contact_types_list)
+
+        self.identifiers = arrays['identifiers'].tolist()
+        self.features = arrays['features']
+        self.contact_offsets = arrays['contact_offsets']
+        self.names = arrays['names'].tolist()
+        self.contact_names = arrays['contact_names']
+        self.contact_voxels = arrays['contact_voxels']
+
+        self.row_components = np.array([self.component_index[identifier] for identifier in self.identifiers], dtype=np.int64)
+        self.feature_rows = np.full(len(self.component_names), -1, dtype=np.int64)
+        for row, component in enumerate(self.row_components.tolist()):
+            self.feature_rows[component] = row
+        self.feature_columns = dict()
+        for field in fields:
+            self.feature(field)
+
+    def feature(self, field):
+        """Returns the per-component array of a feature (nan for components without a file;
+bounding_box has three columns)"""
+        if field not in self.feature_columns:
+            columns = FEATURE_COLUMNS[field]
+            if isinstance(columns, tuple):
+                indices = [Cache.FEATURE_NAMES.index(column) for column in columns]
+            else:
+                indices = Cache.FEATURE_NAMES.index(columns)
+            values = np.full((len(self.component_names),) + np.shape(indices), np.nan)
+            has_file = self.feature_rows >= 0
+            values[has_file] = self.features[self.feature_rows[has_file]][:, indices]
+            self.feature_columns[field] = values
+        return self.feature_columns[field]
+
+    def half_edges(self):
+        """Returns (owner, other, voxels): one entry per contact reported in a component file, in
+the order of the Tissue's Components and, within a Component, of its contact_list"""
+        name_components = np.array([self.component_index[name] for name in self.names], dtype=np.int64)
+        owner = np.repeat(self.row_components, np.diff(self.contact_offsets))
+        order = np.argsort(owner, kind='stable')
+        return (owner[order], name_components[self.contact_names][order], self.contact_voxels[order])
+
+    def permutation_half_edges(self):
+        """Returns the PermutationEngine owner, other, contact_ids and contact_sizes arrays: the
+half-edges of the Contacts measured exactly twice, each Contact numbered in order of first
+appearance and sized by the average of its two measurements, as _compile_half_edges
+does on a Tissue"""
+        (owner, other, voxels) = self.half_edges()
+        table = Contact_Table.ContactTable(owner, other, voxels, Contact_Table.name_ranks(self.component_names))
+        kept = np.flatnonzero(table.n_measurements[table.half_edge_contacts] == 2)
+        #the table numbers the contacts in order of first appearance, so their ranks among the kept ones are the ids
+        (contacts, contact_ids) = np.unique(table.half_edge_contacts[kept], return_inverse=True)
+        sizes = table.voxel_sum/table.n_measurements
+        return (owner[kept], other[kept], contact_ids.ravel(), sizes[table.half_edge_contacts[kept]])
+
@@ -0,0 +1,217 @@
+#Contact Handler output backends
+#Added 2026-10 for runs that outgrow Excel
+
+"""This module provides output backends for the tables written by
+IO.export_to_excel and IO.export_permutation_beta. ExcelBackend keeps the
+original spreadsheets and is the default; CSVBackend, ParquetBackend and
+HDF5Backend write the same information as long-format columnar tables (one file
+or group per table) for pandas and R pipelines. Tables are produced as row
+generators and written in row groups, so no backend needs to hold a whole table
+in memory. pyarrow (Parquet) and h5py (HDF5) are only imported by their
+backends.
+Edited 2026-10: every table declares the type of each of its columns ('str', 'int'
+or 'float'), which the Parquet schema and the HDF5 datasets are created from, instead
+of inferring them from the first row group."""
+
+import os
+
+ROW_GROUP_SIZE = 65536
+#The column types a table can declare
+COLUMN_TYPES = ('str', 'int', 'float')
+
+
+def results_tables(contact_sizes_dict, contact_types_list, cell_metrics_dict, voxel_size, beta_beta_contacts_list):
+    """Returns the export_to_excel information as (name, header, column_types, rows) tables, rows
+being generators"""
+    def contact_sizes_rows():
+        for contact_type in contact_types_list:
+            for size in contact_sizes_dict.get(contact_type, []):
+                yield [str(contact_type), size, size*voxel_size]
+
+    def cell_metrics_rows():
+        for cell_type in sorted(cell_metrics_dict.keys()):
+            for (identifier, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o,
+                 surface_voxels, contacts_counts, contacts_area) in cell_metrics_dict[cell_type]:
+                yield ([identifier, cell_type, surface_area, volume, sphericity, bounding_box[0], bounding_box[1],
+                        bounding_box[2], ellipticity_p, ellipticity_o, surface_voxels, surface_voxels*voxel_size]
+                       + list(contacts_counts) + [area/surface_voxels for area in contacts_area])
+
+    def beta_beta_rows():
+        for vertex_1, vertex_2, weight in beta_beta_contacts_list:
+            yield [vertex_1, vertex_2, weight]
+
+    cell_metrics_header = (['Identifier', 'Cell Type', 'Surface Area', 'Volume', 'Sphericity', 'Bounding Box 1',
+                            'Bounding Box 2', 'Bounding Box 3', 'Ellipticity Prolate', 'Ellipticity Oblate',
+                            'Surface Voxels', 'Calculated Surface Area']
+                           + [str(contact_type)+' Count' for contact_type in contact_types_list]
+                           + [str(contact_type)+' Proportion' for contact_type in contact_types_list])
+    cell_metrics_types = ['str', 'str'] + ['float']*10 + ['int']*len(contact_types_list) + ['float']*len(contact_types_list)
+    return [('contact_sizes', ['Contact Type', 'Size (voxels)', 'Size (um^2)'], ['str', 'float', 'float'], contact_sizes_rows()),
+            ('cell_metrics', cell_metrics_header, cell_metrics_types, cell_metrics_rows()),
+            ('beta_beta_contacts', ['Vertex 1', 'Vertex 2', 'Edge Weight'], ['str', 'str', 'float'], beta_beta_rows())]
+
+
+def permutation_tables(p_contact_types_list, beta_contacts_size_p, beta_contacts_counts_p, beta_contacts_proportion_p):
+    """Returns the export_permutation_beta information as (name, header, column_types, rows) tables"""
+    def size_rows():
+        for j in range(len(p_contact_types_list)):
+            for size in beta_contacts_size_p[j]:
+                yield [str(p_contact_types_list[j]), size]
+
+    def cell_rows():
+        for j in range(len(p_contact_types_list)):
+            for count, proportion in zip(beta_contacts_counts_p[j], beta_contacts_proportion_p[j]):
+                yield [str(p_contact_types_list[j]), count, proportion]
+
+    return [('sizes', ['Contact Type', 'Size (um^2)'], ['str', 'float'], size_rows()),
+            ('cells', ['Contact Type', 'Count', 'Proportion'], ['str', 'int', 'float'], cell_rows())]
+
+
+def _row_groups(rows, row_group_size):
+    """Yields lists of at most row_group_size rows"""
+    group = []
+    for row in rows:
+        group.append(row)
+        if len(group) == row_group_size:
+            yield group
+            group = []
+    if len(group) > 0:
+        yield group
+
+
+class OutputBackend:
+    """Base class of the output backends. A backend writes tables into the directory
+path, named by prefix (for example Results or Results_permute) and the table name.
+Subclasses implement write_table(name, header, column_types, rows), consuming rows one
+row group at a time."""
+    def __init__(self, path='.', row_group_size=ROW_GROUP_SIZE):
+        self.path = path
+        self.row_group_size = row_group_size
+
+    def write_results(self, contact_sizes_dict, contact_types_list, cell_metrics_dict, voxel_size, beta_beta_contacts_list, prefix='Results'):
+        """Writes the tables of export_to_excel"""
+        for name, header, column_types, rows in results_tables(contact_sizes_dict, contact_types_list, cell_metrics_dict,
+                                                               voxel_size, beta_beta_contacts_list):
+            self.write_table(prefix + '_' + name, header, column_types, rows)
+
+    def write_permutation(self, p_contact_types_list, beta_contacts_size_p, beta_contacts_counts_p, beta_contacts_proportion_p, prefix='Results_permute'):
+        """Writes the tables of export_permutation_beta"""
+        for name, header, column_types, rows in permutation_tables(p_contact_types_list, beta_contacts_size_p,
+                                                                   beta_contacts_counts_p, beta_contacts_proportion_p):
+            self.write_table(prefix + '_' + name, header, column_types, rows)
+
+    def write_table(self, name, header, column_types, rows):
+        raise NotImplementedError
+
+
+class ExcelBackend(OutputBackend):
+    """The default backend: the original Results.xlsx and Results_permute.xlsx layouts"""
+    def write_results(self, contact_sizes_dict, contact_types_list, cell_metrics_dict, voxel_size, beta_beta_contacts_list, prefix='Results'):
+        import Contact_Handler_IO as IO
+        IO.export_to_excel(contact_sizes_dict, contact_types_list, cell_metrics_dict, voxel_size,
+                           beta_beta_contacts_list, os.path.join(self.path, prefix + '.xlsx'))
+
+    def write_permutation(self, p_contact_types_list, beta_contacts_size_p, beta_contacts_counts_p, beta_contacts_proportion_p, prefix='Results_permute'):
+        import Contact_Handler_IO as IO
+        IO.export_permutation_beta(p_contact_types_list, beta_contacts_size_p, beta_contacts_counts_p,
+                                   beta_contacts_proportion_p, os.path.join(self.path, prefix + '.xlsx'))
+
+    def write_table(self, name, header, column_types, rows):
+        """Writes a single table to its own workbook (used for tables without an Excel layout)"""
+        import xlsxwriter
+
+        wb = xlsxwriter.Workbook(os.path.join(self.path, name + '.xlsx'), {'constant_memory': True, 'nan_inf_to_errors': True})
+        sheet = wb.add_worksheet(name[:31])
+        sheet.write_row(0, 0, header)
+        row = 1
+        for group in _row_groups(rows, self.row_group_size):
+            for values in group:
+                sheet.write_row(row, 0, values)
+                row = row + 1
+        wb.close()
+
+
+class CSVBackend(OutputBackend):
+    """Writes each table to name.csv.gz (or name.csv with compression=None)"""
+    def __init__(self, path='.', row_group_size=ROW_GROUP_SIZE, compression='gzip'):
+        OutputBackend.__init__(self, path, row_group_size)
+        self.compression = compression
+
+    def write_table(self, name, header, column_types, rows):
+        import csv
+        import gzip
+
+        if self.compression == 'gzip':
+            f = gzip.open(os.path.join(self.path, name + '.csv.gz'), 'wt', newline='')
+        else:
+            f = open(os.path.join(self.path, name + '.csv'), 'w', newline='')
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for group in _row_groups(rows, self.row_group_size):
+                writer.writerows(group)
+
+
+class ParquetBackend(OutputBackend):
+    """Writes each table to name.parquet, one Parquet row group per row group (needs pyarrow)"""
+    def __init__(self, path='.', row_group_size=ROW_GROUP_SIZE, compression='zstd'):
+        OutputBackend.__init__(self, path, row_group_size)
+        self.compression = compression
+
+    def write_table(self, name, header, column_types, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow_types = {'str': pa.string(), 'int': pa.int64(), 'float': pa.float64()}
+        schema = pa.schema([(column, arrow_types[column_type]) for column, column_type in zip(header, column_types)])
+        with pq.ParquetWriter(os.path.join(self.path, name + '.parquet'), schema, compression=self.compression) as writer:
+            for group in _row_groups(rows, self.row_group_size):
+                columns = [list(column) for column in zip(*group)]
+                writer.write_table(pa.Table.from_arrays([pa.array(columns[i], type=schema.field(i).type)
+                                                         for i in range(len(header))], schema=schema))
+
+
+class HDF5Backend(OutputBackend):
+    """Writes each table as a group of resizable, compressed column datasets in one
+HDF5 file, filename (needs h5py). Text columns are stored as UTF-8 strings."""
+    def __init__(self, path='.', row_group_size=ROW_GROUP_SIZE, filename='Results.h5', compression='gzip'):
+        OutputBackend.__init__(self, path, row_group_size)
+        self.filename = os.path.join(path, filename)
+        self.compression = compression
+
+    def write_table(self, name, header, column_types, rows):
+        import h5py
+        import numpy as np
+
+        dtypes = {'str': h5py.string_dtype('utf-8'), 'int': np.int64, 'float': np.float64}
+        with h5py.File(self.filename, 'a') as f:
+            if name in f:
+                del f[name]
+            group = f.create_group(name)
+            group.attrs['columns'] = header
+            datasets = []
+            for i in range(len(header)):
+                datasets.append(group.create_dataset(str(i), shape=(0,), maxshape=(None,), dtype=dtypes[column_types[i]],
+                                                     chunks=(self.row_group_size,), compression=self.compression))
+                datasets[i].attrs['name'] = header[i]
+            n_rows = 0
+            for row_group in _row_groups(rows, self.row_group_size):
+                columns = list(zip(*row_group))
+                for i in range(len(header)):
+                    values = columns[i]
+                    if column_types[i] == 'int':
+                        #refuse to truncate instead of silently dropping a fractional part
+                        values = np.asarray(values)
+                        if not np.issubdtype(values.dtype, np.integer):
+                            raise TypeError('column %r holds values that are not integers' % header[i])
+                    datasets[i].resize((n_rows + len(row_group),))
+                    datasets[i][n_rows:] = values
+                n_rows = n_rows + len(row_group)
+            group.attrs['rows'] = n_rows
+
+
+BACKENDS = {'excel': ExcelBackend, 'csv': CSVBackend, 'parquet': ParquetBackend, 'hdf5': HDF5Backend}
+
+def get_backend(name, path='.', **options):
+    """Returns the backend registered as name ('excel', 'csv', 'parquet' or 'hdf5')"""
+    return BACKENDS[name](path, **options)
@@ -0,0 +1,376 @@
+#Contact Handler permutation engine
+#Added 2026-10 to replace the per-iteration object loop in the permutation scripts
+
+"""This module compiles a Tissue once into integer-coded NumPy arrays so that
+the permutation analysis can relabel components without touching the Component
+and Contact objects. Each permutation is a relabeling of the component type
+code array; the beta contact counts, sizes and proportions for all of the
+p_contact_types_list types are then computed in one batched pass over the
+contact half-edges. The values produced are the same, in the same order, as
+Tissue.compile_permutation_beta_contacts."""
+
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import Contact_Handler_profiling as Profiling
+
+
+class PermutationEngine:
+    """The PermutationEngine holds the integer-coded form of a Tissue:
+component type codes (in components_dict order), one half-edge per entry of
+each Component's contact_list (in contact_list order) and the averaged size of
+each Contact. components_endocrine is the pool of component identifiers whose
+labels are shuffled, and endocrine_types gives the order in which the labels
+are handed back out to the shuffled pool (('beta',) in Permutation_Main.py,
+('beta', 'alpha', 'delta') in Permutation_Main_KeepHighBeta.py). With
+network_statistics, the network statistics of the beta-beta subgraph
+(Contact_Handler_network.InducedNetwork) are computed for every permutation too.
+from_component_table compiles the same engine from a Contact_Handler_lazy.ComponentTable
+without building the Tissue."""
+    def __init__(self, tissue, components_endocrine, endocrine_types=('beta',), network_statistics=False):
+        self._compile_types(tissue.p_contact_types_list, list(tissue.components_dict.keys()),
+                            [component.component_type for component in tissue.components_dict.values()])
+        self.surface_voxels = np.array([getattr(component, 'surface_voxels', np.nan)
+                                        for component in tissue.components_dict.values()], dtype=np.float64)
+        self.voxel_size = np.array([getattr(component, 'voxel_size', np.nan)
+                                    for component in tissue.components_dict.values()], dtype=np.float64)
+        self.distance_to_edge = np.array([getattr(component, 'distance_to_edge', np.nan)
+                                          for component in tissue.components_dict.values()], dtype=np.float64)
+        self._compile_half_edges(tissue)
+        self._compile_pool(components_endocrine, endocrine_types, network_statistics)
+
+    @classmethod
+    def from_component_table(cls, table, components_endocrine, endocrine_types=('beta',), network_statistics=False):
+        """Added 2026-10: compiles the engine of the Tissue that load_tissue would build from the
+same folder, straight from the table's arrays (see Contact_Handler_lazy)"""
+        engine = cls.__new__(cls)
+        engine._compile_types(table.p_contact_types_list, table.component_names, table.component_types)
+        engine.surface_voxels = table.feature('surface_voxels')
+        engine.voxel_size = table.feature('voxel_size')
+        engine.distance_to_edge = table.feature('distance_to_edge')
+        (engine.owner, engine.other, engine.contact_ids, engine.contact_sizes) = table.permutation_half_edges()
+        engine._compile_pool(components_endocrine, endocrine_types, network_statistics)
+        return engine
+
+    def _compile_types(self, p_contact_types_list, component_names, component_types):
+        """Builds the component index, the type codes and the contact type column lookup"""
+        self.p_contact_types_list = list(p_contact_types_list)
+        self.component_names = list(component_names)
+        self.component_index = {name: i for i, name in enumerate(self.component_names)}
+
+        types_set = set(component_types)
+        for p_type in self.p_contact_types_list:
+            types_set.update(p_type)
+        self.type_names = sorted(types_set)
+        self.type_index = {name: i for i, name in enumerate(self.type_names)}
+        self.beta_code = self.type_index['beta']
+        self.type_codes = np.array([self.type_index[component_type] for component_type in component_types], dtype=np.int64)
+
+        #column_lookup[owner type, other type] is the p_contact_types_list column of the contact, or -1
+        self.column_lookup = np.full((len(self.type_names), len(self.type_names)), -1, dtype=np.int64)
+        for a in range(len(self.type_names)):
+            for b in range(len(self.type_names)):
+                contact_type = tuple(sorted([self.type_names[a], self.type_names[b]]))
+                if contact_type in self.p_contact_types_list:
+                    self.column_lookup[a, b] = self.p_contact_types_list.index(contact_type)
+
+    def _compile_pool(self, components_endocrine, endocrine_types, network_statistics):
+        """Builds the shuffled pool and its labels, and the beta-beta network if requested"""
+        self.pool = np.array([self.component_index[name] for name in components_endocrine], dtype=np.int64)
+        pool_types = [self.type_names[code] for code in self.type_codes[self.pool].tolist()]
+        self.pool_labels = np.array([self.type_index[t] for t in endocrine_types
+                                     for name_type in pool_types if name_type == t], dtype=np.int64)
+        if len(self.pool_labels) != len(self.pool):
+            raise ValueError('components_endocrine holds component types missing from endocrine_types')
+
+        self.network = None
+        self.network_names = None
+        if network_statistics:
+            import Contact_Handler_network as Network
+            first = np.unique(self.contact_ids, return_index=True)[1]
+            self.network = Network.InducedNetwork(len(self.component_names), self.owner[first], self.other[first])
+            self.network_names = list(Network.NETWORK_STATISTIC_NAMES)
+
+    def _compile_half_edges(self, tissue):
+        """Builds the owner/other/contact/size arrays. Contacts that were only measured
+once are dropped here, as in compile_permutation_beta_contacts (2023-04-10)."""
+        owner = []
+        other = []
+        contact_ids = []
+        sizes = []
+        contact_index = dict()
+        for component_name, component_object in tissue.components_dict.items():
+            i = self.component_index[component_name]
+            for contact in component_object.contact_list:
+                working_contact = tissue.contacts_dict[contact]
+                if len(working_contact.number_of_voxels)!=2:
+                    continue
+                owner.append(i)
+                other.append(self.component_index[contact[1] if contact[0] == component_name else contact[0]])
+                contact_ids.append(contact_index.setdefault(contact, len(contact_index)))
+                sizes.append(working_contact.get_size())
+
+        self.owner = np.array(owner, dtype=np.int64)
+        self.other = np.array(other, dtype=np.int64)
+        self.contact_ids = np.array(contact_ids, dtype=np.int64)
+        self.contact_sizes = np.array(sizes, dtype=np.float64)
+
+    def relabel(self, order):
+        """Returns a new type code array in which the shuffled endocrine pool, taken
+in the given order (a permutation of range(len(pool))), receives the endocrine
+labels block by block - the array equivalent of the update_type loops."""
+        type_codes = self.type_codes.copy()
+        type_codes[self.pool[np.asarray(order, dtype=np.int64)]] = self.pool_labels
+        return type_codes
+
+    def compile_permutation(self, type_codes):
+        """Computes the beta contact sizes (um^2, each contact once), and the per-beta-cell
+contact counts and proportions for every p_contact_types_list type under the
+labeling type_codes. Returns (sizes, counts, proportions): sizes is a list
+with one array per type, counts and proportions are (beta cells x types) arrays."""
+        n_types = len(self.p_contact_types_list)
+        owner_codes = type_codes[self.owner]
+        columns = self.column_lookup[owner_codes, type_codes[self.other]]
+        kept = np.flatnonzero((owner_codes == self.beta_code) & (columns >= 0))
+
+        beta_components = np.flatnonzero(type_codes == self.beta_code)
+        row_of = np.full(len(type_codes), -1, dtype=np.int64)
+        row_of[beta_components] = np.arange(len(beta_components))
+        flat = row_of[self.owner[kept]]*n_types + columns[kept]
+
+        counts = np.bincount(flat, minlength=len(beta_components)*n_types).reshape(-1, n_types)
+        size_sums = np.bincount(flat, weights=self.contact_sizes[kept],
+                                minlength=len(beta_components)*n_types).reshape(-1, n_types)
+        proportions = size_sums/self.surface_voxels[beta_components][:, None]
+
+        #each contact is reported once, by the first beta cell that holds it
+        first = np.unique(self.contact_ids[kept], return_index=True)[1]
+        first = kept[np.sort(first)]
+        first_sizes = self.contact_sizes[first]*self.voxel_size[self.owner[first]]
+        first_columns = columns[first]
+        sizes = [first_sizes[first_columns == j] for j in range(n_types)]
+
+        return (sizes, counts, proportions)
+
+    def compile_network(self, type_codes):
+        """Returns the network statistics of the beta-beta subgraph under the labeling type_codes"""
+        return self.network.statistics(type_codes == self.beta_code)
+
+    def add_permutation(self, results, type_codes):
+        """Compiles the labeling type_codes into the results accumulator (and its network
+statistics, if the engine computes them)"""
+        results.add(*self.compile_permutation(type_codes))
+        if self.network is not None:
+            results.add_network(self.compile_network(type_codes))
+
+
+class PermutationResults:
+    """Accumulates the output of PermutationEngine.compile_permutation in the same
+list-of-lists layout as the Tissue's beta_contacts_size_p, beta_contacts_counts_p
+and beta_contacts_proportion_p, ready for IO.export_permutation_beta. The network
+statistics of each permutation, if any, are kept as rows in network_p.
+significance (a Contact_Handler_statistics.PermutationSignificance) is also fed
+every permutation, for the observed-vs-null report."""
+    def __init__(self, p_contact_types_list, significance=None):
+        self.p_contact_types_list = list(p_contact_types_list)
+        self.beta_contacts_size_p = [[] for p_type in self.p_contact_types_list]
+        self.beta_contacts_counts_p = [[] for p_type in self.p_contact_types_list]
+        self.beta_contacts_proportion_p = [[] for p_type in self.p_contact_types_list]
+        self.network_p = []
+        self.significance = significance
+
+    def add(self, sizes, counts, proportions):
+        """Appends the results of one permutation"""
+        for j in range(len(self.p_contact_types_list)):
+            self.beta_contacts_size_p[j].extend(sizes[j].tolist())
+            self.beta_contacts_counts_p[j].extend(counts[:, j].tolist())
+            self.beta_contacts_proportion_p[j].extend(proportions[:, j].tolist())
+        if self.significance is not None:
+            self.significance.add(sizes, counts, proportions)
+
+    def add_network(self, values):
+        """Appends the network statistics of one permutation"""
+        self.network_p.append(values.tolist())
+        if self.significance is not None:
+            self.significance.add_network(values)
+
+    def new_partial(self):
+        """Returns an empty PermutationResults for a block of permutations"""
+        return PermutationResults(self.p_contact_types_list, None if self.significance is None else self.significance.new_partial())
+
+    def merge(self, other):
+        """Appends all of the permutations held by another PermutationResults"""
+        for j in range(len(self.p_contact_types_list)):
+            self.beta_contacts_size_p[j].extend(other.beta_contacts_size_p[j])
+            self.beta_contacts_counts_p[j].extend(other.beta_contacts_counts_p[j])
+            self.beta_contacts_proportion_p[j].extend(other.beta_contacts_proportion_p[j])
+        self.network_p.extend(other.network_p)
+        if self.significance is not None:
+            self.significance.merge(other.significance)
+
+
+def run_permutations(engine, n_permutations, results=None, shuffle=random.shuffle):
+    """Runs n_permutations relabelings of the engine's endocrine pool and returns the
+results (a PermutationResults unless another accumulator with the same add/merge
+interface, such as Contact_Handler_statistics.StreamingPermutationStatistics,
+is passed in; add_network is also called if the engine computes network statistics). The pool order is shuffled in place on every iteration with
+the global random module, exactly as the scripts shuffle components_endocrine,
+so a given random.seed reproduces the legacy output."""
+    if results is None:
+        results = PermutationResults(engine.p_contact_types_list)
+    order = list(range(len(engine.pool)))
+    for perm in range(n_permutations):
+        shuffle(order)
+        engine.add_permutation(results, engine.relabel(order))
+    return results
+
+
+#Added 2026-10 - permutation schemes (null models). A scheme's sample(engine, rng) returns
+#the permuted type code array for one permutation in a few vectorized operations.
+class UniformScheme:
+    """Shuffles the labels uniformly across the whole endocrine pool (the original
+permutation analysis)"""
+    def sample(self, engine, rng):
+        return engine.relabel(rng.permutation(len(engine.pool)))
+
+
+class StratifiedScheme:
+    """Shuffles the labels only within strata of the endocrine pool, so every stratum
+keeps its number of components of each type. strata holds one integer per pool
+member (in components_endocrine order)."""
+    def __init__(self, strata):
+        self.strata = np.asarray(strata, dtype=np.int64)
+        self.grouped = np.argsort(self.strata, kind='stable')
+
+    def sample(self, engine, rng):
+        #pool members grouped by stratum, in random order within each stratum, receive the
+        #labels of the pool members grouped by stratum in their original order
+        order = np.lexsort((rng.random(len(self.strata)), self.strata))
+        type_codes = engine.type_codes.copy()
+        type_codes[engine.pool[order]] = engine.type_codes[engine.pool[self.grouped]]
+        return type_codes
+
+
+class DistanceStratifiedScheme(StratifiedScheme):
+    """Shuffles the labels within distance_to_edge bins: n_bins quantile bins of the
+pool's distances, or the bins between the given edges"""
+    def __init__(self, engine, n_bins=4, edges=None):
+        distance = engine.distance_to_edge[engine.pool]
+        if edges is None:
+            edges = np.nanquantile(distance, np.linspace(0, 1, n_bins + 1)[1:-1])
+        self.edges = np.asarray(edges, dtype=np.float64)
+        StratifiedScheme.__init__(self, np.searchsorted(self.edges, distance, side='right'))
+
+
+class DegreePreservingScheme(StratifiedScheme):
+    """Only exchanges labels between components with the same number of contacts (those
+measured twice), or in the same degree bin if edges are given, so each type keeps
+its contact degree distribution"""
+    def __init__(self, engine, edges=None):
+        degree = np.bincount(engine.owner, minlength=len(engine.type_codes))[engine.pool]
+        if edges is not None:
+            degree = np.searchsorted(np.asarray(edges), degree, side='right')
+        StratifiedScheme.__init__(self, degree)
+
+
+class RegionScheme(StratifiedScheme):
+    """Keeps the type proportions of every region: labels are shuffled within regions,
+given as a dictionary of component identifier -> region (any hashable). The
+exports carry no cell positions, so regions must come from elsewhere (an
+annotation, or a partition such as network communities); pool components
+missing from regions form one more region together."""
+    def __init__(self, engine, regions):
+        region_codes = dict()
+        StratifiedScheme.__init__(self, [region_codes.setdefault(regions.get(engine.component_names[i]), len(region_codes))
+                                         for i in engine.pool.tolist()])
+
+
+SCHEMES = {'uniform': UniformScheme, 'distance': DistanceStratifiedScheme, 'degree': DegreePreservingScheme,
+           'region': RegionScheme}
+
+def get_scheme(name, engine, **options):
+    """Returns the permutation scheme registered as name ('uniform', 'distance', 'degree' or
+'region'), built for the engine with the given options"""
+    if name == 'uniform':
+        return UniformScheme(**options)
+    return SCHEMES[name](engine, **options)
+
+
+#Added 2026-10 - multiprocess runner with reproducible seeding
+PERMUTATIONS_PER_BLOCK = 25
+#Blocks submitted per worker ahead of the one being merged
+BLOCKS_IN_FLIGHT = 2
+
+_worker_engine = None
+_worker_scheme = None
+
+def _init_worker(engine, scheme):
+    """Process pool initializer: each worker receives the compiled engine and the scheme once"""
+    global _worker_engine, _worker_scheme
+    _worker_engine = engine
+    _worker_scheme = scheme
+
+def _run_block(engine, scheme, seed, block, n_permutations, results):
+    """Runs one block of permutations. The block's generator is seeded from the
+master seed and the block number only (SeedSequence spawn key), so a block
+produces the same permutations no matter which worker runs it."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+    for perm in range(n_permutations):
+        engine.add_permutation(results, scheme.sample(engine, rng))
+    return results
+
+def _run_worker_block(seed, block, n_permutations, results):
+    return _run_block(_worker_engine, _worker_scheme, seed, block, n_permutations, results)
+
+@Profiling.profiled('run_permutations_parallel')
+def run_permutations_parallel(engine, n_permutations, seed, n_workers=None, block_size=PERMUTATIONS_PER_BLOCK, results=None, scheme=None,
+                              stop=None):
+    """Splits n_permutations into fixed-size blocks and runs them across a pool of
+n_workers processes (all cores by default; n_workers=1 runs in this process).
+The per-block partial results are merged in block order, so the returned
+results depend only on seed and n_permutations, not on the worker count. As in
+run_permutations, results may be any accumulator with new_partial/add/merge.
+scheme is the permutation scheme (UniformScheme by default). Scripts calling this must guard their body with if __name__ == '__main__'.
+Edited 2026-10: stop, if given, is called with the results after every merged block;
+when it returns True the remaining blocks are cancelled (early stopping). The blocks
+are still merged in order, so where a run stops also depends only on the seed.
+Edited 2026-10: at most BLOCKS_IN_FLIGHT blocks per worker are submitted ahead of the
+merge, so a run that stops early leaves little work behind (n_permutations is then
+only the budget; see Statistics.SequentialStopping)."""
+    blocks = []
+    for block, start in enumerate(range(0, n_permutations, block_size)):
+        blocks.append((block, min(block_size, n_permutations - start)))
+
+    if scheme is None:
+        scheme = UniformScheme()
+    if results is None:
+        results = PermutationResults(engine.p_contact_types_list)
+    if n_workers == 1:
+        for block, n in blocks:
+            results.merge(_run_block(engine, scheme, seed, block, n, results.new_partial()))
+            Profiling.count('permutations completed', n)
+            if stop is not None and stop(results):
+                break
+        return results
+
+    in_flight = BLOCKS_IN_FLIGHT*(os.cpu_count() if n_workers is None else n_workers)
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(engine, scheme)) as executor:
+        pending = deque()
+        next_block = 0
+        while next_block < len(blocks) or len(pending) > 0:
+            #keep the pool busy with the blocks after the one merged next
+            while next_block < len(blocks) and len(pending) < in_flight:
+                (block, n) = blocks[next_block]
+                pending.append((n, executor.submit(_run_worker_block, seed, block, n, results.new_partial())))
+                next_block = next_block + 1
+            (n, future) = pending.popleft()
+            results.merge(future.result())
+            Profiling.count('permutations completed', n)
+            if stop is not None and stop(results):
+                executor.shutdown(wait=True, cancel_futures=True)
+                break
+    return results
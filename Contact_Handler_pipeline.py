@@ -0,0 +1,167 @@
+#Contact Handler pipeline steps shared by the scripts
+#Added 2026-10
+
+"""This module holds the steps the Contact Handler scripts have in common, so
+that a new analysis does not need a new copy of the ingest code. load_tissue
+reads a folder of Contact Calculator exports (through the TissueCache),
+classifies the components and builds the Tissue; load_component_table stops
+short of the Tissue and returns a Contact_Handler_lazy.ComponentTable instead.
+summarize_tissue counts the cells and contacts by type of a Tissue or ArrayTissue,
+for the batch driver and the threshold sweep.
+run_permutation_analysis is
+the whole permutation analysis of Permutation_Main.py and
+Permutation_Main_KeepHighBeta.py: the folder is ingested and compiled into a
+PermutationEngine once, and then every requested permutation scheme (null
+model) is run on the same engine and exported. With lazy_loading the engine is
+compiled from the ComponentTable, so no Component or Contact object is built.
+Edited 2026-10: with a stopping rule the permutations of each scheme are run
+sequentially in blocks until every statistic has settled
+(Statistics.SequentialStopping) or n_permutations is used up."""
+
+import os
+
+import Contact_Handler_IO as IO
+import Contact_Handler_definitions as Definitions
+import Contact_Handler_component_type as Component_Type
+import Contact_Handler_cache as Cache
+import Contact_Handler_lazy as Lazy
+import Contact_Handler_contact_table as Contact_Table
+import Contact_Handler_permutation as Permutation
+import Contact_Handler_statistics as Statistics
+import Contact_Handler_output as Output
+import Contact_Handler_profiling as Profiling
+
+
+def load_tissue(path='.', cache_path=None, channels_filename=None, io_workers=16, prefetch=IO.PREFETCH_DEPTH):
+    """Reads the exports in path and returns (tissue, component_types_dict). The parsed data
+cache is kept in cache_path (path by default); if channels_filename is given, the
+channel intensities are also written there with component_type_histograms. Component
+files missing from the cache are read by io_workers threads, up to prefetch files ahead
+of the contact building."""
+    cache = Cache.TissueCache(path if cache_path is None else cache_path)
+    (file_list, component_types_dict) = _component_types(path, cache, channels_filename)
+
+    tissue = Definitions.Tissue(dict(), dict(), [])
+    for component_name, component_type in component_types_dict.items():
+        tissue.new_component(Definitions.Component(component_name, component_type))
+    with Profiling.stage('build contacts') as stage:
+        Contact_Table.build_tissue_contacts(tissue, cache.iter_component_info(file_list[:-1], io_workers, prefetch))
+        stage.count('contacts built', len(tissue.contacts_dict))
+    cache.save()
+    return (tissue, component_types_dict)
+
+
+def load_component_table(path='.', cache_path=None, channels_filename=None, io_workers=16, fields=Lazy.PERMUTATION_FIELDS):
+    """Reads the exports in path like load_tissue, but returns (table, component_types_dict)
+with table a Lazy.ComponentTable holding the features in fields"""
+    cache = Cache.TissueCache(path if cache_path is None else cache_path)
+    (file_list, component_types_dict) = _component_types(path, cache, channels_filename)
+    arrays = cache.component_table(file_list[:-1], io_workers)
+    with Profiling.stage('build component table'):
+        table = Lazy.ComponentTable(component_types_dict, arrays, fields)
+    cache.save()
+    return (table, component_types_dict)
+
+
+def summarize_tissue(tissue):
+    """Runs find_cells and compile_cells_and_contacts on a Tissue or an ArrayTissue and returns
+(cells, contacts): the number of cells of each component type, and for each contact
+type the tuple (number of contacts, mean size in voxels, mean size in um^2)"""
+    tissue.find_cells()
+    tissue.compile_cells_and_contacts()
+    cells = {component_type: len(rows) for component_type, rows in tissue.cell_metrics_dict.items()}
+    contacts = dict()
+    for contact_type, sizes in tissue.contact_sizes_dict.items():
+        mean_size = sum(sizes)/len(sizes)
+        contacts[contact_type] = (len(sizes), mean_size, mean_size*tissue.voxel_size)
+    return (cells, contacts)
+
+
+def _component_types(path, cache, channels_filename):
+    """Returns the sorted file list of path and the component_types_dict classified from its
+channel intensity file"""
+    file_list = [os.path.join(path, item) for item in sorted(IO.get_file_list(path))]
+    #The channel intensity file sorts last ("zzzChannel"), the component files before it
+    component_channels_dict = cache.component_channels(file_list[-1])
+    if channels_filename is not None:
+        Component_Type.component_type_histograms(component_channels_dict, channels_filename)
+    return (file_list, Component_Type.component_type_calculator(component_channels_dict))
+
+
+def run_permutation_analysis(path='.', endocrine_types=('beta',), schemes=('uniform',), n_permutations=1000, seed=0,
+                             streaming_statistics=False, network_statistics=False, output_backend='excel',
+                             output_dir=None, n_workers=None, scheme_options=None, lazy_loading=False,
+                             significance_report=False, p_adjustment='holm', stop_tolerance=None, stopping_rule=None,
+                             stopping_exceedances=10, cache_path=None):
+    """Runs the permutation analysis on the exports in path. The components of endocrine_types
+form the shuffled pool (their labels are handed back out in that order). Each scheme in
+schemes (see Permutation.SCHEMES; scheme_options maps a scheme name to its keyword
+arguments) is run with the same seed and written to output_dir (path by default): the
+'uniform' scheme to the original Results_permute files, any other scheme to files
+named with the scheme, e.g. Results_permute_distance.xlsx. lazy_loading compiles the
+engine from load_component_table instead of load_tissue. significance_report also writes
+the observed-vs-null report of every scheme (Statistics.PermutationSignificance, with the
+p-values adjusted across the contact types by p_adjustment, 'holm' or 'bh') to
+Results_permute_significance.xlsx. With stop_tolerance, a scheme stops before
+n_permutations once every p-value's confidence interval is that narrow or clear of
+0.05 (PermutationSignificance.converged). stopping_rule ('besag_clifford' or
+'interval', see Statistics.SequentialStopping) makes n_permutations a budget: each
+statistic settles on its own (after stopping_exceedances exceedances for
+Besag-Clifford, within stop_tolerance for 'interval') and a scheme stops once all have.
+The permutations each statistic needed are in the significance report. The parsed data
+cache is kept in cache_path (path by default). Returns a dictionary of scheme name ->
+results accumulator; results.significance.n_permutations is the number of
+permutations run."""
+    output_dir = path if output_dir is None else output_dir
+    scheme_options = dict() if scheme_options is None else scheme_options
+    if lazy_loading:
+        (source, component_types_dict) = load_component_table(path, cache_path)
+    else:
+        (source, component_types_dict) = load_tissue(path, cache_path)
+    components_endocrine = [name for name, component_type in component_types_dict.items() if component_type in endocrine_types]
+    with Profiling.stage('compile permutation engine'):
+        if lazy_loading:
+            engine = Permutation.PermutationEngine.from_component_table(source, components_endocrine, endocrine_types,
+                                                                        network_statistics)
+        else:
+            engine = Permutation.PermutationEngine(source, components_endocrine, endocrine_types, network_statistics)
+
+    #the observed tissue is compiled once, with the same definitions as every permutation
+    with Profiling.stage('observed statistics'):
+        observed = Statistics.permutation_summary(*engine.compile_permutation(engine.type_codes))
+        network_observed = engine.compile_network(engine.type_codes) if network_statistics else None
+
+    all_results = dict()
+    for scheme_name in schemes:
+        scheme = Permutation.get_scheme(scheme_name, engine, **scheme_options.get(scheme_name, dict()))
+        suffix = '' if scheme_name == 'uniform' else '_' + scheme_name
+        significance = None
+        stop = None
+        if stopping_rule is None and stop_tolerance is not None:
+            stop = Statistics.SequentialStopping('interval', tolerance=stop_tolerance)
+        elif stopping_rule is not None:
+            stop = Statistics.SequentialStopping(stopping_rule, stopping_exceedances,
+                                                 0.01 if stop_tolerance is None else stop_tolerance)
+        if significance_report or stop is not None:
+            significance = Statistics.PermutationSignificance(engine.p_contact_types_list, observed, engine.network_names,
+                                                              network_observed)
+        if streaming_statistics:
+            results = Statistics.StreamingPermutationStatistics(engine.p_contact_types_list, observed, network_names=engine.network_names,
+                                                                network_observed=network_observed, significance=significance)
+            Permutation.run_permutations_parallel(engine, n_permutations, seed, n_workers, results=results, scheme=scheme, stop=stop)
+            IO.export_permutation_summary(*results.summary_table(),
+                                          filename=os.path.join(output_dir, 'Results_permute_summary' + suffix + '.xlsx'))
+        else:
+            results = Permutation.PermutationResults(engine.p_contact_types_list, significance)
+            Permutation.run_permutations_parallel(engine, n_permutations, seed, n_workers, results=results, scheme=scheme, stop=stop)
+            IO.export_permutation_beta(engine.p_contact_types_list, results.beta_contacts_size_p, results.beta_contacts_counts_p,
+                                       results.beta_contacts_proportion_p, 'Results_permute' + suffix + '.xlsx',
+                                       backend=Output.get_backend(output_backend, output_dir))
+            if network_statistics:
+                IO.export_permutation_network(engine.network_names, results.network_p, network_observed,
+                                              os.path.join(output_dir, 'Results_permute_network' + suffix + '.xlsx'))
+        if significance_report:
+            IO.export_permutation_significance(*significance.table(p_adjustment),
+                                               filename=os.path.join(output_dir, 'Results_permute_significance' + suffix + '.xlsx'))
+        all_results[scheme_name] = results
+    return all_results
@@ -0,0 +1,242 @@
+#Contact Handler stage profiling
+#Added 2026-10
+
+"""This module records where the time goes in a Contact Handler run. The main
+pipeline steps (file listing, channel and component parsing, classification,
+find_cells, compile_cells_and_contacts, the permutation runner and the Excel
+writers) are marked as stages with the profiled decorator or the stage context
+manager. While profiling is enabled each stage records its wall time, CPU
+time, memory use and item counts (files parsed, contacts built,
+permutations completed); write_report dumps them, with per-stage totals, as
+a JSON report. One chosen stage can also be captured with cProfile. Profiling
+is off unless enable() is called, and then a stage costs only a check of the
+module's active profiler. Only the calling process is profiled: work done in
+process pool workers counts towards the stage that waits for it."""
+
+import cProfile
+import functools
+import json
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError: #not on Windows
+    resource = None
+
+_active = None
+
+
+def max_rss():
+    """The peak resident set size of this process so far, in bytes (None where unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak*1024
+
+
+class _NoStage:
+    """The stage returned while profiling is off: does nothing"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        return False
+
+    def count(self, name, n=1):
+        pass
+
+_NO_STAGE = _NoStage()
+
+
+class Stage:
+    """One timed pass through a stage; use as a context manager, count() adds to its
+item counts"""
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.counts = dict()
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.profiler._exit(self)
+        return False
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+
+class StageProfiler:
+    """Collects the stage records of one run. Every stage records the process's peak
+resident set size at its end (max_rss_bytes, a high-water mark for the whole run so
+far); with trace_memory, tracemalloc also gives the peak memory allocated through
+Python during each stage (peak_memory_bytes). Tracing slows allocation-heavy stages
+such as the Excel writers down several times, so compare wall times with it off.
+profile_stage names a stage to capture with cProfile the first time it runs."""
+    def __init__(self, trace_memory=False, profile_stage=None, profile_top=25):
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profile_top = profile_top
+        self.records = []
+        self.counts = dict()
+        self.stack = []
+        self.cprofile = None
+        self.cprofile_stats = None
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def count(self, name, n=1):
+        """Adds to the item counts of the innermost running stage (or of the run)"""
+        if len(self.stack) > 0:
+            self.stack[-1].count(name, n)
+        else:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def _enter(self, stage):
+        #a stage entered again from inside itself (e.g. a writer delegating to itself) is timed once
+        stage.reentered = any(running.name == stage.name for running in self.stack)
+        if stage.reentered:
+            return
+        stage.parent = self.stack[-1].name if len(self.stack) > 0 else None
+        if self.trace_memory:
+            (current, peak) = tracemalloc.get_traced_memory()
+            #the enclosing stage keeps its peak so far, since the peak is reset for this one
+            if len(self.stack) > 0:
+                self.stack[-1].peak = max(self.stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            stage.peak = current
+        if stage.name == self.profile_stage and self.cprofile is None:
+            self.cprofile = cProfile.Profile()
+            stage.cprofile = self.cprofile
+            self.cprofile.enable()
+        else:
+            stage.cprofile = None
+        self.stack.append(stage)
+        stage.start_wall = time.perf_counter()
+        stage.start_cpu = time.process_time()
+
+    def _exit(self, stage):
+        if stage.reentered:
+            return
+        wall = time.perf_counter() - stage.start_wall
+        cpu = time.process_time() - stage.start_cpu
+        self.stack.pop()
+        if stage.cprofile is not None:
+            stage.cprofile.disable()
+            self.cprofile_stats = pstats.Stats(stage.cprofile)
+        peak = None
+        if self.trace_memory:
+            peak = max(stage.peak, tracemalloc.get_traced_memory()[1])
+            if len(self.stack) > 0:
+                self.stack[-1].peak = max(self.stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+        self.records.append({'stage': stage.name, 'parent': stage.parent, 'wall_s': wall, 'cpu_s': cpu,
+                             'peak_memory_bytes': peak, 'max_rss_bytes': max_rss(), 'counts': stage.counts})
+
+    def totals(self):
+        """Per stage name: number of calls, summed wall and CPU time, largest memory peaks
+and summed item counts"""
+        totals = dict()
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_memory_bytes': None,
+                                                        'max_rss_bytes': None, 'counts': dict()})
+            total['calls'] = total['calls'] + 1
+            total['wall_s'] = total['wall_s'] + record['wall_s']
+            total['cpu_s'] = total['cpu_s'] + record['cpu_s']
+            if record['peak_memory_bytes'] is not None:
+                total['peak_memory_bytes'] = max(total['peak_memory_bytes'] or 0, record['peak_memory_bytes'])
+            if record['max_rss_bytes'] is not None:
+                total['max_rss_bytes'] = max(total['max_rss_bytes'] or 0, record['max_rss_bytes'])
+            for name, n in record['counts'].items():
+                total['counts'][name] = total['counts'].get(name, 0) + n
+        return totals
+
+    def report(self):
+        """Returns the run report as a JSON-serializable dictionary"""
+        report = {'started': self.started,
+                  'command': sys.argv,
+                  'python': sys.version.split()[0],
+                  'platform': platform.platform(),
+                  'trace_memory': self.trace_memory,
+                  'max_rss_bytes': max_rss(),
+                  'wall_s': time.perf_counter() - self.start_wall,
+                  'cpu_s': time.process_time() - self.start_cpu,
+                  'counts': self.counts,
+                  'stages': self.records,
+                  'totals': self.totals()}
+        if self.cprofile_stats is not None:
+            functions = []
+            stats = self.cprofile_stats.stats
+            for key in sorted(stats, key=lambda key: stats[key][3], reverse=True)[:self.profile_top]:
+                (primitive_calls, calls, total_time, cumulative_time, callers) = stats[key]
+                functions.append({'function': '%s:%d(%s)' % key, 'calls': calls, 'tottime_s': total_time,
+                                  'cumtime_s': cumulative_time})
+            report['cprofile'] = {'stage': self.profile_stage, 'functions': functions}
+        return report
+
+
+def enable(trace_memory=False, profile_stage=None, profile_top=25):
+    """Starts profiling this process and returns the new StageProfiler"""
+    global _active
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _active = StageProfiler(trace_memory, profile_stage, profile_top)
+    return _active
+
+def disable():
+    """Stops profiling and returns the StageProfiler that was active (or None)"""
+    global _active
+    profiler = _active
+    _active = None
+    if profiler is not None and profiler.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return profiler
+
+def is_enabled():
+    return _active is not None
+
+def stage(name):
+    """Context manager timing a stage (a no-op while profiling is off)"""
+    if _active is None:
+        return _NO_STAGE
+    return _active.stage(name)
+
+def count(name, n=1):
+    """Adds n items to the count name of the innermost running stage"""
+    if _active is not None:
+        _active.count(name, n)
+
+def profiled(name):
+    """Decorator marking every call of a function as a pass through the stage name"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return function(*args, **kwargs)
+            with _active.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def write_report(filename='Profile.json', cprofile_filename=None):
+    """Writes the active profiler's report as JSON (and the raw cProfile statistics of the
+captured stage to cprofile_filename, for pstats or snakeviz). Returns the report."""
+    if _active is None:
+        return None
+    report = _active.report()
+    if cprofile_filename is not None and _active.cprofile_stats is not None:
+        _active.cprofile_stats.dump_stats(cprofile_filename)
+        report['cprofile']['filename'] = cprofile_filename
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=1)
+    return report
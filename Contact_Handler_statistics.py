@@ -0,0 +1,636 @@
+#Contact Handler streaming permutation statistics
+#Added 2026-10 for permutation runs too long to keep every permuted value
+
+"""This module provides constant-memory accumulators for the permutation
+analysis. StreamingPermutationStatistics has the same add/merge interface as
+Contact_Handler_permutation.PermutationResults, but instead of keeping every
+permuted contact size, count and proportion it keeps running moments, fixed-bin
+histograms and quantile sketches for each contact type, plus the per-permutation
+summaries (mean count, mean proportion and mean size per beta cell) and their
+empirical p-values against the observed tissue. The network statistics of the
+beta-beta subgraph (Contact_Handler_network.InducedNetwork) are streamed the same
+way when the permutation engine computes them.
+Edited 2026-10: PermutationSignificance compares the observed summary with the
+permutation distribution as it streams in: z-scores, empirical two-sided p-values
+with their confidence intervals, the p-values adjusted for testing the five
+contact types (Holm or Benjamini-Hochberg) and a convergence test for stopping a
+run early once every p-value is known well enough.
+Edited 2026-10: SequentialStopping is the stopping rule of the sequential
+permutation scheduler: checked after every block, it settles each statistic on
+its own (Besag-Clifford: once its smaller tail has a set number of exceedances,
+or once its p-value's confidence bounds are narrow enough or clear of alpha)
+and stops the run once every statistic has settled. PermutationSignificance
+records how many permutations each statistic needed. The bounds are exact and
+spend the error over the checks, so they hold across the whole run."""
+
+import statistics
+
+import numpy as np
+
+
+class RunningMoments:
+    """Running count, mean, variance, min and max (Welford's algorithm, updated a
+batch at a time with Chan's pairwise formula so that partials can be merged)."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        batch = RunningMoments()
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean)**2).sum())
+        batch.minimum = float(values.min())
+        batch.maximum = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta*other.count/count
+        self.m2 = self.m2 + other.m2 + delta*delta*self.count*other.count/count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def variance(self):
+        """Sample variance (nan for fewer than two values)"""
+        if self.count < 2:
+            return np.nan
+        return self.m2/(self.count - 1)
+
+    def std(self):
+        return np.sqrt(self.variance())
+
+
+class FixedHistogram:
+    """Histogram with n_bins equal bins over [low, high). Values outside the range
+are counted in underflow and overflow rather than dropped."""
+    def __init__(self, low, high, n_bins):
+        self.edges = np.linspace(low, high, n_bins + 1)
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        bins = np.searchsorted(self.edges, values, side='right') - 1
+        self.underflow = self.underflow + int((bins < 0).sum())
+        self.overflow = self.overflow + int((bins >= len(self.counts)).sum())
+        inside = bins[(bins >= 0) & (bins < len(self.counts))]
+        self.counts = self.counts + np.bincount(inside, minlength=len(self.counts))
+
+    def merge(self, other):
+        self.counts = self.counts + other.counts
+        self.underflow = self.underflow + other.underflow
+        self.overflow = self.overflow + other.overflow
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch (a deterministic KLL-style compactor). Items at
+level i stand for 2**i values; when a level holds more than k items it is sorted
+and every other item is promoted to the next level, alternating the offset
+between compactions. Memory is O(k log(n/k)) and the rank error is roughly 1/k."""
+    def __init__(self, k=256):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.compactions = 0
+
+    def add(self, values):
+        self.levels[0] = np.concatenate([self.levels[0], np.asarray(values, dtype=np.float64)])
+        self._compress()
+
+    def merge(self, other):
+        for level in range(len(other.levels)):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], other.levels[level]])
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self.k:
+                items = np.sort(self.levels[level])
+                leftover = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[self.compactions % 2::2]])
+                self.levels[level] = leftover
+                self.compactions = self.compactions + 1
+            level = level + 1
+
+    def quantile(self, q):
+        """Returns the approximate q-quantile (0 <= q <= 1), or nan if the sketch is empty"""
+        values = np.concatenate(self.levels)
+        if len(values) == 0:
+            return np.nan
+        weights = np.concatenate([np.full(len(items), 2.0**level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q*cumulative[-1], side='left')
+        return float(values[order][min(position, len(values) - 1)])
+
+
+class StreamingStatistic:
+    """Running moments, a fixed-bin histogram and a quantile sketch for one stream of values"""
+    def __init__(self, low, high, n_bins, sketch_k):
+        self.moments = RunningMoments()
+        self.histogram = FixedHistogram(low, high, n_bins)
+        self.sketch = QuantileSketch(sketch_k)
+
+    def add(self, values):
+        self.moments.add(values)
+        self.histogram.add(values)
+        self.sketch.add(values)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.histogram.merge(other.histogram)
+        self.sketch.merge(other.sketch)
+
+
+#The three per-permutation summary statistics, per contact type
+SUMMARY_NAMES = ['Mean Count', 'Mean Proportion', 'Mean Size (um^2)']
+
+#Default histogram ranges: (low, high, n_bins)
+SIZE_BINS = (0.0, 50.0, 200)
+COUNT_BINS = (0.0, 50.0, 50)
+PROPORTION_BINS = (0.0, 1.0, 200)
+
+def permutation_summary(sizes, counts, proportions):
+    """Reduces the output of one PermutationEngine.compile_permutation call to the
+per-permutation summary: an array (types x SUMMARY_NAMES) holding the mean contact
+count and mean contact proportion per beta cell, and the mean contact size"""
+    summary = np.full((counts.shape[1], len(SUMMARY_NAMES)), np.nan)
+    if counts.shape[0] > 0:
+        summary[:, 0] = counts.mean(axis=0)
+        summary[:, 1] = proportions.mean(axis=0)
+    for j in range(counts.shape[1]):
+        if len(sizes[j]) > 0:
+            summary[j, 2] = sizes[j].mean()
+    return summary
+
+
+def two_sided_p_values(n_greater_equal, n_less_equal, n_permutations):
+    """Empirical two-sided p-values from the exceedance counts of each tail, using the
+(1 + exceedances)/(1 + permutations) estimate"""
+    upper = (1 + n_greater_equal)/(1 + n_permutations)
+    lower = (1 + n_less_equal)/(1 + n_permutations)
+    return np.minimum(1.0, 2*np.minimum(upper, lower))
+
+
+class NullComparison:
+    """Streams the permuted values of an array of statistics (of the given shape): running
+moments of each and, if observed is given, the number of permutations at least as
+large / as small as the observed value. A permutation in which a statistic has no value
+(nan, e.g. no contacts of the type) is left out of that statistic's counts, so its
+p-value is over the n_valid permutations that gave a value. A statistic without an
+observed value has a nan p-value."""
+    def __init__(self, shape, observed=None):
+        self.shape = tuple(shape)
+        self.observed = None if observed is None else np.asarray(observed, dtype=np.float64)
+        self.moments = [RunningMoments() for i in range(int(np.prod(self.shape)))]
+        self.n_valid = np.zeros(self.shape, dtype=np.int64)
+        self.n_greater_equal = np.zeros(self.shape, dtype=np.int64)
+        self.n_less_equal = np.zeros(self.shape, dtype=np.int64)
+
+    def new_partial(self):
+        return NullComparison(self.shape, self.observed)
+
+    def add(self, values):
+        """Streams in the values of one permutation"""
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        for i in np.flatnonzero(valid).tolist():
+            self.moments[i].add([values.flat[i]])
+        self.n_valid = self.n_valid + valid
+        if self.observed is not None:
+            #nan compares as neither, so a permutation without a value counts against neither tail
+            self.n_greater_equal = self.n_greater_equal + (values >= self.observed)
+            self.n_less_equal = self.n_less_equal + (values <= self.observed)
+
+    def merge(self, other):
+        for moments, other_moments in zip(self.moments, other.moments):
+            moments.merge(other_moments)
+        self.n_valid = self.n_valid + other.n_valid
+        self.n_greater_equal = self.n_greater_equal + other.n_greater_equal
+        self.n_less_equal = self.n_less_equal + other.n_less_equal
+
+    def moments_at(self, index):
+        """The RunningMoments of the statistic at index (a tuple, or an int for a 1-d shape)"""
+        return self.moments[np.ravel_multi_index(np.atleast_1d(index), self.shape)]
+
+    def p_values(self):
+        """Empirical two-sided p-values, using the (1 + exceedances)/(1 + valid permutations)
+estimate for each tail"""
+        p_values = two_sided_p_values(self.n_greater_equal, self.n_less_equal, self.n_valid)
+        return np.where(np.isnan(self.observed), np.nan, p_values)
+
+
+class StreamingPermutationStatistics:
+    """Constant-memory replacement for PermutationResults. For every contact type in
+p_contact_types_list it streams the permuted contact sizes, counts and proportions
+into StreamingStatistic accumulators, and it streams the per-permutation summary
+(see permutation_summary) into RunningMoments and QuantileSketches. If observed
+(the permutation_summary of the observed tissue) is given, the number of
+permutations at least as large / as small as the observed value is counted on
+the fly for the empirical p-values. network_names (NETWORK_STATISTIC_NAMES) and
+network_observed do the same for the per-permutation network statistics.
+significance (a PermutationSignificance) is also fed every permutation."""
+    def __init__(self, p_contact_types_list, observed=None, size_bins=SIZE_BINS, count_bins=COUNT_BINS,
+                 proportion_bins=PROPORTION_BINS, sketch_k=256, network_names=None, network_observed=None, significance=None):
+        self.p_contact_types_list = list(p_contact_types_list)
+        self.observed = None if observed is None else np.asarray(observed, dtype=np.float64)
+        self.network_names = None if network_names is None else list(network_names)
+        self.network_observed = None if network_observed is None else np.asarray(network_observed, dtype=np.float64)
+        self.size_bins = size_bins
+        self.count_bins = count_bins
+        self.proportion_bins = proportion_bins
+        self.sketch_k = sketch_k
+
+        self.n_permutations = 0
+        self.sizes = [StreamingStatistic(*size_bins, sketch_k) for p_type in self.p_contact_types_list]
+        self.counts = [StreamingStatistic(*count_bins, sketch_k) for p_type in self.p_contact_types_list]
+        self.proportions = [StreamingStatistic(*proportion_bins, sketch_k) for p_type in self.p_contact_types_list]
+        #Edited 2026-10: the summary and network moments and exceedance counts are NullComparisons
+        self.summary = NullComparison((len(self.p_contact_types_list), len(SUMMARY_NAMES)), self.observed)
+        self.summary_sketches = [[QuantileSketch(sketch_k) for name in SUMMARY_NAMES] for p_type in self.p_contact_types_list]
+
+        n_network = 0 if self.network_names is None else len(self.network_names)
+        self.network = NullComparison((n_network,), self.network_observed)
+        self.network_sketches = [QuantileSketch(sketch_k) for name in range(n_network)]
+        self.significance = significance
+
+    def new_partial(self):
+        """Returns an empty accumulator with the same settings, for a block of permutations"""
+        return StreamingPermutationStatistics(self.p_contact_types_list, self.observed, self.size_bins,
+                                              self.count_bins, self.proportion_bins, self.sketch_k,
+                                              self.network_names, self.network_observed,
+                                              None if self.significance is None else self.significance.new_partial())
+
+    def add(self, sizes, counts, proportions):
+        """Streams in the results of one permutation"""
+        self.n_permutations = self.n_permutations + 1
+        summary = permutation_summary(sizes, counts, proportions)
+        for j in range(len(self.p_contact_types_list)):
+            self.sizes[j].add(sizes[j])
+            self.counts[j].add(counts[:, j])
+            self.proportions[j].add(proportions[:, j])
+            for s in range(len(SUMMARY_NAMES)):
+                if not np.isnan(summary[j, s]):
+                    self.summary_sketches[j][s].add([summary[j, s]])
+        self.summary.add(summary)
+        if self.significance is not None:
+            self.significance.add(sizes, counts, proportions)
+
+    def add_network(self, values):
+        """Streams in the network statistics of one permutation"""
+        for s in range(len(self.network_sketches)):
+            if not np.isnan(values[s]):
+                self.network_sketches[s].add([values[s]])
+        self.network.add(values)
+        if self.significance is not None:
+            self.significance.add_network(values)
+
+    def merge(self, other):
+        """Merges in a partial accumulator from another block of permutations"""
+        self.n_permutations = self.n_permutations + other.n_permutations
+        for j in range(len(self.p_contact_types_list)):
+            self.sizes[j].merge(other.sizes[j])
+            self.counts[j].merge(other.counts[j])
+            self.proportions[j].merge(other.proportions[j])
+            for s in range(len(SUMMARY_NAMES)):
+                self.summary_sketches[j][s].merge(other.summary_sketches[j][s])
+        self.summary.merge(other.summary)
+        for s in range(len(self.network_sketches)):
+            self.network_sketches[s].merge(other.network_sketches[s])
+        self.network.merge(other.network)
+        if self.significance is not None:
+            self.significance.merge(other.significance)
+
+    def p_values(self):
+        """Empirical two-sided p-values (types x SUMMARY_NAMES) of the observed summary
+(NullComparison.p_values)"""
+        return self.summary.p_values()
+
+    def network_p_values(self):
+        """Empirical two-sided p-values of the observed network statistics (see p_values)"""
+        return self.network.p_values()
+
+    def summary_table(self):
+        """Returns (header, rows) describing every statistic, one row per contact type and
+quantity, for IO.export_permutation_summary"""
+        header = ['Contact Type', 'Statistic', 'N', 'Mean', 'StDev', 'Min', '5%', '50%', '95%', 'Max',
+                  'Observed', 'p (two-sided)']
+        rows = []
+        p_values = None if self.observed is None else self.p_values()
+        for j in range(len(self.p_contact_types_list)):
+            streams = [('Size (um^2)', self.sizes[j].moments, self.sizes[j].sketch, None, None),
+                       ('Count', self.counts[j].moments, self.counts[j].sketch, None, None),
+                       ('Proportion', self.proportions[j].moments, self.proportions[j].sketch, None, None)]
+            for s in range(len(SUMMARY_NAMES)):
+                observed = None if self.observed is None else self.observed[j, s]
+                p_value = None if p_values is None or np.isnan(p_values[j, s]) else p_values[j, s]
+                streams.append((SUMMARY_NAMES[s], self.summary.moments_at((j, s)), self.summary_sketches[j][s], observed, p_value))
+            for name, moments, sketch, observed, p_value in streams:
+                rows.append([str(self.p_contact_types_list[j]), name, moments.count, moments.mean, moments.std(),
+                             moments.minimum, sketch.quantile(0.05), sketch.quantile(0.5), sketch.quantile(0.95),
+                             moments.maximum, observed, p_value])
+        network_p_values = None if self.network_observed is None else self.network_p_values()
+        for s in range(len(self.network_sketches)):
+            moments = self.network.moments_at(s)
+            sketch = self.network_sketches[s]
+            rows.append(['Beta-Beta Network', self.network_names[s], moments.count, moments.mean, moments.std(),
+                         moments.minimum, sketch.quantile(0.05), sketch.quantile(0.5), sketch.quantile(0.95),
+                         moments.maximum, None if self.network_observed is None else self.network_observed[s],
+                         None if network_p_values is None or np.isnan(network_p_values[s]) else network_p_values[s]])
+        return (header, rows)
+
+
+#Added 2026-10: observed-vs-null significance
+def holm_adjust(p_values):
+    """Holm step-down adjusted p-values of each column of p_values (one family of tests per
+column, e.g. the contact types); nan p-values are not counted as tests"""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    adjusted = np.full(p_values.shape, np.nan)
+    for column, family in _families(p_values):
+        tested = np.flatnonzero(~np.isnan(family))
+        order = tested[np.argsort(family[tested], kind='stable')]
+        steps = np.maximum.accumulate(family[order]*(len(order) - np.arange(len(order))))
+        adjusted.reshape(len(p_values), -1)[order, column] = np.minimum(1.0, steps)
+    return adjusted
+
+
+def benjamini_hochberg_adjust(p_values):
+    """Benjamini-Hochberg (false discovery rate) adjusted p-values of each column of p_values,
+as in holm_adjust"""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    adjusted = np.full(p_values.shape, np.nan)
+    for column, family in _families(p_values):
+        tested = np.flatnonzero(~np.isnan(family))
+        order = tested[np.argsort(family[tested], kind='stable')]
+        steps = family[order]*len(order)/np.arange(1, len(order) + 1)
+        adjusted.reshape(len(p_values), -1)[order, column] = np.minimum(1.0, np.minimum.accumulate(steps[::-1])[::-1])
+    return adjusted
+
+
+def _families(p_values):
+    """Yields (column, p-values of the column) for a 1-d (one family) or 2-d array"""
+    columns = p_values.reshape(len(p_values), -1)
+    for column in range(columns.shape[1]):
+        yield (column, columns[:, column])
+
+
+P_ADJUSTMENTS = {'holm': holm_adjust, 'bh': benjamini_hochberg_adjust}
+
+
+def _z_scores(observed, mean, std):
+    """(observed - mean)/std, nan where the null distribution is constant: a standard
+deviation within rounding of zero (as the running moments leave it) gives no z-score"""
+    constant = ~(std > 1e-9*np.abs(mean))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(constant, np.nan, (observed - mean)/np.where(constant, 1.0, std))
+
+
+def p_value_intervals(n_greater_equal, n_less_equal, n_permutations, confidence=0.95):
+    """Returns (low, high): Wilson score intervals for the two-sided p-values of
+two_sided_p_values, i.e. for the (1 + exceedances)/(1 + permutations) estimate of the
+smaller tail as 1 + exceedances successes in 1 + permutations trials (doubled and capped
+at 1, like the p-value). n_permutations may be an array, e.g. NullComparison.n_valid."""
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence/2)
+    exceedances = 1 + np.minimum(n_greater_equal, n_less_equal).astype(np.float64)
+    n = 1 + np.asarray(n_permutations, dtype=np.float64)
+    fraction = exceedances/n
+    center = (fraction + z*z/(2*n))/(1 + z*z/n)
+    half_width = z*np.sqrt(fraction*(1 - fraction)/n + z*z/(4*n*n))/(1 + z*z/n)
+    return (np.minimum(1.0, 2*np.maximum(center - half_width, 0.0)), np.minimum(1.0, 2*(center + half_width)))
+
+
+def p_value_bounds(n_greater_equal, n_less_equal, n_permutations, confidence=0.99):
+    """Returns (low, high): exact (Clopper-Pearson) confidence bounds for the true two-sided
+p-value, from the exceedance count of the smaller tail (doubled and capped at 1). Unlike
+the Wilson intervals of p_value_intervals they have at least the given coverage for any
+number of permutations, which SequentialStopping relies on."""
+    from scipy.stats import beta
+
+    exceedances = np.minimum(n_greater_equal, n_less_equal).astype(np.float64)
+    n = np.asarray(n_permutations, dtype=np.float64)*np.ones(exceedances.shape)
+    tail = (1 - confidence)/2
+    low = np.where(exceedances > 0, beta.ppf(tail, np.maximum(exceedances, 1), n - exceedances + 1), 0.0)
+    high = np.where(exceedances < n, beta.ppf(1 - tail, exceedances + 1, np.maximum(n - exceedances, 1)), 1.0)
+    return (np.minimum(1.0, 2*low), np.minimum(1.0, 2*high))
+
+
+class PermutationSignificance:
+    """Compares the observed summary of the tissue (permutation_summary of the engine's
+compile_permutation on the unpermuted labels, which follows the definitions of
+compile_permutation_beta_contacts) with the permutation distribution as it streams
+in. It keeps, for every contact type and SUMMARY_NAMES statistic (and every network
+statistic, if network_observed is given), a NullComparison: the running moments of the
+permuted values for the z-scores and the exceedance counts of both tails for the
+empirical p-values, both over the permutations that gave the statistic a value. It has the add/add_network/new_partial/merge interface of the permutation
+accumulators, and is fed by a PermutationResults or StreamingPermutationStatistics
+created with significance=."""
+    def __init__(self, p_contact_types_list, observed, network_names=None, network_observed=None):
+        self.p_contact_types_list = list(p_contact_types_list)
+        self.observed = np.asarray(observed, dtype=np.float64)
+        self.network_names = None if network_names is None else list(network_names)
+        self.network_observed = None if network_observed is None else np.asarray(network_observed, dtype=np.float64)
+
+        self.n_permutations = 0
+        #Edited 2026-10: the same accumulator (and p-value) as StreamingPermutationStatistics
+        self.summary = NullComparison(self.observed.shape, self.observed)
+        n_network = 0 if self.network_observed is None else len(self.network_observed)
+        self.network = NullComparison((n_network,), self.network_observed)
+        #the number of permutations after which each statistic settled (0 while it has not)
+        self.settled_after = np.zeros(self.observed.shape, dtype=np.int64)
+        #how many times the stopping rule has looked at the counts (update_settled)
+        self.n_checks = 0
+        self.network_settled_after = np.zeros(n_network, dtype=np.int64)
+
+    def new_partial(self):
+        return PermutationSignificance(self.p_contact_types_list, self.observed, self.network_names, self.network_observed)
+
+    def add(self, sizes, counts, proportions):
+        """Compares the summary of one permutation with the observed one"""
+        self.n_permutations = self.n_permutations + 1
+        self.summary.add(permutation_summary(sizes, counts, proportions))
+
+    def add_network(self, values):
+        """Compares the network statistics of one permutation with the observed ones"""
+        if self.network_observed is None:
+            return
+        self.network.add(values)
+
+    def merge(self, other):
+        self.n_permutations = self.n_permutations + other.n_permutations
+        self.summary.merge(other.summary)
+        self.network.merge(other.network)
+
+    def z_scores(self):
+        """(observed - permutation mean)/permutation standard deviation (types x SUMMARY_NAMES)"""
+        return _null_z_scores(self.summary)
+
+    def network_z_scores(self):
+        return _null_z_scores(self.network)
+
+    def p_values(self):
+        """Empirical two-sided p-values (types x SUMMARY_NAMES, NullComparison.p_values); nan
+where the observed tissue has no value (no contacts of the type)"""
+        return self.summary.p_values()
+
+    def network_p_values(self):
+        return self.network.p_values()
+
+    def adjusted_p_values(self, method='holm'):
+        """The p-values adjusted for the tests across the contact types, separately for each
+SUMMARY_NAMES statistic (method is a P_ADJUSTMENTS name)"""
+        return P_ADJUSTMENTS[method](self.p_values())
+
+    def converged(self, tolerance=0.01, alpha=0.05, confidence=0.99):
+        """True once every p-value is known well enough to stop permuting: its confidence
+bounds (see SequentialStopping) are at most tolerance apart, or lie entirely on one
+side of alpha (None to use the width only)"""
+        return self.update_settled(SequentialStopping('interval', tolerance=tolerance, alpha=alpha, confidence=confidence))
+
+    def update_settled(self, stopping):
+        """Marks the statistics that the SequentialStopping rule settles after the permutations
+so far (a statistic stays settled once it is), and returns True once every tested
+statistic has settled"""
+        if self.n_permutations == 0:
+            return False
+        self.n_checks = self.n_checks + 1
+        settled = stopping.settled(self.summary.n_greater_equal, self.summary.n_less_equal, self.summary.n_valid,
+                                   self.n_checks)
+        self.settled_after[settled & (self.settled_after == 0)] = self.n_permutations
+        done = bool(np.all(self.settled_after[~np.isnan(self.observed)] > 0))
+        if self.network_observed is not None:
+            settled = stopping.settled(self.network.n_greater_equal, self.network.n_less_equal, self.network.n_valid,
+                                       self.n_checks)
+            self.network_settled_after[settled & (self.network_settled_after == 0)] = self.n_permutations
+            done = done and bool(np.all(self.network_settled_after[~np.isnan(self.network_observed)] > 0))
+        return done
+
+    def permutations_used(self):
+        """The number of permutations each statistic needed: when it settled, or all of them
+(types x SUMMARY_NAMES)"""
+        return np.where(self.settled_after > 0, self.settled_after, self.n_permutations)
+
+    def network_permutations_used(self):
+        return np.where(self.network_settled_after > 0, self.network_settled_after, self.n_permutations)
+
+    def table(self, method='holm', confidence=0.95):
+        """Returns (header, rows) of the significance report, one row per contact type and
+statistic (and per network statistic, whose p-values are not adjusted), for
+IO.export_permutation_significance"""
+        header = ['Contact Type', 'Statistic', 'Permutations', 'Permutations Needed', 'Observed', 'Null Mean', 'Null StDev', 'z',
+                  'p (two-sided)', 'p %g%% CI Low' % (100*confidence), 'p %g%% CI High' % (100*confidence),
+                  'p adjusted (%s)' % method]
+        rows = []
+        z = self.z_scores()
+        p_values = self.p_values()
+        (low, high) = p_value_intervals(self.summary.n_greater_equal, self.summary.n_less_equal, self.summary.n_valid,
+                                        confidence)
+        adjusted = self.adjusted_p_values(method)
+        used = self.permutations_used()
+        for j in range(len(self.p_contact_types_list)):
+            for s in range(len(SUMMARY_NAMES)):
+                rows.append(_significance_row(str(self.p_contact_types_list[j]), SUMMARY_NAMES[s], self.n_permutations,
+                                              used[j, s], self.observed[j, s], self.summary.moments_at((j, s)), z[j, s],
+                                              p_values[j, s], low[j, s], high[j, s], adjusted[j, s]))
+        if self.network_observed is not None:
+            z = self.network_z_scores()
+            p_values = self.network_p_values()
+            (low, high) = p_value_intervals(self.network.n_greater_equal, self.network.n_less_equal, self.network.n_valid,
+                                            confidence)
+            used = self.network_permutations_used()
+            for s in range(len(self.network_observed)):
+                rows.append(_significance_row('Beta-Beta Network', self.network_names[s], self.n_permutations, used[s],
+                                              self.network_observed[s], self.network.moments_at(s), z[s], p_values[s], low[s],
+                                              high[s], np.nan))
+        return (header, rows)
+
+
+def _null_z_scores(null):
+    """The z-scores of a NullComparison's observed values against its running moments"""
+    mean = np.array([moments.mean if moments.count > 0 else np.nan for moments in null.moments]).reshape(null.shape)
+    std = np.array([moments.std() for moments in null.moments]).reshape(null.shape)
+    return _z_scores(null.observed, mean, std)
+
+
+def _significance_row(contact_type, name, n_permutations, used, observed, moments, z, p_value, low, high, adjusted):
+    """One row of PermutationSignificance.table; values that are not defined are left empty"""
+    values = [observed, moments.mean if moments.count > 0 else np.nan, moments.std(), z]
+    if np.isnan(observed):
+        values = values + [np.nan]*4
+        used = None
+    else:
+        values = values + [p_value, low, high, adjusted]
+        used = int(used)
+    return [contact_type, name, n_permutations, used] + [None if np.isnan(value) else float(value) for value in values]
+
+
+STOPPING_RULES = ('besag_clifford', 'interval')
+
+
+class SequentialStopping:
+    """A sequential stopping rule for the permutation runner (the stop argument of
+run_permutations_parallel, for results created with significance=). Each statistic
+settles on its own:
+'besag_clifford' - once the smaller tail of its null distribution holds exceedances
+values at least as extreme as the observed one (Besag and Clifford, 1991), so a
+clearly null statistic needs about 2*exceedances/p permutations; a statistic whose
+p-value confidence bounds are clear of alpha settles too, or every clearly
+significant one would run to the budget
+'interval' - once its p-value's confidence bounds are at most tolerance apart or
+lie entirely on one side of alpha
+alpha=None leaves out the test against alpha. The run stops once every tested
+statistic has settled, and after at least min_permutations; the n_permutations of
+the run is the budget.
+Since the bounds are looked at after every block, each check uses exact bounds
+(p_value_bounds) at its own level: the k-th check spends (1 - confidence)/(k(k+1))
+of the error, which sums to at most 1 - confidence over any number of checks, so with
+probability at least confidence no check of a statistic has bounds that miss its true
+p-value (and a statistic settled against alpha is on the right side of it). Simulated
+with a true p-value of 0.01, 0.05 or 0.2 and 400 checks of 25 permutations, the bounds
+missed it in at most 0.5% of runs at confidence=0.99, where a fixed 99% Wilson
+interval missed it in 18-44%."""
+    def __init__(self, rule='besag_clifford', exceedances=10, tolerance=0.01, alpha=0.05, confidence=0.99, min_permutations=0):
+        if rule not in STOPPING_RULES:
+            raise ValueError('unknown stopping rule %r (expected one of %s)' % (rule, ', '.join(STOPPING_RULES)))
+        self.rule = rule
+        self.exceedances = exceedances
+        self.tolerance = tolerance
+        self.alpha = alpha
+        self.confidence = confidence
+        self.min_permutations = min_permutations
+
+    def __call__(self, results):
+        significance = results.significance
+        return significance.update_settled(self) and significance.n_permutations >= self.min_permutations
+
+    def check_confidence(self, n_checks):
+        """The confidence of the bounds at the n_checks-th check of a run"""
+        return 1 - (1 - self.confidence)/(n_checks*(n_checks + 1))
+
+    def settled(self, n_greater_equal, n_less_equal, n_permutations, n_checks=1):
+        """Whether each statistic is settled after n_permutations, from its tail counts, at the
+n_checks-th check of the run"""
+        (low, high) = p_value_bounds(n_greater_equal, n_less_equal, n_permutations, self.check_confidence(n_checks))
+        if self.rule == 'besag_clifford':
+            settled = np.minimum(n_greater_equal, n_less_equal) >= self.exceedances
+        else:
+            settled = high - low <= self.tolerance
+        if self.alpha is not None:
+            settled = settled | (high < self.alpha) | (low > self.alpha)
+        return settled
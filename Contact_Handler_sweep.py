@@ -0,0 +1,100 @@
+#Contact Handler threshold sweep
+#Added 2026-10
+
+"""This module runs the component type thresholds of
+Contact_Handler_component_type over a grid of values on a single parsed tissue.
+The folder is parsed once (through the TissueCache) into an ArrayTissue; each
+sweep point only reassigns the component types, which gives an ArrayTissue view
+sharing the parsed contact graph, and reruns find_cells and
+compile_cells_and_contacts on it. Sweep points are evaluated in parallel and the
+shift in cell type counts and contact type distributions is written to one
+summary spreadsheet. Run it from a folder of Contact Calculator exports, e.g.
+python Contact_Handler_sweep.py"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import Contact_Handler_IO as IO
+import Contact_Handler_component_type as Component_Type
+import Contact_Handler_array_tissue as Array_Tissue
+import Contact_Handler_cache as Cache
+import Contact_Handler_pipeline as Pipeline
+
+
+def threshold_grid(**threshold_values):
+    """Returns the list of thresholds dictionaries for every combination of the given
+values, e.g. threshold_grid(alpha=[6000, 7000], beta=[0.5, 0.6]) gives four points"""
+    keys = sorted(threshold_values.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*[threshold_values[key] for key in keys])]
+
+
+_worker_tissue = None
+
+def _init_worker(array_tissue):
+    """Process pool initializer: each worker receives the parsed ArrayTissue once"""
+    global _worker_tissue
+    _worker_tissue = array_tissue
+
+def _summarize_point(component_types):
+    return Pipeline.summarize_tissue(_worker_tissue.with_types(component_types))
+
+
+def run_threshold_sweep(grid, path='.', n_workers=None, filename='Sweep.xlsx'):
+    """Evaluates every thresholds dictionary in grid on the exports in path and writes
+the consolidated summary to filename. Grid points that produce the same component
+types are only evaluated once. Returns the list of (cells, contacts) summaries."""
+    file_list = [os.path.join(path, item) for item in sorted(IO.get_file_list(path))]
+    cache = Cache.TissueCache(path)
+    component_channels_dict = cache.component_channels(file_list[-1])
+    component_info_list = cache.component_info_list(file_list[:-1])
+    cache.save()
+
+    (names, intensities) = Component_Type.channels_to_array(component_channels_dict)
+    types_grid = Component_Type.classify_threshold_grid(names, intensities, grid)
+    array_tissue = Array_Tissue.ArrayTissue(dict(zip(names, types_grid[0].tolist())), component_info_list)
+
+    point_of = dict()
+    unique_types = []
+    for point in range(len(grid)):
+        key = types_grid[point].tobytes()
+        if key not in point_of:
+            point_of[key] = len(unique_types)
+            unique_types.append(types_grid[point].tolist())
+
+    if n_workers == 1:
+        unique_summaries = [Pipeline.summarize_tissue(array_tissue.with_types(component_types)) for component_types in unique_types]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(array_tissue,)) as executor:
+            unique_summaries = list(executor.map(_summarize_point, unique_types))
+    summaries = [unique_summaries[point_of[types_grid[point].tobytes()]] for point in range(len(grid))]
+
+    _export_sweep(grid, summaries, filename)
+    return summaries
+
+
+def _export_sweep(grid, summaries, filename):
+    """Lays the sweep summaries out as tables and writes them with IO.export_sweep_summary"""
+    threshold_names = [rule[0] for rule in Component_Type.INTENSITY_RULES]
+    defaults = {rule[0]: rule[3] for rule in Component_Type.INTENSITY_RULES}
+    cell_types = sorted(set(component_type for cells, contacts in summaries for component_type in cells))
+
+    cell_header = [name + ' threshold' for name in threshold_names] + cell_types
+    contact_header = [name + ' threshold' for name in threshold_names] + ['Contact Type', 'Contacts',
+                      'Fraction of Contacts', 'Mean Size (voxels)', 'Mean Size (um^2)']
+    cell_rows = []
+    contact_rows = []
+    for thresholds, (cells, contacts) in zip(grid, summaries):
+        thresholds = thresholds or dict()
+        threshold_values = [thresholds.get(name, defaults[name]) for name in threshold_names]
+        cell_rows.append(threshold_values + [cells.get(component_type, 0) for component_type in cell_types])
+        total = sum(n for n, mean_size, mean_area in contacts.values())
+        for contact_type in sorted(contacts.keys()):
+            (n, mean_size, mean_area) = contacts[contact_type]
+            contact_rows.append(threshold_values + [str(contact_type), n, n/total, mean_size, mean_area])
+
+    IO.export_sweep_summary(cell_header, cell_rows, contact_header, contact_rows, filename)
+
+
+if __name__ == '__main__':
+    run_threshold_sweep(threshold_grid(alpha=[6000, 7000, 8000], delta=[2.0, 2.4, 2.8], beta=[0.5, 0.6, 0.7]))
@@ -0,0 +1,168 @@
+#Contact Handler synthetic islets
+#Added 2026-10 for benchmarks and test data
+
+"""This module writes synthetic islets in the Contact Calculator export format:
+one text file per component (features and the voxel counts of its contacts)
+and the zzzChannel_Intensities.txt channel intensity file, so that the whole
+pipeline can be run at any scale without real data. Components are random
+points in a cube sized for cells of about cell_diameter um; components closer
+than the distance giving mean_degree neighbours on average are in contact, so
+the degree distribution and the edge effects look like a segmented tissue.
+Most contacts are measured from both sides, as in Imaris. The channel
+intensities are drawn so that Component_Type.component_type_calculator gives
+back the type each component was generated as. Run it as
+python Contact_Handler_synthetic.py output_folder n_components [mean_degree [seed]]"""
+
+import os
+
+import numpy as np
+
+#The component types generated and their default fractions
+TYPE_FRACTIONS = {'beta': 0.55, 'alpha': 0.15, 'delta': 0.05, 'capillary': 0.12, 'peri': 0.04, 'exocrine': 0.05,
+                  'unlabeled': 0.04}
+#Name prefix of each type (the name rules of Contact_Handler_component_type classify the last three)
+NAME_PREFIXES = {'beta': 'Surfaces', 'alpha': 'Surfaces', 'delta': 'Surfaces', 'unlabeled': 'Surfaces',
+                 'capillary': 'Capillaries', 'peri': 'Peri', 'exocrine': 'Exo'}
+CHANNEL_FILENAME = 'zzzChannel_Intensities.txt'
+VOXEL_SIZE = 0.0312
+
+
+def _component_names(component_types):
+    """Returns a name per component: the prefix of its type and its number"""
+    return ['%s_%07d' % (NAME_PREFIXES[component_type], i) for i, component_type in enumerate(component_types)]
+
+
+def _mean_intensities(component_types, rng):
+    """Returns the (components x 4) mean channel intensities, drawn against the default
+INTENSITY_RULES: alpha has ch4 above 7000, delta ch1/ch3 above 2.4, beta ch3/ch2 above 0.6
+and every other component none of these"""
+    n = len(component_types)
+    ch1 = rng.uniform(1000, 2000, n)
+    ch3 = rng.uniform(1000, 1500, n)
+    ch2 = ch3/rng.uniform(0.3, 0.5, n)
+    ch4 = rng.uniform(1000, 3000, n)
+    alpha = component_types == 'alpha'
+    ch4[alpha] = rng.uniform(8000, 12000, alpha.sum())
+    delta = component_types == 'delta'
+    ch1[delta] = ch3[delta]*rng.uniform(2.6, 4, delta.sum())
+    beta = component_types == 'beta'
+    ch3[beta] = rng.uniform(1500, 2500, beta.sum())
+    ch2[beta] = ch3[beta]/rng.uniform(1.1, 1.6, beta.sum())
+    return np.stack([ch1, ch2, ch3, ch4], axis=1)
+
+
+def _contact_pairs(points, radius):
+    """Returns the (a, b) index pairs (a < b) of the points closer than radius; a point with
+no neighbour is put in contact with its nearest one, since every component file lists
+at least one contact"""
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(points)
+    pairs = tree.query_pairs(radius, output_type='ndarray').astype(np.int64)
+    isolated = np.flatnonzero(np.bincount(pairs.ravel(), minlength=len(points)) == 0)
+    if len(isolated) > 0 and len(points) > 1:
+        nearest = tree.query(points[isolated], k=2)[1][:, 1]
+        pairs = np.concatenate([pairs, np.sort(np.stack([isolated, nearest], axis=1), axis=1)])
+        pairs = np.unique(pairs, axis=0)
+    return pairs
+
+
+def _reported_sides(pairs, n_components, both_sides_fraction, rng):
+    """Returns a (pairs x 2) boolean array: whether each side's file reports the contact.
+Most contacts are reported from both sides, the rest from one side; every component
+reports at least one contact."""
+    report = np.ones((len(pairs), 2), dtype=bool)
+    one_sided = rng.random(len(pairs)) >= both_sides_fraction
+    dropped_side = rng.integers(0, 2, len(pairs))
+    report[np.flatnonzero(one_sided), dropped_side[one_sided]] = False
+
+    reported = np.bincount(pairs[report], minlength=n_components)
+    (components, first) = np.unique(pairs.ravel(), return_index=True)
+    silent = reported[components] == 0
+    report[first[silent]//2, first[silent] % 2] = True
+    return report
+
+
+def generate_islet(path, n_components=1000, mean_degree=8, seed=0, type_fractions=None, cell_diameter=10.0,
+                   both_sides_fraction=0.9):
+    """Writes a synthetic islet of n_components components into path (created if needed)
+and returns the dictionary of component name -> generated type. type_fractions maps
+component types to their probabilities (TYPE_FRACTIONS by default); both_sides_fraction
+is the fraction of contacts measured from both sides. The output depends only on the
+arguments."""
+    rng = np.random.default_rng(seed)
+    type_fractions = TYPE_FRACTIONS if type_fractions is None else type_fractions
+    type_names = list(type_fractions)
+    probabilities = np.array([type_fractions[name] for name in type_names], dtype=np.float64)
+    component_types = np.array(type_names)[rng.choice(len(type_names), n_components, p=probabilities/probabilities.sum())]
+    names = _component_names(component_types)
+
+    side = cell_diameter*n_components**(1/3)
+    points = rng.random((n_components, 3))*side
+    radius = side*(3*mean_degree/(4*np.pi*n_components))**(1/3)
+    pairs = _contact_pairs(points, radius)
+    report = _reported_sides(pairs, n_components, both_sides_fraction, rng)
+
+    #the two sides measure a contact a few voxels apart
+    voxels = np.maximum(np.round(rng.lognormal(4.5, 0.7, len(pairs))), 4).astype(np.int64)
+    voxels = np.stack([voxels, np.maximum(voxels + rng.integers(-3, 4, len(pairs)), 2)], axis=1)
+    owners = np.concatenate([pairs[report[:, 0], 0], pairs[report[:, 1], 1]])
+    others = np.concatenate([pairs[report[:, 0], 1], pairs[report[:, 1], 0]])
+    owner_voxels = np.concatenate([voxels[report[:, 0], 0], voxels[report[:, 1], 1]])
+    order = np.argsort(owners, kind='stable')
+    (others, owner_voxels) = (others[order].tolist(), owner_voxels[order].tolist())
+    indptr = np.zeros(n_components + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owners, minlength=n_components), out=indptr[1:])
+    indptr = indptr.tolist()
+
+    distance_to_edge = np.clip(np.minimum(points, side - points).min(axis=1) - cell_diameter/2, 0, None).tolist()
+    surface_area = rng.uniform(250, 900, n_components).tolist()
+    volume = rng.uniform(300, 1200, n_components).tolist()
+    sphericity = rng.uniform(0.45, 0.95, n_components).tolist()
+    bounding_box = rng.uniform(4, 14, (n_components, 3)).tolist()
+    ellipticity = rng.random((n_components, 2)).tolist()
+    surface_voxels = rng.integers(500, 3000, n_components).tolist()
+
+    os.makedirs(path, exist_ok=True)
+    for i in range(n_components):
+        lines = [names[i],
+                 'Surface Area\t%.3f' % surface_area[i],
+                 'Volume\t%.3f' % volume[i],
+                 'Sphericity\t%.4f' % sphericity[i],
+                 'BoundingBox\t%.2f\t%.2f\t%.2f' % tuple(bounding_box[i]),
+                 'Ellipticity (prolate)\t%.4f' % ellipticity[i][0],
+                 'Ellipticity (oblate)\t%.4f' % ellipticity[i][1],
+                 'Surface Voxels\t%d' % surface_voxels[i],
+                 'Distance to Edge\t%.3f' % distance_to_edge[i],
+                 'Voxel Size\tum^2\t%.4f' % VOXEL_SIZE,
+                 'Contacts']
+        blocks = []
+        for c in range(indptr[i], indptr[i+1]):
+            #Contact Calculator lists the voxel count of a contact in parts
+            blocks.append('%s\n%d\n%d' % (names[others[c]], owner_voxels[c]//2, owner_voxels[c] - owner_voxels[c]//2))
+        with open(os.path.join(path, 'component_%07d.txt' % i), 'w') as f:
+            f.write('\n'.join(lines) + '\n' + '\n\n'.join(blocks) + '\n')
+
+    write_channel_file(os.path.join(path, CHANNEL_FILENAME), names, _mean_intensities(component_types, rng), volume, rng)
+    return dict(zip(names, component_types.tolist()))
+
+
+def write_channel_file(filename, names, means, volume, rng):
+    """Writes the channel intensity file: for every component the median, mean and intensity
+sum of the 4 channels, in the order get_component_channels reads them"""
+    medians = means*rng.uniform(0.85, 1.0, means.shape)
+    sums = means*(np.asarray(volume)/VOXEL_SIZE)[:, None]
+    stats = np.stack([medians, means, sums], axis=1).tolist()
+    with open(filename, 'w') as f:
+        f.write('Channel Intensities\n')
+        for name, component_stats in zip(names, stats):
+            f.write(name.replace('_', ' ') + '\nstat\tvalue\n')
+            for values in component_stats:
+                f.write(''.join('Ch%d\t%.3f\n' % (channel + 1, value) for channel, value in enumerate(values)))
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    import sys
+
+    generate_islet(sys.argv[1], int(sys.argv[2]), *[int(argument) for argument in sys.argv[3:5]])
@@ -9,87 +9,56 @@ Created on Sun Mar 19 14:08:21 2023
 #Olivia Creasey
 #2023-03-19
 #Permutation analysis for Contact Handler - MAIN
-
-import Contact_Handler_IO as IO
-import Contact_Handler_definitions as Definitions
-import Contact_Handler_component_type as Component_Type
-import Contact_Handler_graphs as Graphs
-
-import copy
-import random
-
-#Find the files and load in the list of tissue components and the type for each component
-file_list = sorted(IO.get_file_list('.'))
-#The channel intensity file should be the first one in the folder
-component_channels_dict = IO.get_component_channels(file_list[-1])
-#This assumes that the channels are in a file labeled "intensity" and the components are
-#in files labeled "downsampled" - may need to change this for different labeling conventions
-
-#Compile the dictionary of each component's type, as defined by the data
-component_types_dict = Component_Type.component_type_calculator(component_channels_dict)
-
-#Create a tissue object
-current_tissue = Definitions.Tissue(dict(), dict(), [])
-##Initialize all of the components in the tissue
-#and count how many alpha, beta, and delta cells
-n_beta = 0
-#n_alpha = 0
-#n_delta = 0
-components_endocrine = []
-for component_name, component_type in component_types_dict.items():
-    c = Definitions.Component(component_name, component_type)
-    current_tissue.new_component(c)
-    if component_type == 'beta':
-            n_beta = n_beta + 1
-            components_endocrine.append(component_name)
-    #elif component_type == 'alpha':
-    #        n_alpha = n_alpha + 1
-    #       components_endocrine.append(component_name)
-    #elif component_type == 'delta':
-    #        n_delta = n_delta + 1
-    #        components_endocrine.append(component_name)
-    
-#Go through the remaining files and read in the contact-specific and component-specific spatial information
-#This assumes that the channels are in a file labeled "zzzChannel" and the components are
-#in files labeled pretty much anything else - may need to change this for different labeling conventions
-    #The "zzzChannel" thing is kind of cheating, but I don't care
-for i in range(len(file_list)-1):
-    (name, surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size, contacts_list) = IO.get_component_info(file_list[i])
-    working_component = current_tissue.components_dict[name]
-    working_component.add_component_features(surface_area, volume, sphericity, bounding_box, ellipticity_p, ellipticity_o, s_voxels, distance_to_edge, voxel_size)
-
-    
-    for j,k in contacts_list:
-        contact_name = tuple(sorted([name, j]))
-        if contact_name in current_tissue.contacts_dict.keys():
-            current_tissue.contacts_dict[contact_name].add_replicate_measurement(k)
-        else:
-            current_tissue.contacts_dict[contact_name]=Definitions.Contact(working_component, current_tissue.components_dict[j], k)
-
-        working_component.add_contact(current_tissue.contacts_dict[contact_name])
-        
-#start the permutation analysis
-p_current_tissue = copy.deepcopy(current_tissue)
-
-for perm in range (1000):
-    random.shuffle(components_endocrine)
-    for b in range(n_beta):
-        p_current_tissue.components_dict[components_endocrine[b]].update_type('beta')
-    """for a in range(n_alpha):
-        p_current_tissue.components_dict[components_endocrine[a+b+1]].update_type('alpha')
-    for d in range(n_delta):
-        p_current_tissue.components_dict[components_endocrine[a+b+d+2]].update_type('delta')"""
-    #for d in range(n_delta):
-    #    p_current_tissue.components_dict[components_endocrine[b+d+1]].update_type('delta')    
-        
-    for identifier, contact in p_current_tissue.contacts_dict.items():
-        contact.update_type(p_current_tissue.components_dict[identifier[0]].component_type,p_current_tissue.components_dict[identifier[1]].component_type)
-
-    p_current_tissue.compile_permutation_beta_contacts()
-
-IO.export_permutation_beta(p_current_tissue.p_contact_types_list, p_current_tissue.beta_contacts_size_p, p_current_tissue.beta_contacts_counts_p, p_current_tissue.beta_contacts_proportion_p)
-
-
-
-
-
+#Edited 2026-10: the ingest, permutation and export steps are in Contact_Handler_pipeline
+
+import Contact_Handler_pipeline as Pipeline
+import Contact_Handler_profiling as Profiling
+
+#Settings for the parallel permutation runner
+n_permutations = 1000
+permutation_seed = 20230319
+#Stream the permuted values into summary statistics instead of keeping every value (for very long runs)
+streaming_statistics = False
+#Also compute the network statistics of the beta-beta subgraph (largest component, mean degree, clustering, ...)
+network_statistics = False
+#'excel' (default), 'csv', 'parquet' or 'hdf5' - see Contact_Handler_output
+output_backend = 'excel'
+#Permutation schemes (null models) to run on the same compiled tissue - see Contact_Handler_permutation.SCHEMES:
+#'uniform', 'distance' (within distance_to_edge bins), 'degree' (between cells with the same number of contacts)
+#and 'region' (within regions, given as scheme_options = {'region': {'regions': {component: region, ...}}})
+permutation_schemes = ['uniform']
+scheme_options = dict()
+#Added 2026-10: compile the permutation engine from the cached component columns, without building the
+#Component and Contact objects (much faster start on large islets; the results are the same)
+lazy_loading = False
+#Added 2026-10: also write Results_permute_significance.xlsx - the observed summary against the permutations:
+#z-scores, two-sided p-values with their confidence intervals, and the p-values adjusted across the contact
+#types ('holm' or 'bh' for Benjamini-Hochberg)
+significance_report = False
+p_adjustment = 'holm'
+#Stop before n_permutations once every p-value's 99% confidence interval is narrower than this (or clear of 0.05)
+stop_tolerance = None
+#Added 2026-10: sequential stopping - n_permutations becomes a budget, and permutations are run in blocks until
+#every statistic has settled: 'besag_clifford' (once stopping_exceedances permuted values are at least as extreme
+#as the observed one, or the p-value is clearly below or above 0.05) or 'interval' (within stop_tolerance, 0.01
+#if not set). The significance report gives the permutations each statistic needed.
+stopping_rule = None
+stopping_exceedances = 10
+#Added 2026-10: record the wall time, CPU time, peak memory and item counts of every pipeline stage
+#to Profile.json; profile_stage names one stage (e.g. 'compile_cells_and_contacts') to also capture with
+#cProfile into Profile.prof; profile_memory also traces the peak Python memory of every stage (much slower)
+profile_run = False
+profile_stage = None
+profile_memory = False
+
+if __name__ == '__main__':
+    if profile_run:
+        Profiling.enable(profile_memory, profile_stage)
+    #Only the beta cells are shuffled
+    Pipeline.run_permutation_analysis('.', ('beta',), permutation_schemes, n_permutations, permutation_seed,
+                                      streaming_statistics, network_statistics, output_backend, scheme_options=scheme_options,
+                                      lazy_loading=lazy_loading, significance_report=significance_report,
+                                      p_adjustment=p_adjustment, stop_tolerance=stop_tolerance, stopping_rule=stopping_rule,
+                                      stopping_exceedances=stopping_exceedances)
+    if profile_run:
+        Profiling.write_report('Profile.json', 'Profile.prof')